@@ -9,10 +9,13 @@ import pandas as pd
 import os
 import base64
 import replicate
+import asyncio
 from llamaapi import LlamaAPI
+from llm_dispatcher import dispatch
+from llm_cache import ResponseCache
 
 # Set your API keys
-openai.api_key = 
+openai.api_key = os.environ.get("OPENAI_API_KEY")
 # Initialize the SDK
 #llama = LlamaAPI(llama_api_key)
 # llamaAPI_client = openai.OpenAI(
@@ -194,6 +197,23 @@ Keyword_string = json.dumps(Keywords_json,indent=4)
 Keyword_prompt = "You should only use the following keyword. If the keywords are insufficient to describe the exercise, You may include new keywords that are percise and can be reused on multiple exercises. You should remember all the keywords, old and new, and ensure there's no duplication. After all images have been generated, If you include new keywords, you must return a JSON file named newkeywords.json which contains a section of new and old keywords."
 
 JSON_prompt = JSON_instruction+JSON_string+Keyword_prompt+Keyword_string
+
+# Model ids and the response cache. Bump PROMPT_VERSION when the prompts change in a way
+# that should not reuse old answers; get_response_cache().invalidate(old_version) clears them.
+CHATGPT_MODEL = "chatgpt-4o-latest"
+LLAMA_MODEL = "meta-llama/llama-3.1-405b-instruct"
+REPLICATE_LLAMA_MODEL = "meta/meta-llama-3.1-405b-instruct"
+PROMPT_VERSION = "v1"
+RESPONSE_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_cache")
+_response_cache = None
+
+def get_response_cache():
+    """The shared response cache, opened (and evicted) on first use rather than at import."""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache(RESPONSE_CACHE_DIR, max_bytes=500 * 1024 * 1024, max_age_days=90)
+    return _response_cache
+
 print(JSON_prompt)
 # 1. Convert image to bytes (for API or model input)
 def load_image_as_bytes(image_path):
@@ -204,28 +224,55 @@ def encode_image(image_path):
         return base64.b64encode(img_file.read()).decode('utf-8')
 
 # 2. Send image and prompt to ChatGPT-4
-def send_to_chatgpt(image, prompt):
+def send_to_chatgpt(image, prompt, cache=None):
+    response_cache = cache or get_response_cache()
+    key = response_cache.make_key(CHATGPT_MODEL, system_prompt, prompt, base64.b64decode(image), PROMPT_VERSION)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached
+
     response = openai.chat.completions.create(
-        model="chatgpt-4o-latest",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": [
-                {"type": "text", "text":prompt},
-                {"type":"image_url",
-                 "image_url":{
-                     "url":f"data:image/png;base64,{image}"
-                 }}]}
-        ],
+        model=CHATGPT_MODEL,
+        messages=build_chatgpt_messages(image, prompt),
     )
 
+    content = response.choices[0].message.content
+    response_cache.put(key, content, model=CHATGPT_MODEL, prompt_version=PROMPT_VERSION)
+    return content
+
+def build_chatgpt_messages(image, prompt):
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": [
+            {"type": "text", "text":prompt},
+            {"type":"image_url",
+             "image_url":{
+                 "url":f"data:image/png;base64,{image}"
+             }}]}
+    ]
+
+async def send_to_chatgpt_async(client, image, prompt):
+    # Uncached: the caller resolves cache hits before dispatching and stores the answers afterwards
+    response = await client.chat.completions.create(
+        model=CHATGPT_MODEL,
+        messages=build_chatgpt_messages(image, prompt),
+    )
     return response.choices[0].message.content
 
 # 3. Send image and prompt to LLaMA 3.1
-def send_to_llama(image, prompt):
+def send_to_llama(image, prompt, cache=None):
+    # The image question below is what is actually sent, so it is what gets cached
+    llama_question = "What's in this image?"
+    response_cache = cache or get_response_cache()
+    key = response_cache.make_key(LLAMA_MODEL, system_prompt, llama_question, base64.b64decode(image), PROMPT_VERSION)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached
+
     image_url = f"data:image/png;base64,{image}"
     #print(image_url)
     response = openroute_client.chat.completions.create(
-        model="meta-llama/llama-3.1-405b-instruct",
+        model=LLAMA_MODEL,
         messages=[
             {"role": "system", "content": system_prompt},
             {
@@ -233,7 +280,7 @@ def send_to_llama(image, prompt):
                 "content": [
                 {
                     "type": "text",
-                    "text": "What's in this image?"
+                    "text": llama_question
                 },
                 {
                     "type": "image_url",
@@ -246,18 +293,30 @@ def send_to_llama(image, prompt):
 
         ],
     )
-    return response.choices[0].message.content
+    content = response.choices[0].message.content
+    response_cache.put(key, content, model=LLAMA_MODEL, prompt_version=PROMPT_VERSION)
+    return content
+
+def send_to_llama_replic(image_path,prompt, cache=None):
+    image_bytes = load_image_as_bytes(image_path)
+    response_cache = cache or get_response_cache()
+    key = response_cache.make_key(REPLICATE_LLAMA_MODEL, system_prompt, Xiang_prompt, image_bytes, PROMPT_VERSION)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached
 
-def send_to_llama_replic(image_path,prompt):
-    image = open(image_path, "rb")
     output = replicate.run(
-        "meta/meta-llama-3.1-405b-instruct",
+        REPLICATE_LLAMA_MODEL,
         input={
-            "image": image,
+            "image": io.BytesIO(image_bytes),
             "system_prompt":system_prompt,
             "prompt": Xiang_prompt
         }
     )
+    # replicate streams language model output as an iterator of text chunks
+    if not isinstance(output, str):
+        output = list(output)
+    response_cache.put(key, output, model=REPLICATE_LLAMA_MODEL, prompt_version=PROMPT_VERSION)
     return output
 
 
@@ -288,7 +347,9 @@ def save_jsons(chatgpt, output="test_json"):
         
         print(f"Saved {activity_name} response to {filename}")
 # 5. Run both models and save responses
-def process_images_from_folder(folder_path, prompt, excel_file="responses.xlsx",json_folder = "test_json"):
+def process_images_from_folder(folder_path, prompt, excel_file="responses.xlsx",json_folder = "test_json",
+                               cache=None):
+    cache = cache or get_response_cache()
     # Initialize a list to hold all data for the Excel sheet
     openai_response_dict = dict()
     llama_response_dict = dict()
@@ -304,7 +365,7 @@ def process_images_from_folder(folder_path, prompt, excel_file="responses.xlsx",
             image_base64 = encode_image(image_path)
             
             # Send prompt to ChatGPT-4
-            chatgpt_response = send_to_chatgpt(image_base64,prompt)
+            chatgpt_response = send_to_chatgpt(image_base64,prompt,cache)
             print(f"ChatGPT-4 Response for {file_name}: {chatgpt_response}")
             # Append results to data list
             # data.append({
@@ -332,8 +393,77 @@ def process_images_from_folder(folder_path, prompt, excel_file="responses.xlsx",
     save_jsons(openai_response_dict,json_folder)
     return openai_response_dict
 
+# Rough per-request token cost for the rate limiter: text at ~4 chars/token plus one image
+IMAGE_TOKEN_ESTIMATE = 765
+
+# 6. Same as process_images_from_folder, but with many requests in flight at once
+def process_images_from_folder_async(folder_path, prompt, excel_file="responses.xlsx", json_folder="test_json",
+                                     concurrency=8, requests_per_minute=60, tokens_per_minute=None,
+                                     timeout=120.0, max_retries=5, base_url=None, cache=None):
+    cache = cache or get_response_cache()
+    # Collect the images up front; keys keep the same base names as the serial version.
+    # Cache hits are answered here, so only misses go through the rate limiter.
+    responses = dict()
+    jobs = dict()
+    base_names = []
+    for file_name in os.listdir(folder_path):
+        if file_name.endswith(".png"):
+            base_name = os.path.splitext(file_name)[0]
+            base_names.append(base_name)
+            image_bytes = load_image_as_bytes(os.path.join(folder_path, file_name))
+            key = cache.make_key(CHATGPT_MODEL, system_prompt, prompt, image_bytes, PROMPT_VERSION)
+            cached = cache.get(key)
+            if cached is not None:
+                responses[base_name] = cached
+            else:
+                jobs[base_name] = (base64.b64encode(image_bytes).decode('utf-8'), key)
+    print(f"{len(responses)} cached responses, {len(jobs)} requests to send")
+
+    async def run():
+        # Retries are handled by the dispatcher, so turn off the SDK's own
+        client = openai.AsyncOpenAI(api_key=openai.api_key, base_url=base_url, max_retries=0)
+
+        async def send(job):
+            image, key = job
+            content = await send_to_chatgpt_async(client, image, prompt)
+            # Cache each answer as it arrives, off the event loop, so an interrupted run keeps it
+            await asyncio.to_thread(cache.put, key, content, model=CHATGPT_MODEL, prompt_version=PROMPT_VERSION)
+            return content
+
+        try:
+            return await dispatch(
+                jobs,
+                send,
+                concurrency=concurrency,
+                requests_per_minute=requests_per_minute,
+                tokens_per_minute=tokens_per_minute,
+                timeout=timeout,
+                max_retries=max_retries,
+                estimate_tokens=lambda job: (len(system_prompt) + len(prompt)) // 4 + IMAGE_TOKEN_ESTIMATE,
+            )
+        finally:
+            await client.close()
+
+    if jobs:
+        responses.update(asyncio.run(run()))
+    responses = {base_name: responses[base_name] for base_name in base_names}
+
+    openai_response_dict = dict()
+    llama_response_dict = dict()
+    for base_name, chatgpt_response in responses.items():
+        if isinstance(chatgpt_response, Exception):
+            print(f"Skipping {base_name}: {chatgpt_response!r}")
+            continue
+        print(f"ChatGPT-4 Response for {base_name}: {chatgpt_response}")
+        openai_response_dict[base_name] = [base_name, chatgpt_response]
+
+    save_to_excel(openai_response_dict, llama_response_dict, excel_file=excel_file)
+    save_jsons(openai_response_dict, json_folder)
+    return openai_response_dict
+
 # Example usage
-#process_images_from_folder(folder_path, prompt = Xiang_prompt)
-#answers = process_images_from_folder(folder_path=test_run_folder_path, prompt=JSON_prompt, excel_file="testrun_json.xlsx")
-answers = process_images_from_folder(picked_path,JSON_prompt,"JSON_reponses.xlsx","JSON_response")
-print("All Done")
\ No newline at end of file
+if __name__ == "__main__":
+    #process_images_from_folder(folder_path, prompt = Xiang_prompt)
+    #answers = process_images_from_folder(folder_path=test_run_folder_path, prompt=JSON_prompt, excel_file="testrun_json.xlsx")
+    answers = process_images_from_folder_async(picked_path,JSON_prompt,"JSON_reponses.xlsx","JSON_response")
+    print("All Done")
@@ -1,20 +1,15 @@
-import torch
 import cv2
 import numpy as np
-import mediapipe as mp
-from collections import deque
 from pathlib import Path
 import sys
 import os
 YOLOV7_ROOT = os.path.abspath('./yolov7')  # Adjust this path to your YOLOv7 directory
 sys.path.append(YOLOV7_ROOT)
 from typing import Dict, List, Tuple, Optional
-from yolov7.models.experimental import attempt_load
-from yolov7.utils.torch_utils import select_device
-from yolov7.utils.general import check_img_size, non_max_suppression
-from mmpose.apis import init_pose_model, inference_top_down_pose_model
-from mmdet.apis import init_detector, inference_detector
-from openpose import pyopenpose as op
+from landmarks import NUM_JOINTS, landmark_frame_to_dict
+from smoothing import LandmarkSmoother
+# torch, YOLOv7 and MediaPipe are imported by the detectors that use them, so
+# importing this module (e.g. for the cache or scoring tools) stays cheap
 class YOLOv7EquipmentDetector:
     """Detector for gym equipment using YOLOv7."""
     
@@ -29,16 +24,34 @@ class YOLOv7EquipmentDetector:
             conf_threshold: Confidence threshold for detections
             iou_threshold: IOU threshold for NMS
         """
+        self.model_path = model_path
         self.equipment_list = equipment_list
         self.conf_threshold = conf_threshold
         self.iou_threshold = iou_threshold
         
         # Load model
         self.model, self.device, self.stride, self.img_size = self._load_model(model_path)
+        # Resized-frame staging buffer, grown on demand and reused across batches
+        self._batch_buffer = np.empty((0, self.img_size, self.img_size, 3), dtype=np.uint8)
         print(f"Equipment detector initialized on {self.device}")
         
+    def get_config(self) -> Dict:
+        """Settings that determine this detector's output, used for cache keys."""
+        return {
+            'model_path': os.path.abspath(self.model_path),
+            'equipment_list': list(self.equipment_list),
+            'conf_threshold': self.conf_threshold,
+            'iou_threshold': self.iou_threshold,
+            'img_size': self.img_size
+        }
+        
     def _load_model(self, weights_path: str, img_size: int = 640) -> Tuple:
         """Load and configure YOLOv7 model."""
+        import torch
+        from yolov7.models.experimental import attempt_load
+        from yolov7.utils.torch_utils import select_device
+        from yolov7.utils.general import check_img_size
+        
         if not Path(weights_path).exists():
             raise FileNotFoundError(f"Weights file not found: {weights_path}")
             
@@ -67,51 +80,73 @@ class YOLOv7EquipmentDetector:
             List of dictionaries containing detection info:
             [{'label': str, 'confidence': float, 'bbox': tuple, 'center': tuple}]
         """
-        # Preprocess frame
-        resized_frame = cv2.resize(frame, (self.img_size, self.img_size))
-        frame_tensor = torch.from_numpy(resized_frame).to(self.device).float() / 255.0
-        frame_tensor = frame_tensor.permute(2, 0, 1)
+        return self.detect_equipment_batch([frame])[0]
+        
+    def detect_equipment_batch(self, frames: List[np.ndarray]) -> List[List[Dict]]:
+        """
+        Detect equipment in several frames with one forward pass.
+        
+        Args:
+            frames: BGR images as numpy arrays
+            
+        Returns:
+            Per-frame detection lists, in the same format as detect_equipment
+        """
+        if not frames:
+            return []
+        import torch
+        from yolov7.utils.general import non_max_suppression
+            
+        # Preprocess frames straight into the reusable staging buffer
+        if len(self._batch_buffer) < len(frames):
+            self._batch_buffer = np.empty((len(frames), self.img_size, self.img_size, 3), dtype=np.uint8)
+        batch = self._batch_buffer[:len(frames)]
+        for i, frame in enumerate(frames):
+            cv2.resize(frame, (self.img_size, self.img_size), dst=batch[i])
+            
+        frame_tensor = torch.from_numpy(batch).to(self.device).float() / 255.0
+        frame_tensor = frame_tensor.permute(0, 3, 1, 2)
         
         if self.device.type != 'cpu':
             frame_tensor = frame_tensor.half()
             
-        # Add batch dimension
-        if frame_tensor.ndimension() == 3:
-            frame_tensor = frame_tensor.unsqueeze(0)
-            
         # Run inference
         with torch.no_grad():
             predictions = self.model(frame_tensor)[0]
             
-        # Apply NMS
+        # Apply NMS (handles the whole batch, one result tensor per image)
         predictions = non_max_suppression(
             predictions, 
             conf_thres=self.conf_threshold,
             iou_thres=self.iou_threshold
         )
         
+        return [self._format_detections(prediction, frame.shape)
+                for prediction, frame in zip(predictions, frames)]
+        
+    def _format_detections(self, prediction: 'torch.Tensor', frame_shape: Tuple) -> List[Dict]:
+        """Convert one image's NMS output into detection dicts in frame coordinates."""
         detections = []
-        if len(predictions):
-            # Scale coordinates to original image size
-            scale_factor = frame.shape[1] / self.img_size  # Assuming square input
+        # Scale coordinates to original image size
+        scale_factor = frame_shape[1] / self.img_size  # Assuming square input
+        
+        for *xyxy, conf, cls in prediction.tolist():
+            label = self.model.names[int(cls)]
             
-            for *xyxy, conf, cls in predictions[0]:
-                label = self.model.names[int(cls)]
+            if label in self.equipment_list:
+                # Convert bbox coordinates
+                x1, y1, x2, y2 = [coord * scale_factor for coord in xyxy]
                 
-                if label in self.equipment_list:
-                    # Convert bbox coordinates
-                    x1, y1, x2, y2 = [coord.item() * scale_factor for coord in xyxy]
-                    
-                    # Calculate center point
-                    center_x = (x1 + x2) / 2
-                    center_y = (y1 + y2) / 2
-                    
-                    detections.append({
-                        'label': label,
-                        'confidence': conf.item(),
-                        'bbox': (x1, y1, x2, y2),
-                        'center': (center_x, center_y)
-                    })
+                # Calculate center point
+                center_x = (x1 + x2) / 2
+                center_y = (y1 + y2) / 2
+                
+                detections.append({
+                    'label': label,
+                    'confidence': conf,
+                    'bbox': (x1, y1, x2, y2),
+                    'center': (center_x, center_y)
+                })
         
         return detections
         
@@ -143,7 +178,10 @@ class PoseDetector:
     def __init__(self, smoothing_window_size: int = 5, 
                  spike_threshold: float = 0.2,
                  min_detection_confidence: float = 0.5,
-                 min_tracking_confidence: float = 0.5):
+                 min_tracking_confidence: float = 0.5,
+                 model_complexity: int = 2,
+                 roi_padding: float = None,
+                 roi_max_size: int = 512):
         """
         Initialize pose detector with smoothing capabilities.
         
@@ -152,11 +190,20 @@ class PoseDetector:
             spike_threshold: Threshold for spike detection (in standard deviations)
             min_detection_confidence: MediaPipe detection confidence threshold
             min_tracking_confidence: MediaPipe tracking confidence threshold
+            model_complexity: MediaPipe Pose model complexity (0, 1 or 2)
+            roi_padding: If set, run MediaPipe on a crop around the previous frame's
+                landmarks, padded by this fraction of the box size on each side;
+                None always uses the full frame
+            roi_max_size: Longest side the ROI crop is downscaled to before inference
         """
+        import mediapipe as mp
         self.mp_pose = mp.solutions.pose
+        self.model_complexity = model_complexity
+        self.min_detection_confidence = min_detection_confidence
+        self.min_tracking_confidence = min_tracking_confidence
         self.pose = self.mp_pose.Pose(
             static_image_mode=False,
-            model_complexity=2,
+            model_complexity=model_complexity,
             min_detection_confidence=min_detection_confidence,
             min_tracking_confidence=min_tracking_confidence
         )
@@ -166,83 +213,123 @@ class PoseDetector:
         self.window_size = smoothing_window_size
         self.spike_threshold = spike_threshold
         
-        # Initialize landmark history
-        self._init_landmark_history()
+        # Moving average and spike rejection over all landmarks at once
+        self.smoother = LandmarkSmoother(smoothing_window_size, spike_threshold, NUM_JOINTS)
         
-    def _init_landmark_history(self):
-        """Initialize deques for landmark position history."""
-        self.landmark_history = {}
-        for landmark in self.mp_pose.PoseLandmark:
-            self.landmark_history[landmark.name] = deque(maxlen=self.window_size)
+        # Person ROI parameters
+        self.roi_padding = roi_padding
+        self.roi_max_size = roi_max_size
+        self._roi_box = None
+            
+    def reset(self):
+        """Clear smoothing history so the next video starts fresh."""
+        self.smoother.reset()
+        self._roi_box = None
+        
+    def get_config(self) -> Dict:
+        """Settings that determine this detector's output, used for cache keys."""
+        config = {
+            'backend': 'mediapipe',
+            'model_complexity': self.model_complexity,
+            'min_detection_confidence': self.min_detection_confidence,
+            'min_tracking_confidence': self.min_tracking_confidence,
+            'smoothing_window_size': self.window_size,
+            'spike_threshold': self.spike_threshold
+        }
+        # Left out when disabled so full-frame cache entries stay valid
+        if self.roi_padding is not None:
+            config['roi_padding'] = self.roi_padding
+            config['roi_max_size'] = self.roi_max_size
+        return config
             
+    def get_landmark_array_from_frame(self, frame: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Get smoothed landmarks from a single frame as a compact array.
+
+        Args:
+            frame: BGR image as numpy array
+
+        Returns:
+            (33, 4) float32 array of x, y, z, visibility in PoseJoint order, or None
+            if no pose was found. Only x and y are smoothed.
+        """
+        raw = None
+        if self.roi_padding is not None and self._roi_box is not None:
+            raw = self._detect_in_roi(frame, self._roi_box)
+        if raw is None:
+            # No ROI yet, or the person left it: search the whole frame
+            raw = self._detect(frame)
+        if raw is None:
+            self._roi_box = None
+            return None
+        if self.roi_padding is not None:
+            self._roi_box = self._landmark_roi(raw, frame.shape)
+
+        landmarks = raw.astype(np.float32)
+        landmarks[:, :2] = self.smoother.update(raw[:, :2])
+        return landmarks
+
+    def _detect(self, image: np.ndarray) -> Optional[np.ndarray]:
+        """Raw (33, 4) float64 MediaPipe landmarks for a BGR image, normalized to that image."""
+        # Convert to RGB for MediaPipe
+        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        results = self.pose.process(image_rgb)
+        if not results.pose_landmarks:
+            return None
+        return np.array([(lm.x, lm.y, lm.z, lm.visibility) for lm in results.pose_landmarks.landmark])
+
+    def _landmark_roi(self, raw: np.ndarray, frame_shape: Tuple[int, ...]) -> Optional[Tuple[int, int, int, int]]:
+        """Padded pixel box (x0, y0, x1, y1) around full-frame landmarks, clipped to the frame."""
+        height, width = frame_shape[:2]
+        lower = np.clip(raw[:, :2].min(axis=0), 0.0, 1.0) * (width, height)
+        upper = np.clip(raw[:, :2].max(axis=0), 0.0, 1.0) * (width, height)
+        pad = (upper - lower) * self.roi_padding
+        x0, y0 = np.floor(np.maximum(lower - pad, 0)).astype(int)
+        x1, y1 = np.ceil(np.minimum(upper + pad, (width, height))).astype(int)
+        if x1 - x0 < 2 or y1 - y0 < 2:
+            return None
+        return int(x0), int(y0), int(x1), int(y1)
+
+    def _detect_in_roi(self, frame: np.ndarray, box: Tuple[int, int, int, int]) -> Optional[np.ndarray]:
+        """
+        Run MediaPipe on a downscaled crop and map the landmarks back to the full frame.
+
+        Returns:
+            Raw (33, 4) landmarks normalized to the full frame, so rule thresholds are
+            unchanged, or None if no pose was found in the crop
+        """
+        x0, y0, x1, y1 = box
+        crop = frame[y0:y1, x0:x1]
+        scale = self.roi_max_size / max(crop.shape[:2])
+        if scale < 1.0:
+            crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        raw = self._detect(crop)
+        if raw is None:
+            return None
+        # Normalized crop coordinates do not depend on the downscale, only on the crop box
+        height, width = frame.shape[:2]
+        crop_width, crop_height = x1 - x0, y1 - y0
+        raw[:, 0] = (x0 + raw[:, 0] * crop_width) / width
+        raw[:, 1] = (y0 + raw[:, 1] * crop_height) / height
+        # MediaPipe z is on the same scale as x
+        raw[:, 2] *= crop_width / width
+        return raw
+
     def get_joint_positions_from_frame(self, frame: np.ndarray) -> Dict[str, Tuple[float, float]]:
         """
         Get joint positions from a single frame.
-        This is the main method that exercise_analyzer.py expects.
+        Dictionary form of get_landmark_array_from_frame for callers that look joints up by name.
         
         Args:
             frame: BGR image as numpy array
             
         Returns:
-            Dictionary mapping landmark names to (x, y) coordinates
+            Dictionary mapping landmark names (plus hand/foot aliases) to (x, y) coordinates
         """
-        # Convert to RGB for MediaPipe
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.pose.process(frame_rgb)
-        
-        landmarks = {}
-        if results.pose_landmarks:
-            for idx, landmark in enumerate(results.pose_landmarks.landmark):
-                name = self.mp_pose.PoseLandmark(idx).name.lower()
-                current_pos = np.array([landmark.x, landmark.y])
-                
-                # Get smoothed position
-                smoothed_pos = self._smooth_position(name.upper(), current_pos)
-                landmarks[name] = tuple(smoothed_pos)
-                
-                # Special handling for specific joints needed by the exercise analyzer
-                if name == "left_index":
-                    landmarks["left_hand"] = tuple(smoothed_pos)
-                elif name == "right_index":
-                    landmarks["right_hand"] = tuple(smoothed_pos)
-                elif name == "left_heel":
-                    landmarks["left_foot"] = tuple(smoothed_pos)
-                elif name == "right_heel":
-                    landmarks["right_foot"] = tuple(smoothed_pos)
-        
-        return landmarks
-        
-    def _smooth_position(self, landmark_name: str, 
-                        current_pos: np.ndarray) -> np.ndarray:
-        """Apply smoothing to landmark position."""
-        history = self.landmark_history[landmark_name]
-        history.append(current_pos)
-        
-        if len(history) < 2:
-            return current_pos
-            
-        # Convert history to numpy array
-        history_array = np.array(history)
-        
-        # Check for spikes
-        if self._is_spike(current_pos, history_array[:-1]):
-            return history_array[-2]  # Return previous position
-            
-        # Calculate moving average
-        return np.mean(history_array, axis=0)
-        
-    def _is_spike(self, current_pos: np.ndarray, 
-                  history: np.ndarray) -> bool:
-        """Detect if current position is a spike."""
-        if len(history) < 2:
-            return False
-            
-        mean_pos = np.mean(history, axis=0)
-        std_pos = np.std(history, axis=0)
-        
-        # Check if current position deviates too much
-        z_score = np.abs((current_pos - mean_pos) / (std_pos + 1e-6))
-        return np.any(z_score > self.spike_threshold)
+        landmarks = self.get_landmark_array_from_frame(frame)
+        if landmarks is None:
+            return {}
+        return landmark_frame_to_dict(landmarks)
         
     def visualize_pose(self, frame: np.ndarray, 
                       landmarks: Dict[str, Tuple[float, float]]) -> np.ndarray:
@@ -261,141 +348,3 @@ class PoseDetector:
                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
             
         return frame_copy
-    
-class ViTPoseDetector:
-    def __init__(self, config_file="configs/vitpose/vitpose_base_coco.py", checkpoint_file="checkpoints/vitpose_base.pth"):
-        # Initialize ViTPose model
-        self.pose_model = init_pose_model(config_file, checkpoint_file, device='cuda' if torch.cuda.is_available() else 'cpu')
-        
-        # Optional detector model for person bounding boxes
-        self.detector_model = init_detector('configs/detection/faster_rcnn/faster_rcnn_r50_fpn_1x_coco.py',
-                                            'checkpoints/faster_rcnn_r50_fpn_1x_coco.pth',
-                                            device='cuda' if torch.cuda.is_available() else 'cpu')
-        
-        # Mapping ViTPose keypoints to standard names
-        self.body_parts_mapping = {
-            0: "nose", 1: "left_eye", 2: "right_eye", 3: "left_ear",
-            4: "right_ear", 5: "left_shoulder", 6: "right_shoulder",
-            7: "left_elbow", 8: "right_elbow", 9: "left_wrist",
-            10: "right_wrist", 11: "left_hip", 12: "right_hip",
-            13: "left_knee", 14: "right_knee", 15: "left_ankle",
-            16: "right_ankle"
-        }
-
-    def get_joint_positions_from_frame(self, frame):
-        """
-        Detect joint positions from a single frame using ViTPose and format them.
-
-        Args:
-            frame (np.array): Input frame image.
-
-        Returns:
-            dict: Joint positions formatted for process_video_with_rules.
-        """
-        det_results = inference_detector(self.detector_model, frame)
-        
-        # Use bounding boxes with high confidence
-        person_bboxes = [bbox[:4] for bbox in det_results[0] if bbox[4] > 0.5]
-
-        pose_results, _ = inference_top_down_pose_model(self.pose_model, frame, person_bboxes, format='xyxy', dataset='TopDownCocoDataset')
-
-        keypoints = {}
-        if pose_results:
-            person = pose_results[0]  # Assume single person
-            for i, part_name in self.body_parts_mapping.items():
-                x, y, score = person['keypoints'][i]
-                keypoints[part_name] = {"x": x, "y": y, "z": 0, "visibility": score}
-
-        return keypoints
-
-
-class OpenPoseDetector:
-    def __init__(self, model_folder="models/", net_resolution="-1x368", hand=True, face=False):
-        params = {
-            "model_folder": model_folder,
-            "net_resolution": net_resolution,
-            "hand": hand,
-            "face": face
-        }
-        self.opWrapper = op.WrapperPython()
-        self.opWrapper.configure(params)
-        self.opWrapper.start()
-        
-        # Define the mapping of OpenPose body parts to MediaPipe-like names
-        self.body_parts_mapping = {
-            0: "nose",
-            1: "left_eye_inner",
-            2: "left_eye",
-            3: "left_eye_outer",
-            4: "right_eye_inner",
-            5: "right_eye",
-            6: "right_eye_outer",
-            7: "left_ear",
-            8: "right_ear",
-            9: "left_shoulder",
-            10: "right_shoulder",
-            11: "left_elbow",
-            12: "right_elbow",
-            13: "left_wrist",
-            14: "right_wrist",
-            15: "left_hip",
-            16: "right_hip",
-            17: "left_knee",
-            18: "right_knee",
-            19: "left_ankle",
-            20: "right_ankle",
-            21: "left_heel",
-            22: "right_heel",
-            23: "left_foot_index",
-            24: "right_foot_index"
-        }
-        
-    def detect_pose_from_frame(self, frame):
-        """
-        Detects and reformats OpenPose keypoints from a single frame to match MediaPipe format.
-        
-        Args:
-            frame (np.array): Image frame from the video.
-
-        Returns:
-            dict: Detected keypoints in MediaPipe-compatible format.
-        """
-        datum = op.Datum()
-        datum.cvInputData = frame
-        self.opWrapper.emplaceAndPop([datum])
-
-        # Get body keypoints if available
-        body_keypoints = datum.poseKeypoints if datum.poseKeypoints is not None else np.empty((0, 0, 0))
-
-        # Convert OpenPose output to MediaPipe format
-        keypoints = {}
-        if body_keypoints.size > 0:
-            for i, part_name in self.body_parts_mapping.items():
-                # OpenPose provides (x, y, confidence) per keypoint
-                if i < body_keypoints.shape[1]:  # Check if the body part index is within range
-                    x, y, confidence = body_keypoints[0, i]  # Assuming single-person pose detection
-                    keypoints[part_name] = (x, y, 0, confidence)  # Z-coordinate set to 0 for 2D data
-        
-        return keypoints
-
-    def process_video(self, video_path):
-        """
-        Process an entire video, frame-by-frame, and extract poses.
-
-        Args:
-            video_path (str): Path to the video file.
-
-        Yields:
-            dict: Keypoints for each frame in MediaPipe-compatible format.
-        """
-        cap = cv2.VideoCapture(video_path)
-        
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            keypoints = self.detect_pose_from_frame(frame)
-            yield keypoints  # Each frame's keypoints are yielded for further processing
-        
-        cap.release()
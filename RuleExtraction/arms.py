@@ -26,18 +26,22 @@ class ArmRules:
         self.SLIGHT_FLEX_ANGLE = 80  # Slightly bent arm
         self.NINETY_DEG_RANGE = (80, 100)  # Range for "bent at 90 degrees"
 
-    def extract_arm_rules(self, landmarks: Dict[str, Tuple[float, float]], equipment_centers: List[Tuple[float, float]] = None) -> Dict[str, Dict[str, List[str]]]:
+    def extract_arm_rules(self, landmarks: Dict[str, Tuple[float, float]], equipment_centers: List[Tuple[float, float]] = None,
+                          time_delta: float = None) -> Dict[str, Dict[str, List[str]]]:
         """
         Extract comprehensive arm position and motion rules.
         
         Args:
             landmarks: Dictionary of landmark coordinates
             equipment_centers: Optional list of equipment center points
+            time_delta: Seconds since the previous analyzed frame; motion thresholds
+                scale with it (None means one frame at REFERENCE_FPS)
             
         Returns:
             Dictionary containing arm position and motion rules
         """
         arm_positions = get_empty_arm_position()
+        motion_scale = motion_threshold_scale(time_delta)
         
         # Process each arm component
         for side in ['left', 'right']:
@@ -59,10 +63,10 @@ class ArmRules:
                 
                 if prev_elbow is not None:
                     arm_positions[f'{side}_elbow']['motion'] = self._detect_motion(
-                        prev_elbow, elbow, shoulder)
+                        prev_elbow, elbow, shoulder, motion_scale)
                 if prev_hand is not None:
                     arm_positions[f'{side}_hand']['motion'] = self._detect_motion(
-                        prev_hand, hand, shoulder)
+                        prev_hand, hand, shoulder, motion_scale)
                 
                 # Update previous landmarks
                 self.previous_landmarks[f'{side}_elbow'] = elbow
@@ -137,35 +141,37 @@ class ArmRules:
         return positions
 
     def _detect_motion(self, prev_pos: Tuple[float, float], curr_pos: Tuple[float, float], 
-                      shoulder: Tuple[float, float]) -> List[str]:
+                      shoulder: Tuple[float, float], motion_scale: float = 1.0) -> List[str]:
         """Detect motion patterns between frames."""
         motions = []
+        vertical_threshold = self.VERTICAL_THRESHOLD * motion_scale
+        horizontal_threshold = self.HORIZONTAL_THRESHOLD * motion_scale
         
         # Calculate movement vectors
         movement = np.array(curr_pos) - np.array(prev_pos)
         relative_to_shoulder = np.array(curr_pos) - np.array(shoulder)
         
         # Vertical movements
-        if abs(movement[1]) > self.VERTICAL_THRESHOLD:
+        if abs(movement[1]) > vertical_threshold:
             if movement[1] < 0:
                 motions.append('vertical upward')
             else:
                 motions.append('vertical downward')
                 
         # Horizontal movements
-        if abs(movement[0]) > self.HORIZONTAL_THRESHOLD:
+        if abs(movement[0]) > horizontal_threshold:
             if movement[0] > 0:
                 motions.append('horizontal outward')
             else:
                 motions.append('horizontal inward')
                 
         # Check for rowing motion
-        if (movement[1] > self.VERTICAL_THRESHOLD and 
-            abs(movement[0]) > self.HORIZONTAL_THRESHOLD):
+        if (movement[1] > vertical_threshold and 
+            abs(movement[0]) > horizontal_threshold):
             motions.append('row')
             
         # Check for flexion/extension
-        if abs(movement[1]) < self.VERTICAL_THRESHOLD:
+        if abs(movement[1]) < vertical_threshold:
             if movement[0] < 0:
                 motions.append('flexion')
             else:
@@ -175,4 +181,99 @@ class ArmRules:
         if not motions:
             motions.append('stationary')
             
-        return motions
\ No newline at end of file
+        return motions
+
+    def extract_arm_rules_trajectory(self, trajectory: np.ndarray,
+                                     time_deltas: np.ndarray = None) -> Dict[str, Dict[str, Dict[str, np.ndarray]]]:
+        """
+        Extract arm rules for a whole landmark trajectory in one vectorized pass.
+        
+        Produces the same labels as calling extract_arm_rules on each frame in order.
+        
+        Args:
+            trajectory: (frames x 33 x 4) landmark array (x, y, z, visibility); only x, y are used
+            time_deltas: Optional (frames,) seconds since the previous frame
+            
+        Returns:
+            Dictionary mapping each arm landmark to {'position': {label: mask},
+            'motion': {label: mask}}, where each mask is a boolean array over frames
+        """
+        arm_masks = {}
+        motion_scale = trajectory_motion_scale(time_deltas, len(trajectory))
+        
+        for side in ['left', 'right']:
+            elbow = trajectory_joint(trajectory, f'{side}_elbow')
+            hand = trajectory_joint(trajectory, f'{side}_hand')
+            shoulder = trajectory_joint(trajectory, f'{side}_shoulder')
+            
+            arm_masks[f'{side}_elbow'] = {
+                'position': self._get_elbow_position_masks(shoulder, elbow, hand),
+                'motion': self._detect_motion_masks(elbow, motion_scale)
+            }
+            arm_masks[f'{side}_hand'] = {
+                'position': self._get_hand_position_masks(shoulder, elbow, hand),
+                'motion': self._detect_motion_masks(hand, motion_scale)
+            }
+        
+        return arm_masks
+
+    def _get_elbow_position_masks(self, shoulder: np.ndarray, elbow: np.ndarray,
+                                  hand: np.ndarray) -> Dict[str, np.ndarray]:
+        """Vectorized _get_elbow_position."""
+        angle = calculate_angle_batch(shoulder, elbow, hand)
+        
+        flexed = angle < self.FLEXION_ANGLE
+        slightly_flexed = ~flexed & (angle < self.SLIGHT_FLEX_ANGLE)
+        bent_90 = ~flexed & ~slightly_flexed & (
+            (angle >= self.NINETY_DEG_RANGE[0]) & (angle <= self.NINETY_DEG_RANGE[1]))
+        slightly_extended = ~flexed & ~slightly_flexed & ~bent_90 & (angle < self.EXTENSION_ANGLE)
+        extended = ~(flexed | slightly_flexed | bent_90 | slightly_extended)
+        
+        return {
+            'close to torso': np.abs(elbow[:, 0] - shoulder[:, 0]) < self.TORSO_PROXIMITY,
+            'flexed': flexed,
+            'slightly flexed': slightly_flexed,
+            'bent at 90 degrees': bent_90,
+            'slightly extended': slightly_extended,
+            'extended': extended
+        }
+
+    def _get_hand_position_masks(self, shoulder: np.ndarray, elbow: np.ndarray,
+                                 hand: np.ndarray) -> Dict[str, np.ndarray]:
+        """Vectorized _get_hand_position (equipment holding is not tracked per trajectory)."""
+        hand_elbow_diff = hand - elbow
+        vertical = np.abs(hand_elbow_diff[:, 1]) > np.abs(hand_elbow_diff[:, 0])
+        
+        shoulder_hand_diff = hand - shoulder
+        over_head = shoulder_hand_diff[:, 1] < -self.VERTICAL_THRESHOLD
+        
+        return {
+            'vertical upward': vertical & (hand_elbow_diff[:, 1] < 0),
+            'vertical downward': vertical & (hand_elbow_diff[:, 1] >= 0),
+            'horizontal outward': ~vertical & (hand_elbow_diff[:, 0] > 0),
+            'horizontal inward': ~vertical & (hand_elbow_diff[:, 0] <= 0),
+            'over head': over_head,
+            'over chest': ~over_head & (np.abs(shoulder_hand_diff[:, 0]) < self.HORIZONTAL_THRESHOLD)
+        }
+
+    def _detect_motion_masks(self, positions: np.ndarray, motion_scale: np.ndarray) -> Dict[str, np.ndarray]:
+        """Vectorized _detect_motion between consecutive frames."""
+        movement, has_prev = trajectory_movement(positions)
+        vertical_threshold = self.VERTICAL_THRESHOLD * motion_scale
+        horizontal_threshold = self.HORIZONTAL_THRESHOLD * motion_scale
+        
+        vertical = np.abs(movement[:, 1]) > vertical_threshold
+        horizontal = np.abs(movement[:, 0]) > horizontal_threshold
+        small_vertical = np.abs(movement[:, 1]) < vertical_threshold
+        
+        masks = {
+            'vertical upward': vertical & (movement[:, 1] < 0),
+            'vertical downward': vertical & (movement[:, 1] >= 0),
+            'horizontal outward': horizontal & (movement[:, 0] > 0),
+            'horizontal inward': horizontal & (movement[:, 0] <= 0),
+            'row': (movement[:, 1] > vertical_threshold) & horizontal,
+            'flexion': small_vertical & (movement[:, 0] < 0),
+            'extension': small_vertical & (movement[:, 0] >= 0)
+        }
+        masks['stationary'] = ~np.logical_or.reduce(list(masks.values()))
+        return {label: mask & has_prev for label, mask in masks.items()}
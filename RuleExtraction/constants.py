@@ -28,6 +28,31 @@ JOINT_KEYS = [
     'left_wrist', 'right_wrist', 'left_hip', 'right_hip',
     'left_knee', 'right_knee', 'left_ankle', 'right_ankle'
 ]
+# MediaPipe Pose landmark names, in landmark index order
+POSE_LANDMARK_NAMES = [
+    'nose', 'left_eye_inner', 'left_eye', 'left_eye_outer',
+    'right_eye_inner', 'right_eye', 'right_eye_outer',
+    'left_ear', 'right_ear', 'mouth_left', 'mouth_right',
+    'left_shoulder', 'right_shoulder', 'left_elbow', 'right_elbow',
+    'left_wrist', 'right_wrist', 'left_pinky', 'right_pinky',
+    'left_index', 'right_index', 'left_thumb', 'right_thumb',
+    'left_hip', 'right_hip', 'left_knee', 'right_knee',
+    'left_ankle', 'right_ankle', 'left_heel', 'right_heel',
+    'left_foot_index', 'right_foot_index'
+]
+# Rule-level joint names that are copies of a MediaPipe landmark
+LANDMARK_ALIASES = {
+    'left_hand': 'left_index',
+    'right_hand': 'right_index',
+    'left_foot': 'left_heel',
+    'right_foot': 'right_heel'
+}
+# Frame rate the motion thresholds in arms/legs/torso were tuned at (one frame step of the blender renders)
+REFERENCE_FPS = 30.0
+# Upper bound on the motion threshold scale for sparse sampling. Displacement between samples
+# stops growing with the gap once it spans a good part of a rep, so scaling further would only
+# hide motion (at 2x the arm thresholds are already 0.4 of the frame)
+MAX_MOTION_THRESHOLD_SCALE = 2.0
 # List of keys from arm and leg rules
 ARM_KEYS = ['left_hand', 'right_hand', 'left_elbow','right_elbow']
 LEG_KEYS = ['left_foot', 'right_foot', 'left_knee','right_knee']
@@ -1,15 +1,21 @@
 from exercise_analyzer import process_video_with_rules
 from GYMDetector import YOLOv7EquipmentDetector, PoseDetector
-from helper import get_video_path, calculate_rule_similarity
+from helper import get_video_path
 from constants import EQUIPMENTS
 from exercise_rules import build_exercise_rules_json, get_exercise_names
+from landmark_cache import LandmarkCache
+from frame_sampling import FrameSampler
+from rule_index import ReferenceRuleIndex
+from ranking import top_k_indices
 import json
 import os
 
 def analyze_single_video(video_path: str, 
                         equipment_detector: YOLOv7EquipmentDetector,
                         pose_detector: PoseDetector,
-                        exercise_rules: list):
+                        rule_index: ReferenceRuleIndex,
+                        landmark_cache: LandmarkCache = None,
+                        sampler: FrameSampler = None):
     """
     Analyze a single video and print detailed debugging information.
     
@@ -17,7 +23,9 @@ def analyze_single_video(video_path: str,
         video_path: Path to the video file
         equipment_detector: Initialized equipment detector
         pose_detector: Initialized pose detector
-        exercise_rules: List of exercise rules from exercise_rules.py
+        rule_index: Compiled index of the exercise rules from exercise_rules.py
+        landmark_cache: Optional LandmarkCache to replay stored landmarks from
+        sampler: Optional FrameSampler to analyze only a subset of frames
     """
     # Get video name without extension
     video_name = os.path.splitext(os.path.basename(video_path))[0].lower()
@@ -28,7 +36,9 @@ def analyze_single_video(video_path: str,
     extracted_rules = process_video_with_rules(
         video_path, 
         equipment_detector, 
-        pose_detector
+        pose_detector,
+        landmark_cache,
+        sampler
     )
     
     # Print extracted rules
@@ -38,28 +48,24 @@ def analyze_single_video(video_path: str,
     # Compare with each exercise in exercise_rules
     print("\nComparing with all known exercises:")
     similarities = []
-    for exercise in exercise_rules:
-        exercise_name = exercise['activity'].lower()
-        similarity = calculate_rule_similarity(
-            extracted_rules['body_landmarks'],
-            exercise['body_landmarks']
-        )
+    landmark_scores = rule_index.score_landmarks(extracted_rules['body_landmarks'])
+    for exercise_name, similarity in zip(rule_index.exercise_names, landmark_scores.tolist()):
         similarities.append((exercise_name, similarity))
         print(f"\nSimilarity with {exercise_name}: {similarity:.3f}")
         
-    # Sort and get top 3 matches
-    top_matches = sorted(similarities, key=lambda x: x[1], reverse=True)[:3]
-    sorted_similarities = sorted(similarities,key=lambda x: x[1], reverse=True)
+    # Get top 3 matches
+    top_matches = [similarities[i] for i in top_k_indices(landmark_scores, 3)]
     print("\nTop 3 Matches:")
     for i, (exercise, score) in enumerate(top_matches, 1):
         print(f"{i}. {exercise}: {score:.3f}")
     
     # Check if correct exercise was in top matches
     correct_rank = None
-    for i, (exercise, _) in enumerate(sorted_similarities, 1):
-        if exercise == video_name:
-            correct_rank = i
-            break
+    if video_name in rule_index.exercise_names:
+        # Rank in a stable descending sort, without sorting: better scores plus earlier ties
+        position = rule_index.exercise_names.index(video_name)
+        score = landmark_scores[position]
+        correct_rank = int((landmark_scores > score).sum() + (landmark_scores[:position] == score).sum()) + 1
     
     if correct_rank:
         print(f"\nCorrect exercise ({video_name}) was ranked: {correct_rank}")
@@ -84,6 +90,8 @@ def main():
     # Initialize detectors
     equipment_detector = YOLOv7EquipmentDetector(model_path, EQUIPMENTS)
     pose_detector = PoseDetector()
+    landmark_cache = LandmarkCache("./landmark_cache")
+    rule_index = ReferenceRuleIndex(exercise_rules)
     
     # Get available videos that match exercise rules
     video_list, target_exercise_names = get_video_path(video_root_dir, exercise_names)
@@ -108,7 +116,8 @@ def main():
                     video_list[idx],
                     equipment_detector,
                     pose_detector,
-                    exercise_rules
+                    rule_index,
+                    landmark_cache
                 )
             else:
                 print("Invalid video number!")
@@ -0,0 +1,144 @@
+import cv2
+import numpy as np
+from collections import Counter
+from typing import Dict, List
+
+class EquipmentDetectionScheduler:
+    """Runs the equipment detector on keyframes only, tracking detections in between."""
+
+    def __init__(self, warmup_frames: int = 5, keyframe_interval: int = 15,
+                 min_keyframes: int = 8, z_threshold: float = 2.58,
+                 track: bool = True, flow_width: int = 320):
+        """
+        Initialize the scheduler.
+
+        Args:
+            warmup_frames: Detect on this many leading frames unconditionally
+            keyframe_interval: After warmup, detect on every Nth frame
+            min_keyframes: Keyframes needed before the vote may be declared settled
+            z_threshold: One-sided z score the margin between the top-2 labels and the
+                rest must clear to stop early (None never stops early)
+            track: Propagate keyframe boxes with optical flow; otherwise repeat the
+                last keyframe's labels until the next keyframe
+            flow_width: Frame width optical flow runs at
+        """
+        if warmup_frames < 1 or keyframe_interval < 1:
+            raise ValueError("warmup_frames and keyframe_interval must be >= 1")
+        self.warmup_frames = warmup_frames
+        self.keyframe_interval = keyframe_interval
+        self.min_keyframes = min_keyframes
+        self.z_threshold = z_threshold
+        self.track = track
+        self.flow_width = flow_width
+        self.start()
+
+    def get_config(self) -> Dict:
+        """Settings that determine the scheduled labels, used for cache keys."""
+        return {
+            'warmup_frames': self.warmup_frames,
+            'keyframe_interval': self.keyframe_interval,
+            'min_keyframes': self.min_keyframes,
+            'z_threshold': self.z_threshold,
+            'track': self.track,
+            'flow_width': self.flow_width
+        }
+
+    def start(self):
+        """Reset per-video state."""
+        self.settled = False
+        self.detector_calls = 0
+        self._frame_count = 0
+        self._label_counts = Counter()
+        self._keyframe_counts = []
+        self._tracked = []  # (label, center) in flow-frame coordinates
+        self._prev_gray = None
+        self._scale = 1.0
+
+    def _is_keyframe(self, position: int) -> bool:
+        if position < self.warmup_frames:
+            return True
+        return (position - self.warmup_frames) % self.keyframe_interval == 0
+
+    def _flow_frame(self, frame: np.ndarray) -> np.ndarray:
+        """Downscaled grayscale frame for optical flow."""
+        self._scale = min(1.0, self.flow_width / frame.shape[1])
+        small = cv2.resize(frame, None, fx=self._scale, fy=self._scale, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def _track_boxes(self, gray: np.ndarray) -> List[str]:
+        """Move tracked box centers to the current frame and return the labels still in view."""
+        if not self._tracked or self._prev_gray is None:
+            return []
+        points = np.float32([center for _, center in self._tracked]).reshape(-1, 1, 2)
+        new_points, status, _ = cv2.calcOpticalFlowPyrLK(self._prev_gray, gray, points, None)
+        height, width = gray.shape[:2]
+        tracked = []
+        for (label, _), point, ok in zip(self._tracked, new_points.reshape(-1, 2), status.ravel()):
+            x, y = point
+            if ok and 0 <= x < width and 0 <= y < height:
+                tracked.append((label, (float(x), float(y))))
+        self._tracked = tracked
+        return [label for label, _ in tracked]
+
+    def _margin_settled(self, upper: str, lower: str) -> bool:
+        """One-sided z test that upper's per-keyframe count exceeds lower's."""
+        differences = np.array([counts[upper] - counts[lower] for counts in self._keyframe_counts], dtype=np.float64)
+        mean = differences.mean()
+        if mean <= 0:
+            return False
+        standard_error = differences.std(ddof=1) / np.sqrt(len(differences))
+        return standard_error == 0 or mean / standard_error > self.z_threshold
+
+    def _update_settled(self):
+        """
+        Stop once the set of most_common(2) labels is unlikely to change.
+
+        Only membership is tested, since equipment similarity compares label sets;
+        the order of two labels that always appear together may never settle.
+        """
+        if self.z_threshold is None or len(self._keyframe_counts) < self.min_keyframes:
+            return
+        ranked = [label for label, _ in self._label_counts.most_common(3)]
+        if not ranked:
+            return
+        # Margin between the last label in the vote and the best one outside it;
+        # None stands for a label not seen yet, which counts zero on every keyframe
+        last_in = ranked[min(2, len(ranked)) - 1]
+        first_out = ranked[2] if len(ranked) > 2 else None
+        self.settled = self._margin_settled(last_in, first_out)
+
+    def process(self, frame: np.ndarray, equipment_detector) -> List[str]:
+        """
+        Equipment labels for the next analyzed frame.
+
+        Args:
+            frame: BGR image as numpy array
+            equipment_detector: Initialized equipment detector, only called on keyframes
+
+        Returns:
+            Detected (keyframe) or tracked labels; empty once the vote has settled
+        """
+        if self.settled:
+            return []
+        position = self._frame_count
+        self._frame_count += 1
+        gray = self._flow_frame(frame) if self.track else None
+        is_keyframe = self._is_keyframe(position)
+
+        if is_keyframe:
+            detections = equipment_detector.detect_equipment(frame)
+            self.detector_calls += 1
+            labels = [det['label'] for det in detections]
+            self._tracked = [(det['label'], (det['center'][0] * self._scale, det['center'][1] * self._scale))
+                             for det in detections]
+            self._keyframe_counts.append(Counter(labels))
+        elif self.track:
+            labels = self._track_boxes(gray)
+        else:
+            labels = [label for label, _ in self._tracked]
+
+        self._prev_gray = gray
+        self._label_counts.update(labels)
+        if is_keyframe:
+            self._update_settled()
+        return labels
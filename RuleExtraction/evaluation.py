@@ -0,0 +1,77 @@
+import numpy as np
+from typing import Dict, List
+
+def expected_ranks(score_matrix: np.ndarray, expected: np.ndarray) -> np.ndarray:
+    """
+    Rank of each video's expected exercise among all exercises.
+
+    Ranks follow a stable descending sort of each row: exercises with a higher
+    score, or an equal score and a lower index, rank ahead.
+
+    Args:
+        score_matrix: (N x M) similarity of every video to every exercise
+        expected: (N,) index of the expected exercise per video, -1 if unknown
+
+    Returns:
+        (N,) 1-based ranks, 0 where the expected exercise is unknown
+    """
+    expected = np.asarray(expected)
+    known = expected >= 0
+    ranks = np.zeros(len(expected), dtype=np.int64)
+    if not known.any():
+        return ranks
+    rows = score_matrix[known]
+    targets = expected[known]
+    target_scores = rows[np.arange(len(rows)), targets][:, None]
+    earlier = np.arange(score_matrix.shape[1])[None, :] < targets[:, None]
+    ranks[known] = ((rows > target_scores) | ((rows == target_scores) & earlier)).sum(axis=1) + 1
+    return ranks
+
+def top_k_accuracy(ranks: np.ndarray, k: int) -> float:
+    """Fraction of videos with a known expected exercise ranked within the top k."""
+    known = ranks > 0
+    return float((ranks[known] <= k).mean()) if known.any() else 0.0
+
+def confusion_matrix(score_matrix: np.ndarray, expected: np.ndarray) -> np.ndarray:
+    """
+    Counts of expected exercise (rows) against top-1 predicted exercise (columns).
+
+    Args:
+        score_matrix: (N x M) similarity of every video to every exercise
+        expected: (N,) index of the expected exercise per video, -1 if unknown
+
+    Returns:
+        (M x M) int array
+    """
+    expected = np.asarray(expected)
+    num_exercises = score_matrix.shape[1]
+    known = expected >= 0
+    # argmax returns the first maximum, matching the stable ranking's top-1
+    predicted = score_matrix[known].argmax(axis=1)
+    counts = np.zeros((num_exercises, num_exercises), dtype=np.int64)
+    np.add.at(counts, (expected[known], predicted), 1)
+    return counts
+
+def evaluate_corpus(score_matrix: np.ndarray, expected_names: List[str], exercise_names: List[str]) -> Dict:
+    """
+    Corpus-level accuracy from a batch score matrix.
+
+    Args:
+        score_matrix: (N x M) output of ReferenceRuleIndex.score_matrices()['total']
+        expected_names: Expected exercise name per video
+        exercise_names: Exercise name per score_matrix column
+
+    Returns:
+        Dictionary with 'ranks', 'top1_accuracy', 'top3_accuracy', 'confusion'
+        and 'unknown' (expected names missing from exercise_names)
+    """
+    column = {name.lower(): i for i, name in reversed(list(enumerate(exercise_names)))}
+    expected = np.array([column.get(name.lower(), -1) for name in expected_names], dtype=np.int64)
+    ranks = expected_ranks(score_matrix, expected)
+    return {
+        'ranks': ranks,
+        'top1_accuracy': top_k_accuracy(ranks, 1),
+        'top3_accuracy': top_k_accuracy(ranks, 3),
+        'confusion': confusion_matrix(score_matrix, expected),
+        'unknown': sorted({name for name, idx in zip(expected_names, expected) if idx < 0})
+    }
@@ -2,6 +2,14 @@ from arms import ArmRules
 from legs import LegRules
 from torso import TorsoRules
 from helper import *
+from landmarks import LandmarkSequence
+from smoothing import filter_trajectory
+from pose_backends import get_pose_detector
+from ranking import rank_top_k, equipment_upper_bound
+from landmark_cache import LandmarkCache
+from frame_sampling import FrameSampler
+from video_pipeline import collect_video_landmarks_pipelined
+from equipment_scheduler import EquipmentDetectionScheduler
 from collections import Counter, defaultdict
 import json
 import cv2
@@ -16,21 +24,23 @@ class ExerciseRuleExtractor:
         self.torso_rules = TorsoRules()
         self.current_activity = None
         
-    def extract_all_rules(self, landmarks: Dict, equipment_centers: List[Tuple[float, float]] = None) -> Dict:
+    def extract_all_rules(self, landmarks: Dict, equipment_centers: List[Tuple[float, float]] = None,
+                          time_delta: float = None) -> Dict:
         """
         Extract all rules for the current frame and format them according to results.json structure.
         
         Args:
             landmarks: Dictionary of landmark coordinates
             equipment_centers: Optional list of equipment center points
+            time_delta: Seconds since the previous analyzed frame, used to scale motion thresholds
             
         Returns:
             Dictionary formatted like results.json entries
         """
         # Extract rules from each component
-        arm_positions = self.arm_rules.extract_arm_rules(landmarks, equipment_centers)
-        leg_positions = self.leg_rules.extract_leg_rules(landmarks)
-        torso_positions = self.torso_rules.extract_torso_rules(landmarks)
+        arm_positions = self.arm_rules.extract_arm_rules(landmarks, equipment_centers, time_delta)
+        leg_positions = self.leg_rules.extract_leg_rules(landmarks, time_delta)
+        torso_positions = self.torso_rules.extract_torso_rules(landmarks, time_delta)
         
         # Combine all rules into results.json format
         body_landmarks = {}
@@ -51,54 +61,188 @@ class ExerciseRuleExtractor:
                 body_landmarks[key] = torso_positions[key]
         
         return body_landmarks
+        
+    def extract_trajectory_rules(self, trajectory: np.ndarray, time_deltas: np.ndarray = None) -> Dict:
+        """
+        Extract rule label masks for a whole landmark trajectory in one vectorized pass.
+        
+        Args:
+            trajectory: (frames x 33 x 4) landmark array (x, y, z, visibility); only x, y are used
+            time_deltas: Optional (frames,) seconds since the previous frame
+            
+        Returns:
+            Dictionary mapping each landmark to {'position': {label: mask},
+            'motion': {label: mask}}, keyed in the same order as extract_all_rules
+        """
+        arm_masks = self.arm_rules.extract_arm_rules_trajectory(trajectory, time_deltas)
+        leg_masks = self.leg_rules.extract_leg_rules_trajectory(trajectory, time_deltas)
+        torso_masks = self.torso_rules.extract_torso_rules_trajectory(trajectory, time_deltas)
+        
+        body_landmarks = {}
+        for key in ['left_elbow', 'right_elbow', 'left_hand', 'right_hand']:
+            body_landmarks[key] = arm_masks[key]
+        for key in ['left_knee', 'right_knee', 'left_foot', 'right_foot']:
+            body_landmarks[key] = leg_masks[key]
+        for key in ['torso', 'left_hip', 'right_hip', 'left_shoulder', 'right_shoulder']:
+            body_landmarks[key] = torso_masks[key]
+        
+        return body_landmarks
 
-def process_video_with_rules(video_path: str, equipment_detector, pose_detector) -> Dict:
+def most_common_labels(label_masks: Dict[str, np.ndarray], n: int = 3) -> List[str]:
     """
-    Process video and extract exercise rules with equipment detection.
+    Pick the n most frequent labels from per-frame label masks.
+    
+    Ties are broken the way Counter.most_common breaks them on the per-frame
+    label lists: by first occurrence, frame first and then label order.
+    
+    Args:
+        label_masks: Mapping of label to boolean mask over frames, in label order
+        n: Number of labels to return
+        
+    Returns:
+        List of up to n labels
+    """
+    ranked = []
+    for order, (label, mask) in enumerate(label_masks.items()):
+        count = int(np.count_nonzero(mask))
+        if count:
+            ranked.append((-count, int(np.argmax(mask)), order, label))
+    ranked.sort()
+    return [label for _, _, _, label in ranked[:n]]
+
+def frame_time_deltas(frames: Dict) -> np.ndarray:
+    """
+    Seconds between consecutive analyzed frames.
+    
+    Args:
+        frames: Output of collect_video_landmarks (or a landmark cache entry)
+        
+    Returns:
+        (frames,) array; the first entry is one native frame period
+    """
+    frame_indices = np.asarray(frames['frame_indices'], dtype=np.float64)
+    if not len(frame_indices):
+        return frame_indices
+    return np.diff(frame_indices, prepend=frame_indices[0] - 1) / frames['fps']
+
+def detect_equipment_labels(equipment_detector, frames: List[np.ndarray]) -> List[List[str]]:
+    """
+    Run batched equipment detection and keep only the labels.
+    
+    Args:
+        equipment_detector: Initialized equipment detector
+        frames: BGR frames to detect on in one forward pass
+        
+    Returns:
+        Detected equipment labels per frame
+    """
+    return [[det['label'] for det in detections]
+            for detections in equipment_detector.detect_equipment_batch(frames)]
+
+def collect_video_landmarks(video_path: str, equipment_detector, pose_detector,
+                            sampler: FrameSampler = None, equipment_batch_size: int = 1,
+                            equipment_scheduler: EquipmentDetectionScheduler = None) -> Dict:
+    """
+    Run equipment and pose detection over a video and keep compact per-frame results.
     
     Args:
         video_path: Path to the video file
         equipment_detector: Initialized equipment detector
         pose_detector: Initialized pose detector
+        sampler: Optional FrameSampler choosing which frames to analyze; skipped
+            frames are only grabbed, never retrieved or run through the detectors
+        equipment_batch_size: Number of frames per equipment detector forward pass
+        equipment_scheduler: Optional EquipmentDetectionScheduler; equipment is then
+            detected on keyframes only and tracked in between
         
     Returns:
-        Dictionary containing complete exercise analysis
+        Dictionary with 'landmarks' (frames x 33 x 4 float32 x, y, z, visibility), 'frame_indices',
+        'equipment' (detected labels per frame) and 'fps'. Only frames with a
+        detected pose are kept.
     """
+    if equipment_scheduler is not None and equipment_batch_size > 1:
+        raise ValueError("Keyframe equipment scheduling runs one frame at a time and cannot be batched")
+    
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         raise FileNotFoundError(f"Could not open video: {video_path}")
     
-    rule_extractor = ExerciseRuleExtractor()
-    equipment_counter = Counter()
-    all_frames_landmarks = []
-    aggregated_landmarks = defaultdict(lambda: defaultdict(list))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    if sampler is None:
+        sampler = FrameSampler()
+    sampler.start(fps)
+    if equipment_scheduler is not None:
+        equipment_scheduler.start()
+    pose_detector.reset()
+    landmark_rows = LandmarkSequence()
+    frame_indices = []
+    equipment_labels = []
+    pending_frames = []
+    frame_idx = 0
+    next_analyzed = 0
     
     while cap.isOpened():
+        if frame_idx < next_analyzed:
+            # Advance past the frame without retrieving/converting it
+            if not cap.grab():
+                break
+            frame_idx += 1
+            continue
+        
         ret, frame = cap.read()
         if not ret:
             break
             
-        # Detect equipment and pose
-        detected_equipment = equipment_detector.detect_equipment(frame)
-        joint_positions = pose_detector.get_joint_positions_from_frame(frame)
+        # Detect pose
+        landmark_row = pose_detector.get_landmark_array_from_frame(frame)
         
-        if joint_positions:
-            # Get equipment centers (if implemented in your equipment detector)
-            equipment_centers = []  # Implement if available from your detector
-            
-            # Extract rules for current frame
-            frame_rules = rule_extractor.extract_all_rules(joint_positions, equipment_centers)
-            
-            # Aggregate rules across frames
-            for landmark, data in frame_rules.items():
-                for rule_type in ['position', 'motion']:
-                    if rule_type in data:
-                        aggregated_landmarks[landmark][rule_type].extend(data[rule_type])
-            
-            # Update equipment counter
-            equipment_counter.update(detected_equipment)
+        if landmark_row is not None:
+            landmark_rows.append(landmark_row)
+            frame_indices.append(frame_idx)
+            # Equipment is only kept for frames with a pose, so only those are queued for detection
+            if equipment_scheduler is not None:
+                equipment_labels.append(equipment_scheduler.process(frame, equipment_detector))
+            else:
+                pending_frames.append(frame)
+                if len(pending_frames) >= equipment_batch_size:
+                    equipment_labels.extend(detect_equipment_labels(equipment_detector, pending_frames))
+                    pending_frames = []
+        next_analyzed = frame_idx + sampler.next_stride(
+            frame_idx, None if landmark_row is None else landmark_row[:, :2])
+        frame_idx += 1
     
     cap.release()
+    if pending_frames:
+        equipment_labels.extend(detect_equipment_labels(equipment_detector, pending_frames))
+    
+    return {
+        'landmarks': landmark_rows.array.copy(),
+        'frame_indices': np.asarray(frame_indices, dtype=np.int32),
+        'equipment': equipment_labels,
+        'fps': fps
+    }
+
+def extract_rules_from_landmarks(frames: Dict, trajectory_mode: bool = True,
+                                 trajectory_filter: str = None, sampled: bool = False) -> Dict:
+    """
+    Extract and aggregate exercise rules from collected per-frame landmarks.
+    
+    Args:
+        frames: Output of collect_video_landmarks (or a landmark cache entry)
+        trajectory_mode: Classify all frames in one vectorized pass instead of
+            running the rule classes frame by frame; both give the same rules
+        trajectory_filter: Optional smoothing.TRAJECTORY_FILTERS name applied to the
+            landmarks first
+        sampled: The frames were picked by a FrameSampler; motion thresholds then scale
+            with the time between analyzed frames, otherwise they stay per frame
+        
+    Returns:
+        Dictionary containing complete exercise analysis
+    """
+    rule_extractor = ExerciseRuleExtractor()
+    equipment_counter = Counter()
+    for labels in frames['equipment']:
+        equipment_counter.update(labels)
     
     # Process aggregated rules
     final_rules = {
@@ -111,6 +255,39 @@ def process_video_with_rules(video_path: str, equipment_detector, pose_detector)
         }
     }
     
+    time_deltas = frame_time_deltas(frames)
+    if trajectory_filter is not None:
+        frames = filter_trajectory(frames, trajectory_filter, time_deltas)
+    # Only sampled runs scale motion thresholds with the real time between analyzed frames
+    motion_deltas = time_deltas if sampled else None
+    
+    if trajectory_mode:
+        if len(frames['landmarks']):
+            label_masks = rule_extractor.extract_trajectory_rules(frames['landmarks'], motion_deltas)
+            for landmark, data in label_masks.items():
+                final_rules['body_landmarks'][landmark] = {
+                    'position': most_common_labels(data['position']),
+                    'motion': most_common_labels(data['motion'])
+                }
+        return final_rules
+    
+    aggregated_landmarks = defaultdict(lambda: defaultdict(list))
+    for frame_number, landmark_row in enumerate(frames['landmarks']):
+        joint_positions = landmark_array_to_dict(landmark_row)
+        
+        # Get equipment centers (if implemented in your equipment detector)
+        equipment_centers = []  # Implement if available from your detector
+        
+        # Extract rules for current frame
+        time_delta = float(motion_deltas[frame_number]) if motion_deltas is not None else None
+        frame_rules = rule_extractor.extract_all_rules(joint_positions, equipment_centers, time_delta)
+        
+        # Aggregate rules across frames
+        for landmark, data in frame_rules.items():
+            for rule_type in ['position', 'motion']:
+                if rule_type in data:
+                    aggregated_landmarks[landmark][rule_type].extend(data[rule_type])
+    
     # Convert aggregated landmarks to most common rules
     for landmark, data in aggregated_landmarks.items():
         final_rules['body_landmarks'][landmark] = {
@@ -120,6 +297,58 @@ def process_video_with_rules(video_path: str, equipment_detector, pose_detector)
     
     return final_rules
 
+def process_video_with_rules(video_path: str, equipment_detector, pose_detector,
+                             landmark_cache: LandmarkCache = None,
+                             sampler: FrameSampler = None,
+                             pipelined: bool = False,
+                             equipment_batch_size: int = 1,
+                             equipment_scheduler: EquipmentDetectionScheduler = None,
+                             trajectory_filter: str = None) -> Dict:
+    """
+    Process video and extract exercise rules with equipment detection.
+    
+    Args:
+        video_path: Path to the video file
+        equipment_detector: Initialized equipment detector
+        pose_detector: Initialized pose detector, or a pose_backends name such as
+            'mediapipe' or 'vitpose' to use that backend's default detector
+        landmark_cache: Optional LandmarkCache; on a hit the stored landmarks are
+            replayed instead of decoding the video and re-running the detectors
+        sampler: Optional FrameSampler (stride, target fps or adaptive); None
+            analyzes every frame
+        pipelined: Decode, pose and equipment detection on separate threads
+            (see video_pipeline.py) instead of in lockstep
+        equipment_batch_size: Frames per equipment detector forward pass
+        equipment_scheduler: Optional EquipmentDetectionScheduler to detect equipment
+            on keyframes only
+        trajectory_filter: Optional offline smoothing ('one_euro' or 'savgol') applied
+            to the landmarks before rule extraction; cache entries stay unfiltered
+        
+    Returns:
+        Dictionary containing complete exercise analysis
+    """
+    if isinstance(pose_detector, str):
+        pose_detector = get_pose_detector(pose_detector)
+    frames = None
+    if landmark_cache is not None:
+        equipment_config = equipment_detector.get_config()
+        if equipment_scheduler is not None:
+            equipment_config['schedule'] = equipment_scheduler.get_config()
+        cache_key = landmark_cache.make_key(
+            video_path, pose_detector.get_config(), equipment_config,
+            sampler.get_config() if sampler is not None else None)
+        frames = landmark_cache.load(cache_key)
+        
+    if frames is None:
+        collect = collect_video_landmarks_pipelined if pipelined else collect_video_landmarks
+        frames = collect(video_path, equipment_detector, pose_detector, sampler,
+                         equipment_batch_size, equipment_scheduler)
+        if landmark_cache is not None:
+            landmark_cache.save(cache_key, frames)
+    
+    # Rules always come from the stored float32 landmarks so cached and fresh runs agree
+    return extract_rules_from_landmarks(frames, trajectory_filter=trajectory_filter, sampled=sampler is not None)
+
 def compare_with_reference_exercises(extracted_rules: Dict, reference_json: str, top_n: int = 3) -> List[Tuple[str, float]]:
     """
     Compare extracted rules with reference exercises and find best matches.
@@ -135,11 +364,11 @@ def compare_with_reference_exercises(extracted_rules: Dict, reference_json: str,
     with open(reference_json, 'r') as f:
         reference_data = json.load(f)
     
-    matches = []
-    detailed_matches = {}
-    
-    for exercise in reference_data:
-        score, details = calculate_similarity_with_details(extracted_rules, exercise)
-        matches.append((exercise['activity'], score))
-        detailed_matches[exercise['activity']] = details
-    return sorted(matches, key=lambda x: x[1], reverse=True)[:top_n]
\ No newline at end of file
+    # Exercises whose equipment score leaves them unable to reach the current top N are never fully scored
+    ranked = rank_top_k(
+        reference_data,
+        lambda exercise: calculate_similarity_with_details(extracted_rules, exercise)[0],
+        top_n,
+        bound_fn=lambda exercise: equipment_upper_bound(extracted_rules, exercise)
+    )
+    return [(exercise['activity'], score) for exercise, score in ranked]
\ No newline at end of file
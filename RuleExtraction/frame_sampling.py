@@ -0,0 +1,72 @@
+import numpy as np
+from typing import Dict, Optional
+
+class FrameSampler:
+    """Decides which decoded video frames are sent through the detectors."""
+
+    def __init__(self, stride: int = 1, target_fps: float = None,
+                 adaptive_threshold: float = None):
+        """
+        Initialize the frame sampler.
+
+        Args:
+            stride: Analyze every Nth frame
+            target_fps: Analyze at roughly this rate instead of a fixed stride
+            adaptive_threshold: If set, drop to every frame while any landmark moves
+                faster than this (normalized units per frame), and return to the base
+                stride once motion settles
+        """
+        if stride < 1:
+            raise ValueError(f"stride must be >= 1, got {stride}")
+        if target_fps is not None and target_fps <= 0:
+            raise ValueError(f"target_fps must be positive, got {target_fps}")
+        self.stride = stride
+        self.target_fps = target_fps
+        self.adaptive_threshold = adaptive_threshold
+        self.start(30.0)
+
+    def get_config(self) -> Dict:
+        """Settings that determine which frames get analyzed, used for cache keys."""
+        return {
+            'stride': self.stride,
+            'target_fps': self.target_fps,
+            'adaptive_threshold': self.adaptive_threshold
+        }
+
+    def start(self, video_fps: float):
+        """
+        Reset per-video state.
+
+        Args:
+            video_fps: Native frame rate of the video about to be sampled
+        """
+        if self.target_fps:
+            self.base_stride = max(1, int(round(video_fps / self.target_fps)))
+        else:
+            self.base_stride = self.stride
+        self._prev_landmarks = None
+        self._prev_frame_idx = None
+
+    def next_stride(self, frame_idx: int, landmarks: Optional[np.ndarray] = None) -> int:
+        """
+        Number of frames to advance after analyzing frame_idx.
+
+        Args:
+            frame_idx: Index of the frame just analyzed
+            landmarks: (33, 2) landmark array for that frame, or None if no pose was found
+
+        Returns:
+            Stride to the next analyzed frame
+        """
+        if self.adaptive_threshold is None or landmarks is None:
+            return self.base_stride
+
+        stride = self.base_stride
+        if self._prev_landmarks is not None:
+            elapsed = frame_idx - self._prev_frame_idx
+            speed = np.max(np.abs(landmarks - self._prev_landmarks)) / elapsed
+            if speed > self.adaptive_threshold:
+                stride = 1
+        self._prev_landmarks = landmarks
+        self._prev_frame_idx = frame_idx
+        return stride
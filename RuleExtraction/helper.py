@@ -1,12 +1,14 @@
 # math_helper.py
 import os
-import mediapipe as mp
+import json
 import math
-import cv2
 from typing import Tuple
 from typing import Dict, List, Set, Tuple
 from collections import defaultdict
 import numpy as np
+from constants import MAX_MOTION_THRESHOLD_SCALE, REFERENCE_FPS
+from landmarks import LandmarkSequence, joint_index, landmark_frame_to_dict
+from ranking import rank_top_k
 
 def calculate_rule_similarity(extracted_rules: dict, reference_rules: dict, 
                             weights: dict = {
@@ -194,17 +196,12 @@ def find_matching_activities(extracted_rules: Dict, results_json: Dict, top_n: i
     Returns:
         List of tuples containing (activity_name, similarity_score)
     """
-    scores = []
-    
-    for exercise in results_json['exercises']:
-        activity_name = exercise['activity']
-        reference_rules = exercise['body_landmarks']
-        
-        similarity = calculate_rule_similarity(extracted_rules, reference_rules)
-        scores.append((activity_name, similarity))
-    
-    # Sort by similarity score and return top N
-    return sorted(scores, key=lambda x: x[1], reverse=True)[:top_n]
+    ranked = rank_top_k(
+        results_json['exercises'],
+        lambda exercise: calculate_rule_similarity(extracted_rules, exercise['body_landmarks']),
+        top_n
+    )
+    return [(exercise['activity'], similarity) for exercise, similarity in ranked]
 
 def format_extracted_rules(arm_rules: Dict, leg_rules: Dict, torso_rules: Dict, 
                          equipment_detected: List[str]) -> Dict:
@@ -258,6 +255,25 @@ def calculate_angle(a: Tuple[float, float], b: Tuple[float, float], c: Tuple[flo
     angle = angle + 360 if angle < 0 else angle
     return angle
 
+def calculate_angle_batch(a: np.ndarray, b: np.ndarray, c: np.ndarray) -> np.ndarray:
+    """
+    Vectorized calculate_angle over arrays of points.
+
+    Args:
+        a (np.ndarray): (N, 2) coordinates of point a.
+        b (np.ndarray): (N, 2) coordinates of point b.
+        c (np.ndarray): (N, 2) coordinates of point c.
+
+    Returns:
+        np.ndarray: (N,) angles in degrees at point b, in [0, 360).
+    """
+    ab = a - b
+    cb = c - b
+    dot_product = ab[:, 0] * cb[:, 0] + ab[:, 1] * cb[:, 1]
+    determinant = ab[:, 0] * cb[:, 1] - ab[:, 1] * cb[:, 0]
+    angle = np.degrees(np.arctan2(determinant, dot_product))
+    return np.where(angle < 0, angle + 360, angle)
+
 def calculate_distance(a: Tuple[float, float], b: Tuple[float, float]) -> float:
     """
     Calculates the Euclidean distance between two points.
@@ -271,11 +287,25 @@ def calculate_distance(a: Tuple[float, float], b: Tuple[float, float]) -> float:
     """
     return math.hypot(a[0] - b[0], a[1] - b[1])
 
-def get_joint_positions_from_video_old(video_path):
+def get_joint_positions_from_video_old(video_path) -> LandmarkSequence:
+    """
+    Run raw (unsmoothed) MediaPipe Pose over every frame of a video.
+
+    Args:
+        video_path: Path to the video file
+
+    Returns:
+        LandmarkSequence with one (33, 4) x, y, z, visibility frame per frame with a
+        detected pose, not a list of per-frame joint dicts. landmark_array_to_dict(seq.frame(i))
+        gives frame i as the old {name: (x, y)} dict, and seq.joint(name) gives one joint's
+        (frames, 2) track; both accept the hand/foot aliases
+    """
+    import cv2
+    import mediapipe as mp
     mp_pose = mp.solutions.pose
     pose = mp_pose.Pose(static_image_mode=False, min_detection_confidence=0.5, min_tracking_confidence=0.5)
     cap = cv2.VideoCapture(video_path)
-    joint_positions_over_time = []
+    joint_positions_over_time = LandmarkSequence()
     while cap.isOpened():
         ret, frame = cap.read()
         if not ret:
@@ -283,66 +313,82 @@ def get_joint_positions_from_video_old(video_path):
         image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         results_pose = pose.process(image)
         if results_pose.pose_landmarks:
-            landmarks = results_pose.pose_landmarks.landmark
-            joint_positions = {
-                'left_shoulder': (landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].x,
-                                  landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].y),
-                'right_shoulder': (landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER.value].x,
-                                   landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER.value].y),
-                'left_elbow': (landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value].x,
-                               landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value].y),
-                'right_elbow': (landmarks[mp_pose.PoseLandmark.RIGHT_ELBOW.value].x,
-                                landmarks[mp_pose.PoseLandmark.RIGHT_ELBOW.value].y),
-                'left_wrist': (landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value].x,
-                               landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value].y),
-                'right_wrist': (landmarks[mp_pose.PoseLandmark.RIGHT_WRIST.value].x,
-                                landmarks[mp_pose.PoseLandmark.RIGHT_WRIST.value].y),
-                'left_hip': (landmarks[mp_pose.PoseLandmark.LEFT_HIP.value].x,
-                             landmarks[mp_pose.PoseLandmark.LEFT_HIP.value].y),
-                'right_hip': (landmarks[mp_pose.PoseLandmark.RIGHT_HIP.value].x,
-                              landmarks[mp_pose.PoseLandmark.RIGHT_HIP.value].y),
-                'left_knee': (landmarks[mp_pose.PoseLandmark.LEFT_KNEE.value].x,
-                              landmarks[mp_pose.PoseLandmark.LEFT_KNEE.value].y),
-                'right_knee': (landmarks[mp_pose.PoseLandmark.RIGHT_KNEE.value].x,
-                               landmarks[mp_pose.PoseLandmark.RIGHT_KNEE.value].y),
-                'left_ankle': (landmarks[mp_pose.PoseLandmark.LEFT_ANKLE.value].x,
-                               landmarks[mp_pose.PoseLandmark.LEFT_ANKLE.value].y),
-                'right_ankle': (landmarks[mp_pose.PoseLandmark.RIGHT_ANKLE.value].x,
-                                landmarks[mp_pose.PoseLandmark.RIGHT_ANKLE.value].y),
-                # 'nose': (landmarks[mp_pose.PoseLandmark.NOSE.value].x,
-                        #  landmarks[mp_pose.PoseLandmark.NOSE.value].y),
-                'left_foot': (landmarks[mp_pose.PoseLandmark.LEFT_HEEL.value].x,
-                              landmarks[mp_pose.PoseLandmark.LEFT_HEEL.value].y),
-                'right_foot': (landmarks[mp_pose.PoseLandmark.RIGHT_HEEL.value].x,
-                               landmarks[mp_pose.PoseLandmark.RIGHT_HEEL.value].y),
-                'left_hand': (landmarks[mp_pose.PoseLandmark.LEFT_INDEX.value].x,
-                              landmarks[mp_pose.PoseLandmark.LEFT_INDEX.value].y),
-                'right_hand': (landmarks[mp_pose.PoseLandmark.RIGHT_INDEX.value].x,
-                               landmarks[mp_pose.PoseLandmark.RIGHT_INDEX.value].y),
-
-                # 'back': (
-
-                #     (landmarks[mp_pose.PoseLandmark.NOSE.value].x +
-
-                #      landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].x +
-
-                #      landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER.value].x) / 3,
-
-                #     (landmarks[mp_pose.PoseLandmark.NOSE.value].y +
-
-                #      landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].y +
-
-                #      landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER.value].y) / 3
-
-                # )
-            }
-            joint_positions_over_time.append(joint_positions)
+            joint_positions_over_time.append([(lm.x, lm.y, lm.z, lm.visibility)
+                                              for lm in results_pose.pose_landmarks.landmark])
+    cap.release()
+    return joint_positions_over_time
 
-    
+def landmark_array_to_dict(landmark_row) -> Dict[str, Tuple[float, float]]:
+    """
+    Convert one frame of landmarks back into the joint dictionary the rule classes expect.
 
-    cap.release()
+    Args:
+        landmark_row: (33, 4) x, y, z, visibility array (or (33, 2) x, y) in PoseJoint order
 
-    return joint_positions_over_time
+    Returns:
+        Dictionary mapping landmark names (plus hand/foot aliases) to (x, y) tuples
+    """
+    return landmark_frame_to_dict(landmark_row)
+
+def trajectory_joint(trajectory: np.ndarray, name: str) -> np.ndarray:
+    """
+    Select one joint's (x, y) track from a landmark trajectory.
+
+    Args:
+        trajectory: (frames, 33, 4) (or (frames, 33, 2)) array in PoseJoint order
+        name: Landmark name, or one of the hand/foot aliases
+
+    Returns:
+        (frames, 2) float64 array
+    """
+    index = joint_index(name)
+    return np.asarray(trajectory[:, index, :2], dtype=np.float64)
+
+def trajectory_movement(points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Frame-to-frame displacement of a joint track.
+
+    Args:
+        points: (frames, 2) array of positions
+
+    Returns:
+        tuple: (movement, has_prev) where movement[t] = points[t] - points[t-1]
+        and has_prev is False for the first frame, which has no motion
+    """
+    movement = np.zeros_like(points)
+    movement[1:] = points[1:] - points[:-1]
+    has_prev = np.arange(len(points)) > 0
+    return movement, has_prev
+
+def motion_threshold_scale(time_delta: float = None) -> float:
+    """
+    Factor for per-frame motion thresholds when samples are time_delta seconds apart.
+
+    Args:
+        time_delta: Seconds since the previous analyzed frame, or None for one reference frame
+
+    Returns:
+        float: 1.0 at the reference frame rate, proportionally larger for sparser sampling
+            up to MAX_MOTION_THRESHOLD_SCALE
+    """
+    if time_delta is None:
+        return 1.0
+    return min(time_delta * REFERENCE_FPS, MAX_MOTION_THRESHOLD_SCALE)
+
+def trajectory_motion_scale(time_deltas: np.ndarray, num_frames: int) -> np.ndarray:
+    """
+    Vectorized motion_threshold_scale for a trajectory.
+
+    Args:
+        time_deltas: (frames,) seconds since the previous frame, or None
+        num_frames: Trajectory length
+
+    Returns:
+        (frames,) threshold scale factors
+    """
+    if time_deltas is None:
+        return np.ones(num_frames)
+    return np.minimum(np.asarray(time_deltas, dtype=np.float64) * REFERENCE_FPS, MAX_MOTION_THRESHOLD_SCALE)
 
 def get_empty_landmarks():
     return {
@@ -492,6 +538,29 @@ def get_video_path(root_dir: str, target: list)->tuple:
                     print(f"video name not found in exercise: {curr}")
     return video_result,exercise_result
 
+# render_manifest.json files written next to rendered videos, parsed once per folder
+_render_manifests = {}
+
+def get_render_profile(video_path: str) -> str:
+    """
+    Name of the render profile that produced a video, from the render manifest in its folder.
+
+    Args:
+        video_path: Path to a video rendered by the render scripts
+
+    Returns:
+        str: Profile name, or 'unknown' for videos the manifest has no entry for
+    """
+    folder = os.path.dirname(os.path.abspath(video_path))
+    if folder not in _render_manifests:
+        try:
+            with open(os.path.join(folder, 'render_manifest.json'), 'r', encoding='utf-8') as f:
+                _render_manifests[folder] = json.load(f)
+        except (OSError, ValueError):
+            _render_manifests[folder] = {}
+    entry = _render_manifests[folder].get(os.path.basename(video_path), {})
+    return entry.get('settings', {}).get('profile', 'unknown')
+
 def build_rule_dict(rules):
     body_landmarks_dict = {}
     equipment_dict = {}
@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Frameworks only the detectors may load, on first use
+ML_FRAMEWORKS = ['torch', 'torchvision', 'mediapipe', 'yolov7', 'mmpose', 'mmdet', 'mmcv', 'openpose',
+                 'tensorflow', 'sklearn']
+
+# Module -> (modules it must not pull in, import-time budget in seconds)
+IMPORT_BUDGETS = {
+    # Pure rule/matching layer: no ML framework and no OpenCV
+    'constants': (ML_FRAMEWORKS + ['cv2', 'numpy'], 0.05),
+    'exercise_rules': (ML_FRAMEWORKS + ['cv2'], 0.2),
+    'helper': (ML_FRAMEWORKS + ['cv2'], 0.5),
+    'rule_index': (ML_FRAMEWORKS + ['cv2'], 0.5),
+    'landmarks': (ML_FRAMEWORKS + ['cv2'], 0.5),
+    'landmark_cache': (ML_FRAMEWORKS + ['cv2'], 0.5),
+    'smoothing': (ML_FRAMEWORKS + ['cv2'], 0.5),
+    'arms': (ML_FRAMEWORKS + ['cv2'], 0.5),
+    'legs': (ML_FRAMEWORKS + ['cv2'], 0.5),
+    'torso': (ML_FRAMEWORKS + ['cv2'], 0.5),
+    'pose_backends': (ML_FRAMEWORKS + ['cv2'], 0.5),
+    # Video layer: OpenCV for decoding, detectors still deferred
+    'exercise_analyzer': (ML_FRAMEWORKS, 1.5),
+    'GYMDetector': (ML_FRAMEWORKS, 1.5),
+}
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+loaded = sorted({{name.split('.')[0] for name in sys.modules}})
+print(json.dumps({{'seconds': elapsed, 'loaded': loaded}}))
+"""
+
+def measure_import(module: str, repeat: int = 3) -> dict:
+    """
+    Import a module in fresh interpreters and report its cost.
+
+    Args:
+        module: Module name, importable from this directory
+        repeat: Interpreters to start; the fastest import time is kept
+
+    Returns:
+        Dictionary with 'seconds' (best import time) and 'loaded' (top-level modules in sys.modules)
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    best = None
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', _PROBE.format(module=module)], cwd=here,
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        if best is None or result['seconds'] < best['seconds']:
+            best = result
+    return best
+
+def check_imports(repeat: int = 3, budget_scale: float = 1.0) -> list:
+    """
+    Check every module in IMPORT_BUDGETS.
+
+    Args:
+        repeat: Interpreters to start per module
+        budget_scale: Multiplier for the time budgets (e.g. on slow machines)
+
+    Returns:
+        List of failure messages; empty when every module is within budget
+    """
+    failures = []
+    for module, (forbidden, budget) in IMPORT_BUDGETS.items():
+        try:
+            result = measure_import(module, repeat)
+        except subprocess.CalledProcessError as e:
+            failures.append(f"{module}: import failed\n{e.stderr}")
+            continue
+        heavy = sorted(set(forbidden) & set(result['loaded']))
+        status = 'ok'
+        if heavy:
+            failures.append(f"{module}: pulls in {', '.join(heavy)}")
+            status = 'FAIL'
+        if result['seconds'] > budget * budget_scale:
+            failures.append(f"{module}: {result['seconds']:.3f}s import exceeds {budget * budget_scale:.3f}s budget")
+            status = 'FAIL'
+        print(f"{module:<20} {result['seconds'] * 1000:8.1f} ms  {status}")
+    return failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Guard against heavy imports creeping into the rule/matching layer")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="Fresh interpreters per module; the fastest import counts")
+    parser.add_argument('--budget-scale', type=float, default=1.0,
+                        help="Multiply every time budget, e.g. 2 on a slow machine")
+    args = parser.parse_args()
+
+    failures = check_imports(args.repeat, args.budget_scale)
+    for failure in failures:
+        print(failure)
+    sys.exit(1 if failures else 0)
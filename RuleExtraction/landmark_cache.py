@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import numpy as np
+from typing import Dict, Optional
+from landmarks import LANDMARK_CHANNELS, NUM_JOINTS
+
+def hash_file(path: str) -> str:
+    """
+    Hash a file's contents.
+
+    Args:
+        path: Path to the file
+
+    Returns:
+        Hex SHA-1 digest of the file bytes
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class LandmarkCache:
+    """On-disk store of per-frame pose landmarks, so each video is only run through the detectors once."""
+
+    # Bump when the stored arrays change meaning or layout
+    FORMAT_VERSION = 2
+
+    def __init__(self, cache_dir: str = "./landmark_cache"):
+        """
+        Initialize the landmark cache.
+
+        Args:
+            cache_dir: Directory holding one .npz file per cached video
+        """
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self._hash_memo = {}
+
+    def hash_video(self, video_path: str) -> str:
+        """
+        Hash the video file contents.
+
+        Args:
+            video_path: Path to the video file
+
+        Returns:
+            Hex SHA-1 digest of the file bytes
+        """
+        stat = os.stat(video_path)
+        memo_key = (os.path.abspath(video_path), stat.st_size, stat.st_mtime_ns)
+        if memo_key not in self._hash_memo:
+            self._hash_memo[memo_key] = hash_file(video_path)
+        return self._hash_memo[memo_key]
+
+    def make_key(self, video_path: str, pose_config: Dict, equipment_config: Dict = None,
+                 sampling_config: Dict = None) -> str:
+        """
+        Build the cache key for a video under a given detector configuration.
+
+        Args:
+            video_path: Path to the video file
+            pose_config: PoseDetector.get_config() output
+            equipment_config: YOLOv7EquipmentDetector.get_config() output
+            sampling_config: FrameSampler.get_config() output, or None when every frame is analyzed
+
+        Returns:
+            Hex digest identifying the cache entry
+        """
+        key_data = {
+            'version': self.FORMAT_VERSION,
+            'video': self.hash_video(video_path),
+            'pose': pose_config,
+            'equipment': equipment_config
+        }
+        # Left out when unsampled so existing entries stay valid
+        if sampling_config is not None:
+            key_data['sampling'] = sampling_config
+        return hashlib.sha1(json.dumps(key_data, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def load(self, key: str) -> Optional[Dict]:
+        """
+        Load cached landmarks.
+
+        Args:
+            key: Key from make_key
+
+        Returns:
+            Dictionary with 'landmarks' (frames x 33 x 4 float32 x, y, z, visibility), 'frame_indices',
+            'equipment' (list of label lists per frame) and 'fps', or None on a miss
+        """
+        path = self._entry_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                return {
+                    'landmarks': data['landmarks'],
+                    'frame_indices': data['frame_indices'],
+                    'equipment': json.loads(str(data['equipment'])),
+                    'fps': float(data['fps'])
+                }
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Ignoring unreadable landmark cache entry {path}: {e}")
+            return None
+
+    def save(self, key: str, frames: Dict):
+        """
+        Store landmarks for a video.
+
+        Args:
+            key: Key from make_key
+            frames: Dictionary in the format returned by load
+        """
+        path = self._entry_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        # Write to a temp file first so concurrent workers never see a partial entry
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                landmarks=np.asarray(frames['landmarks'], dtype=np.float32).reshape(-1, NUM_JOINTS, len(LANDMARK_CHANNELS)),
+                frame_indices=np.asarray(frames['frame_indices'], dtype=np.int32),
+                equipment=np.array(json.dumps(frames['equipment'])),
+                fps=np.array(frames['fps'], dtype=np.float64)
+            )
+        os.replace(tmp_path, path)
@@ -0,0 +1,120 @@
+import numpy as np
+from enum import IntEnum
+from typing import Dict, Tuple
+from constants import POSE_LANDMARK_NAMES, LANDMARK_ALIASES
+
+# Channels stored per joint in a landmark frame
+LANDMARK_CHANNELS = ('x', 'y', 'z', 'visibility')
+
+# MediaPipe Pose joint indices; members are the upper-case POSE_LANDMARK_NAMES
+PoseJoint = IntEnum('PoseJoint', [(name.upper(), idx) for idx, name in enumerate(POSE_LANDMARK_NAMES)])
+NUM_JOINTS = len(PoseJoint)
+
+def joint_index(name: str) -> int:
+    """
+    Index of a joint in a landmark frame.
+
+    Args:
+        name: Landmark name (any case), or one of the hand/foot aliases
+
+    Returns:
+        PoseJoint index
+    """
+    name = name.lower()
+    return PoseJoint[LANDMARK_ALIASES.get(name, name).upper()]
+
+def empty_landmark_frame() -> np.ndarray:
+    """(33, 4) float32 frame with every channel zero."""
+    return np.zeros((NUM_JOINTS, len(LANDMARK_CHANNELS)), dtype=np.float32)
+
+def landmark_frame_to_dict(frame: np.ndarray) -> Dict[str, Tuple[float, float]]:
+    """
+    Convert one landmark frame into the joint dictionary the per-frame rule classes expect.
+
+    Args:
+        frame: (33, C) array in PoseJoint order; only x and y are used
+
+    Returns:
+        Dictionary mapping landmark names (plus hand/foot aliases) to (x, y) tuples
+    """
+    coords = np.asarray(frame[:, :2], dtype=np.float64).tolist()
+    landmarks = {name: tuple(xy) for name, xy in zip(POSE_LANDMARK_NAMES, coords)}
+    for alias, name in LANDMARK_ALIASES.items():
+        landmarks[alias] = landmarks[name]
+    return landmarks
+
+class LandmarkSequence:
+    """Growable contiguous (frames x 33 x 4) float32 buffer of x, y, z, visibility landmarks."""
+
+    def __init__(self, capacity: int = 256):
+        """
+        Initialize an empty sequence.
+
+        Args:
+            capacity: Frames to allocate up front; the buffer doubles when full
+        """
+        self._buffer = np.empty((max(1, capacity), NUM_JOINTS, len(LANDMARK_CHANNELS)), dtype=np.float32)
+        self._length = 0
+
+    @classmethod
+    def from_array(cls, landmarks: np.ndarray) -> 'LandmarkSequence':
+        """
+        Wrap stored landmarks, e.g. a landmark cache entry.
+
+        Args:
+            landmarks: (frames, 33, 4) array; older (frames, 33, 2) arrays get zero z and visibility
+
+        Returns:
+            LandmarkSequence holding a float32 copy
+        """
+        landmarks = np.asarray(landmarks, dtype=np.float32)
+        sequence = cls(len(landmarks))
+        sequence._buffer[:len(landmarks)] = 0
+        sequence._buffer[:len(landmarks), :, :landmarks.shape[2]] = landmarks
+        sequence._length = len(landmarks)
+        return sequence
+
+    def __len__(self) -> int:
+        return self._length
+
+    def append(self, frame: np.ndarray):
+        """
+        Copy one (33, 4) landmark frame onto the end of the sequence.
+
+        Args:
+            frame: Landmarks in PoseJoint order
+        """
+        if self._length == len(self._buffer):
+            grown = np.empty((2 * len(self._buffer),) + self._buffer.shape[1:], dtype=np.float32)
+            grown[:self._length] = self._buffer[:self._length]
+            self._buffer = grown
+        self._buffer[self._length] = frame
+        self._length += 1
+
+    @property
+    def array(self) -> np.ndarray:
+        """(frames, 33, 4) view of the filled part of the buffer."""
+        return self._buffer[:self._length]
+
+    @property
+    def xy(self) -> np.ndarray:
+        """(frames, 33, 2) view of the image-plane coordinates."""
+        return self.array[:, :, :2]
+
+    @property
+    def visibility(self) -> np.ndarray:
+        """(frames, 33) view of the per-joint visibility scores."""
+        return self.array[:, :, 3]
+
+    def joint(self, name: str) -> np.ndarray:
+        """
+        (frames, 2) view of one joint's x, y track.
+
+        Args:
+            name: Landmark name, or one of the hand/foot aliases
+        """
+        return self.array[:, joint_index(name), :2]
+
+    def frame(self, idx: int) -> np.ndarray:
+        """(33, 4) view of one frame."""
+        return self.array[idx]
@@ -28,17 +28,21 @@ class LegRules:
         self.DEEP_BEND = 90    # Degrees
         self.NINETY_DEG_RANGE = (85, 95)  # Range for "bent at 90 degrees"
 
-    def extract_leg_rules(self, landmarks: Dict[str, Tuple[float, float]]) -> Dict[str, Dict[str, List[str]]]:
+    def extract_leg_rules(self, landmarks: Dict[str, Tuple[float, float]],
+                          time_delta: float = None) -> Dict[str, Dict[str, List[str]]]:
         """
         Extract comprehensive leg position and motion rules.
         
         Args:
             landmarks: Dictionary of landmark coordinates
+            time_delta: Seconds since the previous analyzed frame; motion thresholds
+                scale with it (None means one frame at REFERENCE_FPS)
             
         Returns:
             Dictionary containing leg position and motion rules
         """
         leg_positions = get_empty_leg_position()
+        motion_scale = motion_threshold_scale(time_delta)
         
         # Process each leg component
         for side in ['left', 'right']:
@@ -61,10 +65,10 @@ class LegRules:
                 
                 if prev_knee is not None:
                     leg_positions[f'{side}_knee']['motion'] = self._detect_knee_motion(
-                        prev_knee, knee, hip)
+                        prev_knee, knee, hip, motion_scale)
                 if prev_foot is not None:
                     leg_positions[f'{side}_foot']['motion'] = self._detect_foot_motion(
-                        prev_foot, foot, ankle)
+                        prev_foot, foot, ankle, motion_scale)
                 
                 # Update previous landmarks
                 self.previous_landmarks[f'{side}_knee'] = knee
@@ -119,7 +123,7 @@ class LegRules:
         return positions
 
     def _detect_knee_motion(self, prev_pos: Tuple[float, float], curr_pos: Tuple[float, float], 
-                         hip: Tuple[float, float]) -> List[str]:
+                         hip: Tuple[float, float], motion_scale: float = 1.0) -> List[str]:
         """Detect knee motion patterns."""
         motions = []
         
@@ -127,7 +131,7 @@ class LegRules:
         movement = np.array(curr_pos) - np.array(prev_pos)
         
         # Check for extension/flexion
-        if abs(movement[1]) > self.VERTICAL_MOVEMENT_THRESHOLD:
+        if abs(movement[1]) > self.VERTICAL_MOVEMENT_THRESHOLD * motion_scale:
             if movement[1] > 0:
                 motions.append('flexion')
             else:
@@ -138,7 +142,7 @@ class LegRules:
         return motions
 
     def _detect_foot_motion(self, prev_pos: Tuple[float, float], curr_pos: Tuple[float, float], 
-                         ankle: Tuple[float, float]) -> List[str]:
+                         ankle: Tuple[float, float], motion_scale: float = 1.0) -> List[str]:
         """Detect foot motion patterns."""
         motions = []
         
@@ -146,7 +150,7 @@ class LegRules:
         movement = np.array(curr_pos) - np.array(prev_pos)
         
         # Check for plantar flexion/dorsiflexion
-        if abs(movement[1]) > self.VERTICAL_MOVEMENT_THRESHOLD:
+        if abs(movement[1]) > self.VERTICAL_MOVEMENT_THRESHOLD * motion_scale:
             if movement[1] > 0:
                 motions.append('plantar flexion')
             else:
@@ -154,4 +158,78 @@ class LegRules:
         else:
             motions.append('stationary')
             
-        return motions
\ No newline at end of file
+        return motions
+
+    def extract_leg_rules_trajectory(self, trajectory: np.ndarray,
+                                     time_deltas: np.ndarray = None) -> Dict[str, Dict[str, Dict[str, np.ndarray]]]:
+        """
+        Extract leg rules for a whole landmark trajectory in one vectorized pass.
+        
+        Produces the same labels as calling extract_leg_rules on each frame in order.
+        
+        Args:
+            trajectory: (frames x 33 x 4) landmark array (x, y, z, visibility); only x, y are used
+            time_deltas: Optional (frames,) seconds since the previous frame
+            
+        Returns:
+            Dictionary mapping each leg landmark to {'position': {label: mask},
+            'motion': {label: mask}}, where each mask is a boolean array over frames
+        """
+        leg_masks = {}
+        motion_scale = trajectory_motion_scale(time_deltas, len(trajectory))
+        
+        for side in ['left', 'right']:
+            knee = trajectory_joint(trajectory, f'{side}_knee')
+            foot = trajectory_joint(trajectory, f'{side}_foot')
+            hip = trajectory_joint(trajectory, f'{side}_hip')
+            ankle = trajectory_joint(trajectory, f'{side}_ankle')
+            
+            leg_masks[f'{side}_knee'] = {
+                'position': self._get_knee_position_masks(hip, knee, ankle),
+                'motion': self._detect_vertical_motion_masks(knee, 'flexion', 'extension', motion_scale)
+            }
+            leg_masks[f'{side}_foot'] = {
+                'position': self._get_foot_position_masks(foot, ankle),
+                'motion': self._detect_vertical_motion_masks(foot, 'plantar flexion', 'dorsiflexion',
+                                                             motion_scale)
+            }
+        
+        return leg_masks
+
+    def _get_knee_position_masks(self, hip: np.ndarray, knee: np.ndarray,
+                                 ankle: np.ndarray) -> Dict[str, np.ndarray]:
+        """Vectorized _get_knee_position."""
+        angle = calculate_angle_batch(hip, knee, ankle)
+        
+        flexed = angle < self.KNEE_FLEX_THRESHOLD
+        bent = ~flexed & (angle < self.DEEP_BEND)
+        bent_90 = ~flexed & ~bent & (
+            (angle >= self.NINETY_DEG_RANGE[0]) & (angle <= self.NINETY_DEG_RANGE[1]))
+        slightly_bent = ~flexed & ~bent & ~bent_90 & (angle < self.SLIGHT_BEND)
+        
+        return {
+            'flexed': flexed,
+            'bent': bent,
+            'bent at 90 degrees': bent_90,
+            'slightly bent': slightly_bent,
+            'extended': ~(flexed | bent | bent_90 | slightly_bent)
+        }
+
+    def _get_foot_position_masks(self, foot: np.ndarray, ankle: np.ndarray) -> Dict[str, np.ndarray]:
+        """Vectorized _get_foot_position (no other-foot reference is available per trajectory)."""
+        return {
+            'on ground': foot[:, 1] > self.FOOT_GROUND_THRESHOLD,
+            'flat': np.abs(foot[:, 1] - ankle[:, 1]) < 0.1
+        }
+
+    def _detect_vertical_motion_masks(self, positions: np.ndarray, down_label: str,
+                                      up_label: str, motion_scale: np.ndarray) -> Dict[str, np.ndarray]:
+        """Vectorized _detect_knee_motion / _detect_foot_motion."""
+        movement, has_prev = trajectory_movement(positions)
+        moving = np.abs(movement[:, 1]) > self.VERTICAL_MOVEMENT_THRESHOLD * motion_scale
+        
+        return {
+            down_label: moving & (movement[:, 1] > 0) & has_prev,
+            up_label: moving & (movement[:, 1] <= 0) & has_prev,
+            'stationary': ~moving & has_prev
+        }
@@ -1,12 +1,26 @@
 from exercise_analyzer import process_video_with_rules
 from GYMDetector import YOLOv7EquipmentDetector, PoseDetector
-from helper import get_video_path, calculate_rule_similarity, calculate_similarity_with_details, calculate_equipment_similarity
+from pose_backends import POSE_BACKENDS, create_pose_detector
+from helper import get_video_path, get_render_profile
 from constants import EQUIPMENTS
 from exercise_rules import build_exercise_rules_json, get_exercise_names
+from landmark_cache import LandmarkCache
+from frame_sampling import FrameSampler
+from equipment_scheduler import EquipmentDetectionScheduler
+from smoothing import TRAJECTORY_FILTERS
+from rule_index import ReferenceRuleIndex
+from evaluation import evaluate_corpus
+from result_journal import ResultJournal, config_hash
 import pandas as pd
+import multiprocessing
+import traceback
+import argparse
 import json
 import os
 
+# Per-process detector state, populated by _init_worker in pool mode
+_worker_state = {}
+
 def detect_equipment_from_filename(filename: str) -> list:
     """Extract equipment type from filename."""
     filename = filename.lower()
@@ -19,8 +33,10 @@ def detect_equipment_from_filename(filename: str) -> list:
 def analyze_video(video_path: str, 
                  equipment_detector: YOLOv7EquipmentDetector,
                  pose_detector: PoseDetector,
-                 exercise_rules: list,
-                 expected_activity: str):
+                 rule_index: ReferenceRuleIndex,
+                 expected_activity: str,
+                 landmark_cache: LandmarkCache = None,
+                 video_options: dict = None):
     """
     Analyze a single video using debug_main's working logic with added reporting.
     """
@@ -35,7 +51,9 @@ def analyze_video(video_path: str,
     extracted_rules = process_video_with_rules(
         video_path, 
         equipment_detector, 
-        pose_detector
+        pose_detector,
+        landmark_cache,
+        **(video_options or {})
     )
 
     #todo: delete this after fixing equiptment detection:
@@ -45,36 +63,12 @@ def analyze_video(video_path: str,
     print("\nExtracted Rules:")
     print(json.dumps(extracted_rules, indent=2))
     
-    # Compare with each exercise
-    print("\nComparing with all known exercises:")
-    similarities = []
-    detailed_scores = {}
+    # Score every known exercise in one pass over the compiled index, keep the top 3
+    matches = rule_index.top_k(extracted_rules, k=3)
+    # Per-joint breakdowns only for the returned matches
+    details = rule_index.explain(extracted_rules, matches)
+    detailed_scores = {exercise: dict(details[exercise], similarity=score) for exercise, score in matches}
     
-    for exercise in exercise_rules:
-        exercise_name = exercise['activity'].lower()
-
-        similarity_landmark = calculate_rule_similarity(
-            extracted_rules['body_landmarks'],
-            exercise['body_landmarks']
-        )
-        print(f"landmark: {similarity_landmark}")
-        similarity_equipment = calculate_equipment_similarity(
-            extracted_rules['equipment'],
-            exercise['equipment']
-        )
-        print(f"equipment{similarity_equipment}")
-        similarity = similarity_landmark+similarity_equipment
-        similarities.append((exercise_name, similarity))
-        print(f"\nSimilarity with {exercise_name}: {similarity:.3f}")
-        
-        # Store detailed scores
-        detailed_scores[exercise_name] = {
-            'similarity': similarity,
-            'rules_matched': True  # Add more details if needed
-        }
-    
-    # Sort and get top 3 matches
-    matches = sorted(similarities, key=lambda x: x[1], reverse=True)[:3]
     print("\nTop 3 Matches:")
     for i, (exercise, score) in enumerate(matches, 1):
         print(f"{i}. {exercise}: {score:.3f}")
@@ -86,7 +80,159 @@ def analyze_video(video_path: str,
         'detailed_scores': detailed_scores
     }
 
-def main():
+def build_report_row(results: dict, expected_activity: str, render_profile: str = 'unknown') -> tuple:
+    """
+    Build the Excel/JSON report row for an analyzed video.
+    
+    Args:
+        results: Output of analyze_video
+        expected_activity: Ground-truth activity name for the video
+        render_profile: Render profile that produced the video
+        
+    Returns:
+        tuple: (report_row, is_in_top3)
+    """
+    # Check if expected activity is in top 3
+    matched_exercises = [match[0].lower() for match in results['matches']]
+    is_in_top3 = expected_activity.lower() in matched_exercises
+    
+    report_row = {
+        'Activity': expected_activity,
+        'Equipment': ', '.join(results['equipment']),
+        'Render Profile': render_profile,
+        'In Top 3': is_in_top3,
+        'Rank': matched_exercises.index(expected_activity.lower()) + 1 if is_in_top3 else 'Not Found',
+        'Top Match': results['matches'][0][0],
+        'Top Match Score': f"{results['matches'][0][1]:.3f}",
+        '2nd Match': results['matches'][1][0] if len(results['matches']) > 1 else '',
+        '2nd Match Score': f"{results['matches'][1][1]:.3f}" if len(results['matches']) > 1 else '',
+        '3rd Match': results['matches'][2][0] if len(results['matches']) > 2 else '',
+        '3rd Match Score': f"{results['matches'][2][1]:.3f}" if len(results['matches']) > 2 else '',
+        'Detailed Scores': json.dumps(results['detailed_scores'], indent=2)
+    }
+    return report_row, is_in_top3
+
+def _init_worker(model_path: str, exercise_rules: list, threads_per_worker: int,
+                 cache_dir: str = None, video_options: dict = None, pose_options: dict = None):
+    """
+    Pool initializer: give each worker process its own detectors.
+    
+    Args:
+        model_path: Path to the YOLOv7 weights file
+        exercise_rules: Reference exercise rules to compare against
+        threads_per_worker: Intra-op thread budget for this worker
+        cache_dir: Landmark cache directory, or None to disable caching
+        video_options: Extra process_video_with_rules keyword arguments (sampling,
+            pipelining, equipment batching/scheduling)
+        pose_options: create_pose_detector keyword arguments (backend name, ROI cropping)
+    """
+    import torch
+    import cv2
+    # Keep workers from oversubscribing the cores with their own thread pools
+    torch.set_num_threads(threads_per_worker)
+    cv2.setNumThreads(threads_per_worker)
+    
+    _worker_state['equipment_detector'] = YOLOv7EquipmentDetector(model_path, EQUIPMENTS)
+    _worker_state['pose_detector'] = create_pose_detector(**(pose_options or {}))
+    _worker_state['rule_index'] = ReferenceRuleIndex(exercise_rules)
+    _worker_state['landmark_cache'] = LandmarkCache(cache_dir) if cache_dir else None
+    _worker_state['video_options'] = video_options
+
+def _analyze_video_task(task: tuple) -> tuple:
+    """
+    Analyze one video inside a pool worker.
+    
+    Args:
+        task: (video_path, expected_activity)
+        
+    Returns:
+        tuple: (video_path, expected_activity, results, error) where error is a
+        formatted traceback or None
+    """
+    video_path, expected_activity = task
+    try:
+        results = analyze_video(
+            video_path,
+            _worker_state['equipment_detector'],
+            _worker_state['pose_detector'],
+            _worker_state['rule_index'],
+            expected_activity,
+            _worker_state['landmark_cache'],
+            _worker_state['video_options']
+        )
+        return video_path, expected_activity, results, None
+    except Exception:
+        return video_path, expected_activity, None, traceback.format_exc()
+
+def _iter_sequential_results(tasks: list, model_path: str, exercise_rules: list,
+                             cache_dir: str = None, video_options: dict = None,
+                             pose_options: dict = None):
+    """Analyze videos one after another in this process."""
+    equipment_detector = YOLOv7EquipmentDetector(model_path, EQUIPMENTS)
+    pose_detector = create_pose_detector(**(pose_options or {}))
+    landmark_cache = LandmarkCache(cache_dir) if cache_dir else None
+    rule_index = ReferenceRuleIndex(exercise_rules)
+    
+    for video_path, expected_activity in tasks:
+        print(f"\nProcessing video: {expected_activity}")
+        try:
+            results = analyze_video(
+                video_path,
+                equipment_detector,
+                pose_detector,
+                rule_index,
+                expected_activity,
+                landmark_cache,
+                video_options
+            )
+            yield video_path, expected_activity, results, None
+        except Exception:
+            yield video_path, expected_activity, None, traceback.format_exc()
+
+def _iter_pooled_results(tasks: list, model_path: str, exercise_rules: list, num_workers: int,
+                         cache_dir: str = None, video_options: dict = None,
+                         pose_options: dict = None):
+    """Analyze videos on a pool of worker processes, yielding in input order."""
+    threads_per_worker = max(1, (os.cpu_count() or 1) // num_workers)
+    # spawn: CUDA and MediaPipe graphs are not fork-safe
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(processes=num_workers,
+                  initializer=_init_worker,
+                  initargs=(model_path, exercise_rules, threads_per_worker, cache_dir,
+                            video_options, pose_options)) as pool:
+        for result in pool.imap(_analyze_video_task, tasks):
+            print(f"\nFinished video: {result[1]}")
+            yield result
+
+def describe_run_config(model_path: str, exercise_rules: list, video_options: dict = None,
+                        pose_options: dict = None) -> dict:
+    """
+    JSON-serializable description of everything that determines a video's results.
+    
+    Args:
+        model_path: Path to the YOLOv7 weights file
+        exercise_rules: Reference exercise rules compared against
+        video_options: process_video_with_rules keyword arguments
+        pose_options: create_pose_detector keyword arguments
+        
+    Returns:
+        dict: Run configuration, hashed to key the result journal
+    """
+    # Samplers and schedulers are described by their settings
+    video_config = {
+        name: value.get_config() if hasattr(value, 'get_config') else value
+        for name, value in (video_options or {}).items()
+    }
+    return {
+        'model_path': os.path.abspath(model_path),
+        'equipment_list': list(EQUIPMENTS),
+        'pose': pose_options or {},
+        'video': video_config,
+        'exercise_rules': exercise_rules
+    }
+
+def main(num_workers: int = 1, cache_dir: str = "./landmark_cache", video_options: dict = None,
+         pose_options: dict = None, resume: bool = False):
     # Initialize paths
     video_root_dir = "../blender_mp4/"
     model_path = "./assets/best-v2.pt"
@@ -98,10 +244,6 @@ def main():
     exercise_names = get_exercise_names(exercise_rules)
     print(f"Looking for these exercises: {exercise_names}")
 
-    # Initialize detectors
-    equipment_detector = YOLOv7EquipmentDetector(model_path, EQUIPMENTS)
-    pose_detector = PoseDetector()
-
     # Get video paths
     video_list, target_exercise_names = get_video_path(video_root_dir, exercise_names)
     if not video_list:
@@ -110,52 +252,62 @@ def main():
         
     print(f"Found {len(video_list)} matching videos")
 
-    # Prepare report data
-    report_data = []
-    correct_in_top3 = 0
+    # Every finished video is journaled immediately, keyed by video and run configuration
+    journal = ResultJournal(os.path.join(output_dir, 'results_journal.jsonl'))
+    dropped = journal.compact()
+    if dropped:
+        print(f"Compacted the results journal, dropped {dropped} superseded entries")
+    run_hash = config_hash(describe_run_config(model_path, exercise_rules, video_options, pose_options))
+    tasks = list(zip(video_list, target_exercise_names))
+    video_hashes = {video_path: journal.video_hash(video_path) for video_path in video_list}
+    pending_tasks = tasks
+    if resume:
+        pending_tasks = [task for task in tasks if not journal.is_complete(video_hashes[task[0]], run_hash)]
+        print(f"Resuming: {len(tasks) - len(pending_tasks)} videos already done, {len(pending_tasks)} to analyze")
     
-    # Process each video
-    for video_path, expected_activity in zip(video_list, target_exercise_names):
-        print(f"\nProcessing video: {expected_activity}")
+    # Process each remaining video, in-process or on a worker pool
+    if pending_tasks:
+        num_workers = max(1, min(num_workers, len(pending_tasks)))
+        if num_workers > 1:
+            print(f"Analyzing on {num_workers} worker processes")
+            result_iter = _iter_pooled_results(pending_tasks, model_path, exercise_rules, num_workers,
+                                               cache_dir, video_options, pose_options)
+        else:
+            result_iter = _iter_sequential_results(pending_tasks, model_path, exercise_rules,
+                                                   cache_dir, video_options, pose_options)
         
-        try:
-            # Analyze video
-            results = analyze_video(
-                video_path,
-                equipment_detector,
-                pose_detector,
-                exercise_rules,
-                expected_activity
-            )
-            
-            # Check if expected activity is in top 3
-            matched_exercises = [match[0].lower() for match in results['matches']]
-            is_in_top3 = expected_activity.lower() in matched_exercises
-            if is_in_top3:
-                correct_in_top3 += 1
-            
-            # Prepare row for Excel report
-            report_row = {
-                'Activity': expected_activity,
-                'Equipment': ', '.join(results['equipment']),
-                'In Top 3': is_in_top3,
-                'Rank': matched_exercises.index(expected_activity.lower()) + 1 if is_in_top3 else 'Not Found',
-                'Top Match': results['matches'][0][0],
-                'Top Match Score': f"{results['matches'][0][1]:.3f}",
-                '2nd Match': results['matches'][1][0] if len(results['matches']) > 1 else '',
-                '2nd Match Score': f"{results['matches'][1][1]:.3f}" if len(results['matches']) > 1 else '',
-                '3rd Match': results['matches'][2][0] if len(results['matches']) > 2 else '',
-                '3rd Match Score': f"{results['matches'][2][1]:.3f}" if len(results['matches']) > 2 else '',
-                'Detailed Scores': json.dumps(results['detailed_scores'], indent=2)
-            }
-            
-            report_data.append(report_row)
-            
-        except Exception as e:
-            print(f"Error processing {video_path}: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        for video_path, expected_activity, results, error in result_iter:
+            journal.record(video_hashes[video_path], run_hash, video_path, expected_activity, results, error)
+            if error is not None:
+                print(f"Error processing {video_path}:\n{error}")
+    
+    # Build the reports from the journal, so resumed and fresh runs produce the same output
+    report_data = []
+    correct_in_top3 = 0
+    scored_rules = []
+    scored_activities = []
+    for video_path, expected_activity in tasks:
+        entry = journal.latest(video_hashes[video_path], run_hash)
+        if entry is None or entry['error'] is not None:
             continue
+        results = entry['results']
+        
+        report_row, is_in_top3 = build_report_row(results, expected_activity, get_render_profile(video_path))
+        if is_in_top3:
+            correct_in_top3 += 1
+        report_data.append(report_row)
+        scored_rules.append(results['extracted_rules'])
+        scored_activities.append(expected_activity)
+    
+    # Score the whole corpus against the whole library in one batch for the accuracy summary
+    rule_index = ReferenceRuleIndex(exercise_rules)
+    score_matrix = rule_index.score_matrices(scored_rules)['total']
+    evaluation = evaluate_corpus(score_matrix, scored_activities, rule_index.exercise_names)
+    if evaluation['unknown']:
+        print(f"Expected activities missing from the exercise rules: {evaluation['unknown']}")
+    confusion_path = os.path.join(output_dir, 'confusion_matrix.csv')
+    pd.DataFrame(evaluation['confusion'], index=rule_index.exercise_names,
+                 columns=rule_index.exercise_names).to_csv(confusion_path)
     
     # Create DataFrame
     df = pd.DataFrame(report_data)
@@ -165,6 +317,8 @@ def main():
     summary_row = pd.DataFrame([{
         'Activity': 'SUMMARY',
         'Equipment': '',
+        'Render Profile': ', '.join(f"{profile}: {count}" for profile, count in
+                                    df['Render Profile'].value_counts().items()) if len(df) else '',
         'In Top 3': f'{correct_in_top3}/{len(video_list)}',
         'Rank': f'{accuracy:.2%} accuracy',
         'Top Match': '',
@@ -198,7 +352,63 @@ def main():
     
     print(f"\nAnalysis complete!")
     print(f"Detailed JSON results saved to: {json_path}")
+    print(f"Confusion matrix (expected x top-1) saved to: {confusion_path}")
     print(f"Overall accuracy: {accuracy:.2%} ({correct_in_top3}/{len(video_list)} correct in top 3)")
+    print(f"Top-1 accuracy: {evaluation['top1_accuracy']:.2%}, top-3 accuracy: {evaluation['top3_accuracy']:.2%} "
+          f"over {len(scored_rules)} analyzed videos")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run rule extraction over all matching videos")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of worker processes, each with its own detectors")
+    parser.add_argument('--landmark-cache', default="./landmark_cache",
+                        help="Directory for cached pose landmarks")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Always re-run pose and equipment detection")
+    parser.add_argument('--stride', type=int, default=1,
+                        help="Analyze every Nth frame")
+    parser.add_argument('--target-fps', type=float, default=None,
+                        help="Analyze at about this frame rate (overrides --stride)")
+    parser.add_argument('--adaptive-threshold', type=float, default=None,
+                        help="Fall back to every frame while landmarks move faster than this per frame")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="Overlap decoding, pose and equipment detection on separate threads")
+    parser.add_argument('--equipment-batch', type=int, default=1,
+                        help="Frames per YOLOv7 forward pass")
+    parser.add_argument('--equipment-keyframes', type=int, default=0,
+                        help="Run YOLOv7 only every Nth frame (after a short warmup), tracking "
+                             "equipment in between and stopping once the vote is settled")
+    parser.add_argument('--trajectory-filter', choices=sorted(TRAJECTORY_FILTERS), default=None,
+                        help="Smooth the landmark trajectory offline before extracting rules")
+    parser.add_argument('--pose-backend', choices=sorted(POSE_BACKENDS), default='mediapipe',
+                        help="Pose estimation backend")
+    parser.add_argument('--pose-roi', type=float, default=None, metavar='PADDING',
+                        help="Run MediaPipe on a crop around the previous frame's pose, padded by "
+                             "this fraction of the box size")
+    parser.add_argument('--pose-roi-size', type=int, default=512,
+                        help="Longest side the pose ROI crop is downscaled to")
+    parser.add_argument('--resume', action='store_true',
+                        help="Skip videos the result journal already has results for under the same settings")
+    args = parser.parse_args()
+    if args.pose_roi is not None and args.pose_backend not in ('mediapipe', 'mediapipe_lite'):
+        parser.error(f"--pose-roi needs a MediaPipe pose backend, not '{args.pose_backend}'")
+    
+    video_options = {
+        'pipelined': args.pipeline,
+        'equipment_batch_size': args.equipment_batch,
+        'trajectory_filter': args.trajectory_filter
+    }
+    if args.stride > 1 or args.target_fps or args.adaptive_threshold is not None:
+        video_options['sampler'] = FrameSampler(args.stride, args.target_fps, args.adaptive_threshold)
+    pose_options = {'backend': args.pose_backend}
+    if args.pose_roi is not None:
+        # ROI cropping is a MediaPipe PoseDetector option
+        pose_options.update(roi_padding=args.pose_roi, roi_max_size=args.pose_roi_size)
+    if args.equipment_keyframes > 0:
+        video_options['equipment_scheduler'] = EquipmentDetectionScheduler(
+            keyframe_interval=args.equipment_keyframes)
+    main(num_workers=args.workers,
+         cache_dir=None if args.no_cache else args.landmark_cache,
+         video_options=video_options,
+         pose_options=pose_options,
+         resume=args.resume)
\ No newline at end of file
@@ -0,0 +1,257 @@
+import inspect
+import numpy as np
+from typing import Callable, Dict, List, Optional
+from landmarks import NUM_JOINTS, LANDMARK_CHANNELS, joint_index, landmark_frame_to_dict
+
+# Every backend returns landmarks in this schema from get_landmark_array_from_frame:
+# a (33, 4) float32 array of x, y (normalized to the frame), z and visibility in
+# PoseJoint order, or None when no person was found.
+
+# Registered backend factories, by name
+POSE_BACKENDS: Dict[str, Callable] = {}
+
+def register_pose_backend(name: str):
+    """Decorator registering a zero-import factory that builds a pose backend."""
+    def decorator(factory: Callable) -> Callable:
+        POSE_BACKENDS[name] = factory
+        return factory
+    return decorator
+
+def create_pose_detector(backend: str = 'mediapipe', **kwargs):
+    """
+    Build a pose detector by backend name.
+
+    Only the chosen backend's framework is imported.
+
+    Args:
+        backend: Key of POSE_BACKENDS
+        **kwargs: Backend constructor arguments
+
+    Returns:
+        Detector exposing get_landmark_array_from_frame, get_joint_positions_from_frame,
+        reset and get_config
+    """
+    if backend not in POSE_BACKENDS:
+        raise ValueError(f"Unknown pose backend '{backend}', expected one of {sorted(POSE_BACKENDS)}")
+    factory = POSE_BACKENDS[backend]
+    check_backend_options(backend, factory, kwargs)
+    return factory(**kwargs)
+
+def check_backend_options(backend: str, constructor: Callable, options: Dict):
+    """
+    Reject options a backend's constructor does not take.
+
+    Constructors that accept **kwargs forward them and are not checked here; they
+    check against the detector class they build instead.
+
+    Args:
+        backend: Backend name, for the error message
+        constructor: Detector class or factory
+        options: Keyword arguments it is about to be called with
+
+    Raises:
+        ValueError: If an option is not a parameter of constructor
+    """
+    parameters = inspect.signature(constructor).parameters
+    if any(p.kind == inspect.Parameter.VAR_KEYWORD for p in parameters.values()):
+        return
+    unsupported = sorted(set(options) - set(parameters))
+    if unsupported:
+        raise ValueError(f"Pose backend '{backend}' does not support option(s) {unsupported}; "
+                         f"it takes {sorted(name for name in parameters if name != 'self')}")
+
+# Detectors built by name inside this process, reused across videos
+_detector_instances = {}
+
+def get_pose_detector(backend: str):
+    """Default-configured detector for a backend, created on first use."""
+    if backend not in _detector_instances:
+        _detector_instances[backend] = create_pose_detector(backend)
+    return _detector_instances[backend]
+
+# Joints a keypoint set lacks are copied from the nearest joint it has, with zero visibility
+JOINT_FALLBACKS = {
+    'left_eye_inner': 'left_eye', 'left_eye_outer': 'left_eye',
+    'right_eye_inner': 'right_eye', 'right_eye_outer': 'right_eye',
+    'mouth_left': 'nose', 'mouth_right': 'nose',
+    'left_pinky': 'left_wrist', 'left_index': 'left_wrist', 'left_thumb': 'left_wrist',
+    'right_pinky': 'right_wrist', 'right_index': 'right_wrist', 'right_thumb': 'right_wrist',
+    'left_heel': 'left_ankle', 'left_foot_index': 'left_ankle',
+    'right_heel': 'right_ankle', 'right_foot_index': 'right_ankle'
+}
+
+def keypoints_to_landmark_array(keypoints: np.ndarray, joint_names: List[Optional[str]],
+                                frame_shape) -> np.ndarray:
+    """
+    Convert pixel keypoints from another skeleton into the common landmark schema.
+
+    Args:
+        keypoints: (K, 3) array of pixel x, y and confidence
+        joint_names: Landmark name for each keypoint row, or None to drop the row
+        frame_shape: Shape of the frame the keypoints were detected in
+
+    Returns:
+        (33, 4) float32 landmark array
+    """
+    height, width = frame_shape[:2]
+    landmarks = np.zeros((NUM_JOINTS, len(LANDMARK_CHANNELS)), dtype=np.float32)
+    found = np.zeros(NUM_JOINTS, dtype=bool)
+    for (x, y, confidence), name in zip(keypoints, joint_names):
+        if name is None:
+            continue
+        idx = joint_index(name)
+        landmarks[idx] = (x / width, y / height, 0.0, confidence)
+        found[idx] = True
+    for name, source in JOINT_FALLBACKS.items():
+        idx = joint_index(name)
+        if not found[idx]:
+            landmarks[idx, :2] = landmarks[joint_index(source), :2]
+    return landmarks
+
+# COCO-17 keypoint order used by ViTPose
+COCO_JOINTS = [
+    'nose', 'left_eye', 'right_eye', 'left_ear', 'right_ear',
+    'left_shoulder', 'right_shoulder', 'left_elbow', 'right_elbow',
+    'left_wrist', 'right_wrist', 'left_hip', 'right_hip',
+    'left_knee', 'right_knee', 'left_ankle', 'right_ankle'
+]
+
+# OpenPose BODY_25 keypoint order; neck, mid-hip and small toes have no MediaPipe counterpart
+BODY_25_JOINTS = [
+    'nose', None, 'right_shoulder', 'right_elbow', 'right_wrist',
+    'left_shoulder', 'left_elbow', 'left_wrist', None,
+    'right_hip', 'right_knee', 'right_ankle', 'left_hip', 'left_knee', 'left_ankle',
+    'right_eye', 'left_eye', 'right_ear', 'left_ear',
+    'left_foot_index', None, 'left_heel', 'right_foot_index', None, 'right_heel'
+]
+
+class ViTPoseDetector:
+    """Top-down ViTPose (mmpose) with a Faster R-CNN person detector."""
+
+    def __init__(self, config_file="configs/vitpose/vitpose_base_coco.py",
+                 checkpoint_file="checkpoints/vitpose_base.pth",
+                 detector_config="configs/detection/faster_rcnn/faster_rcnn_r50_fpn_1x_coco.py",
+                 detector_checkpoint="checkpoints/faster_rcnn_r50_fpn_1x_coco.pth",
+                 bbox_threshold: float = 0.5):
+        import torch
+        from mmpose.apis import init_pose_model, inference_top_down_pose_model
+        from mmdet.apis import init_detector, inference_detector
+        self._inference_pose = inference_top_down_pose_model
+        self._inference_detector = inference_detector
+        self.config_file = config_file
+        self.checkpoint_file = checkpoint_file
+        self.bbox_threshold = bbox_threshold
+
+        device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        # Initialize ViTPose model
+        self.pose_model = init_pose_model(config_file, checkpoint_file, device=device)
+        # Detector model for person bounding boxes
+        self.detector_model = init_detector(detector_config, detector_checkpoint, device=device)
+
+    def reset(self):
+        """ViTPose is stateless between frames."""
+
+    def get_config(self) -> Dict:
+        """Settings that determine this detector's output, used for cache keys."""
+        return {
+            'backend': 'vitpose',
+            'config_file': self.config_file,
+            'checkpoint_file': self.checkpoint_file,
+            'bbox_threshold': self.bbox_threshold
+        }
+
+    def get_landmark_array_from_frame(self, frame: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Detect the first person in a frame.
+
+        Args:
+            frame: BGR image as numpy array
+
+        Returns:
+            (33, 4) float32 landmark array, or None if no person was found
+        """
+        det_results = self._inference_detector(self.detector_model, frame)
+        # Class 0 is person; keep confident boxes only
+        person_results = [{'bbox': bbox} for bbox in det_results[0] if bbox[4] > self.bbox_threshold]
+        if not person_results:
+            return None
+        pose_results, _ = self._inference_pose(self.pose_model, frame, person_results,
+                                               format='xyxy', dataset='TopDownCocoDataset')
+        if not pose_results:
+            return None
+        # Assume single person
+        return keypoints_to_landmark_array(pose_results[0]['keypoints'], COCO_JOINTS, frame.shape)
+
+    def get_joint_positions_from_frame(self, frame: np.ndarray) -> Dict:
+        """Dictionary form of get_landmark_array_from_frame."""
+        landmarks = self.get_landmark_array_from_frame(frame)
+        return {} if landmarks is None else landmark_frame_to_dict(landmarks)
+
+class OpenPoseDetector:
+    """OpenPose BODY_25 through the pyopenpose bindings."""
+
+    def __init__(self, model_folder="models/", net_resolution="-1x368", hand=True, face=False):
+        from openpose import pyopenpose as op
+        self._op = op
+        self.params = {
+            "model_folder": model_folder,
+            "net_resolution": net_resolution,
+            "hand": hand,
+            "face": face
+        }
+        self.opWrapper = op.WrapperPython()
+        self.opWrapper.configure(self.params)
+        self.opWrapper.start()
+
+    def reset(self):
+        """OpenPose is stateless between frames."""
+
+    def get_config(self) -> Dict:
+        """Settings that determine this detector's output, used for cache keys."""
+        return {
+            'backend': 'openpose',
+            'net_resolution': self.params['net_resolution']
+        }
+
+    def get_landmark_array_from_frame(self, frame: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Detect the first person in a frame.
+
+        Args:
+            frame: BGR image as numpy array
+
+        Returns:
+            (33, 4) float32 landmark array, or None if no person was found
+        """
+        datum = self._op.Datum()
+        datum.cvInputData = frame
+        self.opWrapper.emplaceAndPop([datum])
+
+        # Get body keypoints if available
+        body_keypoints = datum.poseKeypoints
+        if body_keypoints is None or body_keypoints.size == 0:
+            return None
+        # Assume single-person pose detection
+        return keypoints_to_landmark_array(body_keypoints[0], BODY_25_JOINTS, frame.shape)
+
+    def get_joint_positions_from_frame(self, frame: np.ndarray) -> Dict:
+        """Dictionary form of get_landmark_array_from_frame."""
+        landmarks = self.get_landmark_array_from_frame(frame)
+        return {} if landmarks is None else landmark_frame_to_dict(landmarks)
+
+@register_pose_backend('mediapipe')
+def _mediapipe_backend(**kwargs):
+    from GYMDetector import PoseDetector
+    check_backend_options('mediapipe', PoseDetector, kwargs)
+    return PoseDetector(**kwargs)
+
+@register_pose_backend('mediapipe_lite')
+def _mediapipe_lite_backend(**kwargs):
+    # Fast CPU configuration for benchmarking against the default complexity-2 model
+    from GYMDetector import PoseDetector
+    check_backend_options('mediapipe_lite', PoseDetector, kwargs)
+    kwargs.setdefault('model_complexity', 0)
+    return PoseDetector(**kwargs)
+
+register_pose_backend('vitpose')(ViTPoseDetector)
+register_pose_backend('openpose')(OpenPoseDetector)
@@ -0,0 +1,110 @@
+import heapq
+import numpy as np
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+DEFAULT_WEIGHTS = {
+    'equipment': 4.0,
+    'position': 4.0,
+    'motion': 2.0
+}
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores, best first.
+
+    Selects with argpartition, so only the k winners are sorted. Ties are broken by
+    the lower index, exactly like a stable descending sort of all scores.
+
+    Args:
+        scores: (n,) array of scores
+        k: Number of indices to return
+
+    Returns:
+        (min(k, n),) int array
+    """
+    scores = np.asarray(scores)
+    n = len(scores)
+    k = min(k, n)
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if k == n:
+        return np.argsort(-scores, kind='stable')
+    kth = scores[np.argpartition(-scores, k - 1)[:k]].min()
+    # Everything strictly above the k-th score wins; ties at the boundary go to the lowest indices
+    above = np.flatnonzero(scores > kth)
+    ties = np.flatnonzero(scores == kth)[:k - len(above)]
+    selected = np.concatenate([above, ties])
+    return selected[np.argsort(-scores[selected], kind='stable')]
+
+def rank_top_k(candidates: Iterable[Any], score_fn: Callable[[Any], float], k: int,
+               bound_fn: Callable[[Any], float] = None) -> List[Tuple[Any, float]]:
+    """
+    Heap-based top-k over candidates scored one at a time.
+
+    Args:
+        candidates: Items to rank, in tie-break order (earlier wins)
+        score_fn: Full score of a candidate
+        k: Number of results
+        bound_fn: Optional cheap upper bound on score_fn; candidates whose bound
+            cannot beat the current k-th best are skipped without being scored
+
+    Returns:
+        List of (candidate, score), best first, identical to sorting every score
+        in descending order and keeping the first k
+    """
+    if k <= 0:
+        return []
+    heap = []  # (score, -position, candidate); heap[0] is the current k-th best
+    for position, candidate in enumerate(candidates):
+        if len(heap) == k and bound_fn is not None and bound_fn(candidate) <= heap[0][0]:
+            # A tie would lose to the earlier candidate already kept
+            continue
+        entry = (score_fn(candidate), -position, candidate)
+        if len(heap) < k:
+            heapq.heappush(heap, entry)
+        elif entry[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, entry)
+    return [(candidate, score) for score, _, candidate in sorted(heap, key=lambda e: (-e[0], -e[1]))]
+
+def equipment_upper_bound(extracted_rules: Dict, reference_exercise: Dict,
+                          weights: dict = DEFAULT_WEIGHTS) -> float:
+    """
+    Upper bound on calculate_similarity_with_details from the equipment term alone.
+
+    Position and motion each contribute at most their full weight, so the bound is
+    the weighted equipment score plus the remaining weights.
+
+    Args:
+        extracted_rules: Complete extracted rules including equipment
+        reference_exercise: Complete reference exercise rules
+        weights: Component weights
+
+    Returns:
+        float: Score the exercise cannot exceed
+    """
+    equipment_score = 0.0
+    if 'equipment' in extracted_rules and 'equipment' in reference_exercise:
+        ext_equipment = set(extracted_rules['equipment']['type'])
+        ref_equipment = set(reference_exercise['equipment']['type'])
+        if ref_equipment and ext_equipment:
+            equipment_score = len(ext_equipment & ref_equipment) / len(ext_equipment | ref_equipment)
+    # Small slack so floating-point rounding in the full score never exceeds the bound
+    return (equipment_score * weights['equipment'] + weights['position'] + weights['motion']) / 10.0 + 1e-9
+
+def explain_matches(extracted_rules: Dict, matches: List[Tuple[str, float]],
+                    exercises_by_name: Dict[str, Dict]) -> Dict[str, Dict]:
+    """
+    Per-joint score breakdowns for the returned matches only.
+
+    Args:
+        extracted_rules: Complete extracted rules including equipment
+        matches: (exercise_name, score) pairs from a ranking
+        exercises_by_name: Reference exercise rules keyed by the names used in matches
+
+    Returns:
+        Dictionary mapping exercise name to calculate_similarity_with_details breakdown
+    """
+    # Imported here because helper's own ranking functions import this module
+    from helper import calculate_similarity_with_details
+    return {name: calculate_similarity_with_details(extracted_rules, exercises_by_name[name])[1]
+            for name, _ in matches}
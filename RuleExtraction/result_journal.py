@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Optional
+from landmark_cache import hash_file
+
+def config_hash(config: Dict) -> str:
+    """
+    Hash a JSON-serializable run configuration.
+
+    Args:
+        config: Everything that determines a video's results
+
+    Returns:
+        Hex SHA-1 digest of the canonical JSON encoding
+    """
+    return hashlib.sha1(json.dumps(config, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+class ResultJournal:
+    """JSONL log of per-video analysis results, so interrupted runs can resume."""
+
+    def __init__(self, path: str):
+        """
+        Open (or create) a journal and index the entries already in it.
+
+        Args:
+            path: JSONL file; one line per finished or failed video
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._latest = {}
+        # abspath -> (size, mtime_ns, hash) of videos seen in the journal or hashed this run
+        self._video_stats = {}
+        self._line_count = 0
+        self._partial_tail = False
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            line = ''
+            for line_number, line in enumerate(f, 1):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A run killed mid-write leaves at most one partial line
+                    print(f"Ignoring unreadable journal line {line_number} in {self.path}")
+                    continue
+                self._line_count += 1
+                self._latest[(entry['video_hash'], entry['config_hash'])] = entry
+                self._remember_video(entry)
+            # Start the next entry on a fresh line if the last write was cut short
+            self._partial_tail = bool(line) and not line.endswith('\n')
+
+    def _remember_video(self, entry: Dict):
+        if entry.get('video_size') is not None:
+            self._video_stats[os.path.abspath(entry['video_path'])] = (
+                entry['video_size'], entry['video_mtime_ns'], entry['video_hash'])
+
+    def video_hash(self, video_path: str) -> str:
+        """
+        Content hash of a video, reusing the journaled one while the file's size and mtime are unchanged.
+
+        Args:
+            video_path: Path to the video file
+
+        Returns:
+            Hex SHA-1 digest of the file bytes
+        """
+        stat = os.stat(video_path)
+        abs_path = os.path.abspath(video_path)
+        known = self._video_stats.get(abs_path)
+        if known is not None and known[:2] == (stat.st_size, stat.st_mtime_ns):
+            return known[2]
+        digest = hash_file(video_path)
+        self._video_stats[abs_path] = (stat.st_size, stat.st_mtime_ns, digest)
+        return digest
+
+    def record(self, video_hash: str, config_hash: str, video_path: str, expected_activity: str,
+               results: Dict = None, error: str = None) -> Dict:
+        """
+        Append one video's outcome and flush it to disk before returning.
+
+        Args:
+            video_hash: Content hash of the video
+            config_hash: config_hash() of the run configuration
+            video_path: Path the video was read from
+            expected_activity: Ground-truth activity name
+            results: analyze_video output, or None on failure
+            error: Formatted traceback on failure
+
+        Returns:
+            The journal entry
+        """
+        known = self._video_stats.get(os.path.abspath(video_path))
+        entry = {
+            'video_hash': video_hash,
+            'config_hash': config_hash,
+            'video_path': video_path,
+            # Lets video_hash() skip re-reading the file on later runs
+            'video_size': known[0] if known and known[2] == video_hash else None,
+            'video_mtime_ns': known[1] if known and known[2] == video_hash else None,
+            'expected_activity': expected_activity,
+            'finished': time.time(),
+            'results': results,
+            'error': error
+        }
+        line = json.dumps(entry)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            if self._partial_tail:
+                f.write('\n')
+                self._partial_tail = False
+            f.write(line + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self._line_count += 1
+        # Keep the in-memory view identical to what a reload would see
+        self._latest[(video_hash, config_hash)] = json.loads(line)
+        return self._latest[(video_hash, config_hash)]
+
+    def compact(self) -> int:
+        """
+        Rewrite the journal with only the latest entry per video and configuration.
+
+        Every run appends, so re-analyzed videos leave superseded lines behind. The
+        compacted file is written beside the journal and swapped in, so an interrupted
+        compaction keeps the old journal.
+
+        Returns:
+            Number of superseded lines dropped
+        """
+        dropped = self._line_count - len(self._latest)
+        if dropped <= 0 and not self._partial_tail:
+            return 0
+        partial_path = self.path + ".part"
+        with open(partial_path, 'w', encoding='utf-8') as f:
+            for entry in sorted(self._latest.values(), key=lambda e: e['finished']):
+                f.write(json.dumps(entry) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(partial_path, self.path)
+        self._line_count = len(self._latest)
+        self._partial_tail = False
+        return max(dropped, 0)
+
+    def latest(self, video_hash: str, config_hash: str) -> Optional[Dict]:
+        """Most recent entry for a video under a configuration, or None."""
+        return self._latest.get((video_hash, config_hash))
+
+    def is_complete(self, video_hash: str, config_hash: str) -> bool:
+        """Whether the video already has a successful result under this configuration."""
+        entry = self.latest(video_hash, config_hash)
+        return entry is not None and entry['error'] is None
@@ -0,0 +1,246 @@
+import numpy as np
+from typing import Dict, List, Tuple
+from ranking import top_k_indices, explain_matches
+
+class ReferenceRuleIndex:
+    """Reference exercise rules compiled into label-incidence matrices for vectorized matching."""
+
+    RULE_TYPES = ('position', 'motion')
+
+    def __init__(self, exercise_rules: list):
+        """
+        Compile reference exercises into an index.
+
+        Args:
+            exercise_rules: List of exercise rule dicts, as from build_exercise_rules_json()
+        """
+        self.exercise_names = [exercise['activity'].lower() for exercise in exercise_rules]
+        # Kept for score breakdowns of ranked matches
+        self.exercises_by_name = dict(zip(self.exercise_names, exercise_rules))
+
+        # Intern joints and the position/motion/equipment vocabularies into integer ids
+        self.joints = []
+        self.vocab = {rule_type: {} for rule_type in self.RULE_TYPES + ('equipment',)}
+        for exercise in exercise_rules:
+            for joint, rules in exercise['body_landmarks'].items():
+                if joint not in self.joints:
+                    self.joints.append(joint)
+                for rule_type in self.RULE_TYPES:
+                    for label in rules.get(rule_type, []):
+                        self.vocab[rule_type].setdefault(label, len(self.vocab[rule_type]))
+            for label in exercise.get('equipment', {}).get('type', []):
+                self.vocab['equipment'].setdefault(label, len(self.vocab['equipment']))
+        self.joint_ids = {joint: i for i, joint in enumerate(self.joints)}
+
+        # (exercises x joints x labels) incidence per rule type, (exercises x labels) for equipment
+        num_exercises = len(exercise_rules)
+        self.incidence = {
+            rule_type: np.zeros((num_exercises, len(self.joints), len(self.vocab[rule_type])), dtype=bool)
+            for rule_type in self.RULE_TYPES
+        }
+        self.equipment_incidence = np.zeros((num_exercises, len(self.vocab['equipment'])), dtype=bool)
+        for m, exercise in enumerate(exercise_rules):
+            for joint, rules in exercise['body_landmarks'].items():
+                j = self.joint_ids[joint]
+                for rule_type in self.RULE_TYPES:
+                    for label in rules.get(rule_type, []):
+                        self.incidence[rule_type][m, j, self.vocab[rule_type][label]] = True
+            for label in exercise.get('equipment', {}).get('type', []):
+                self.equipment_incidence[m, self.vocab['equipment'][label]] = True
+
+        # Label-set sizes, reused by every query
+        self.set_sizes = {rule_type: self.incidence[rule_type].sum(axis=2) for rule_type in self.RULE_TYPES}
+        self.equipment_sizes = self.equipment_incidence.sum(axis=1)
+
+    def __len__(self) -> int:
+        return len(self.exercise_names)
+
+    def _encode_labels(self, rule_type: str, labels: list) -> Tuple[np.ndarray, int]:
+        """
+        Encode a label list as an incidence vector over the vocabulary.
+
+        Returns:
+            tuple: (incidence vector, total distinct labels including ones outside the vocabulary)
+        """
+        vocab = self.vocab[rule_type]
+        vector = np.zeros(len(vocab), dtype=bool)
+        distinct = set(labels)
+        for label in distinct:
+            if label in vocab:
+                vector[vocab[label]] = True
+        return vector, len(distinct)
+
+    def _encode_landmarks(self, rule_type: str, body_landmarks: Dict) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Encode extracted body landmark rules for one rule type.
+
+        Returns:
+            tuple: (joints x labels incidence, per-joint distinct label counts)
+        """
+        vectors = np.zeros((len(self.joints), len(self.vocab[rule_type])), dtype=bool)
+        sizes = np.zeros(len(self.joints), dtype=np.int64)
+        for joint, rules in body_landmarks.items():
+            if joint in self.joint_ids:
+                j = self.joint_ids[joint]
+                vectors[j], sizes[j] = self._encode_labels(rule_type, rules.get(rule_type, []))
+        return vectors, sizes
+
+    def _joint_jaccard(self, rule_type: str, body_landmarks: Dict) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Per-joint Jaccard similarity against every exercise.
+
+        Returns:
+            tuple: (exercises x joints similarities, exercises x joints mask of scored joints)
+        """
+        ext_vectors, ext_sizes = self._encode_landmarks(rule_type, body_landmarks)
+        ref_sizes = self.set_sizes[rule_type]
+
+        intersection = np.einsum('mjv,jv->mj', self.incidence[rule_type], ext_vectors, dtype=np.int64)
+        union = ref_sizes + ext_sizes[None, :] - intersection
+        # Same rule as calculate_rule_similarity: only joints with labels on both sides count
+        scored = (ref_sizes > 0) & (ext_sizes > 0)[None, :]
+        similarity = np.divide(intersection, union, out=np.zeros(union.shape), where=scored)
+        return similarity, scored
+
+    def score_landmarks(self, body_landmarks: Dict,
+                        weights: dict = {
+                            'equipment': 4.0,
+                            'position': 4.0,
+                            'motion': 2.0
+                        }) -> np.ndarray:
+        """
+        Vectorized calculate_rule_similarity against every reference exercise.
+
+        Args:
+            body_landmarks: Extracted 'body_landmarks' rules
+            weights: Component weights (should sum to 10.0)
+
+        Returns:
+            np.ndarray: Similarity per exercise, in exercise_names order
+        """
+        total_weight = sum(weights.values())
+        if abs(total_weight - 10.0) > 0.001:
+            raise ValueError(f"Weights must sum to 10.0, got {total_weight}")
+
+        final_score = np.zeros(len(self))
+        for rule_type in self.RULE_TYPES:
+            similarity, scored = self._joint_jaccard(rule_type, body_landmarks)
+            counts = scored.sum(axis=1)
+            average = np.divide(similarity.sum(axis=1), counts, out=np.zeros(len(self)), where=counts > 0)
+            final_score += average * weights[rule_type] / 10.0
+        return final_score
+
+    def score_equipment(self, equipment: Dict) -> np.ndarray:
+        """
+        Vectorized calculate_equipment_similarity against every reference exercise.
+
+        Args:
+            equipment: Extracted 'equipment' rules
+
+        Returns:
+            np.ndarray: Weighted equipment similarity per exercise
+        """
+        ext_vector, ext_size = self._encode_labels('equipment', equipment.get('type', []))
+        intersection = self.equipment_incidence[:, ext_vector].sum(axis=1)
+        union = self.equipment_sizes + ext_size - intersection
+        scored = (self.equipment_sizes > 0) & (ext_size > 0)
+        similarity = np.divide(intersection, union, out=np.zeros(len(self)), where=scored)
+        return similarity * 0.4
+
+    def score(self, extracted_rules: Dict) -> np.ndarray:
+        """
+        Landmark plus equipment similarity of one video against every exercise.
+
+        Args:
+            extracted_rules: Rules from process_video_with_rules
+
+        Returns:
+            np.ndarray: Total similarity per exercise, in exercise_names order
+        """
+        return (self.score_landmarks(extracted_rules['body_landmarks']) +
+                self.score_equipment(extracted_rules['equipment']))
+
+    def score_matrices(self, extracted_rule_sets: List[Dict],
+                       weights: dict = {
+                           'equipment': 4.0,
+                           'position': 4.0,
+                           'motion': 2.0
+                       }) -> Dict[str, np.ndarray]:
+        """
+        Score N videos against all M exercises at once.
+
+        The N extracted rule sets are encoded into the same label-incidence layout as
+        the references, so every per-joint intersection is one batched matrix product
+        per rule type, (joints x N x labels) @ (joints x labels x M).
+
+        Args:
+            extracted_rule_sets: Rules from process_video_with_rules, one per video
+            weights: Component weights (should sum to 10.0)
+
+        Returns:
+            Dictionary of (N x M) arrays: 'position' and 'motion' (mean per-joint
+            Jaccard), 'equipment' (Jaccard) and 'total' (weighted, as score())
+        """
+        total_weight = sum(weights.values())
+        if abs(total_weight - 10.0) > 0.001:
+            raise ValueError(f"Weights must sum to 10.0, got {total_weight}")
+
+        num_videos = len(extracted_rule_sets)
+        matrices = {}
+        for rule_type in self.RULE_TYPES:
+            ext_vectors = np.zeros((num_videos, len(self.joints), len(self.vocab[rule_type])), dtype=np.float64)
+            ext_sizes = np.zeros((num_videos, len(self.joints)), dtype=np.int64)
+            for n, rules in enumerate(extracted_rule_sets):
+                ext_vectors[n], ext_sizes[n] = self._encode_landmarks(rule_type, rules['body_landmarks'])
+            ref_vectors = self.incidence[rule_type].astype(np.float64)
+            ref_sizes = self.set_sizes[rule_type]
+
+            # (joints x N x M) intersections, then Jaccard over joints scored on both sides
+            intersection = np.matmul(ext_vectors.transpose(1, 0, 2), ref_vectors.transpose(1, 2, 0))
+            union = ext_sizes.T[:, :, None] + ref_sizes.T[:, None, :] - intersection
+            scored = (ext_sizes.T > 0)[:, :, None] & (ref_sizes.T > 0)[:, None, :]
+            similarity = np.divide(intersection, union, out=np.zeros(union.shape), where=scored)
+            counts = scored.sum(axis=0)
+            matrices[rule_type] = np.divide(similarity.sum(axis=0), counts,
+                                            out=np.zeros(counts.shape), where=counts > 0)
+
+        ext_equipment = np.zeros((num_videos, len(self.vocab['equipment'])), dtype=np.float64)
+        ext_equipment_sizes = np.zeros(num_videos, dtype=np.int64)
+        for n, rules in enumerate(extracted_rule_sets):
+            ext_equipment[n], ext_equipment_sizes[n] = self._encode_labels('equipment', rules['equipment'].get('type', []))
+        intersection = ext_equipment @ self.equipment_incidence.T.astype(np.float64)
+        union = ext_equipment_sizes[:, None] + self.equipment_sizes[None, :] - intersection
+        scored = (ext_equipment_sizes > 0)[:, None] & (self.equipment_sizes > 0)[None, :]
+        matrices['equipment'] = np.divide(intersection, union, out=np.zeros(union.shape), where=scored)
+
+        matrices['total'] = (matrices['position'] * weights['position'] / 10.0 +
+                             matrices['motion'] * weights['motion'] / 10.0 +
+                             matrices['equipment'] * weights['equipment'] / 10.0)
+        return matrices
+
+    def top_k(self, extracted_rules: Dict, k: int = 3) -> List[Tuple[str, float]]:
+        """
+        Best-matching exercises for one video.
+
+        Args:
+            extracted_rules: Rules from process_video_with_rules
+            k: Number of matches to return
+
+        Returns:
+            List of (exercise_name, similarity), best first; ties keep exercise_names order
+        """
+        scores = self.score(extracted_rules)
+        return [(self.exercise_names[i], float(scores[i])) for i in top_k_indices(scores, k)]
+
+    def explain(self, extracted_rules: Dict, matches: List[Tuple[str, float]]) -> Dict[str, Dict]:
+        """
+        Per-joint calculate_similarity_with_details breakdowns for ranked matches only.
+
+        Args:
+            extracted_rules: Rules from process_video_with_rules
+            matches: Output of top_k
+
+        Returns:
+            Dictionary mapping exercise name to its score breakdown
+        """
+        return explain_matches(extracted_rules, matches, self.exercises_by_name)
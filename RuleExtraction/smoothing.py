@@ -0,0 +1,210 @@
+import numpy as np
+from typing import Dict
+
+class LandmarkSmoother:
+    """
+    Moving-average smoothing with z-score spike rejection for every landmark at once.
+
+    Keeps a (window x joints x 2) ring buffer of raw positions plus running sums and
+    sums of squares, so each frame is one vectorized update instead of a
+    deque-to-array conversion per landmark.
+    """
+
+    def __init__(self, window_size: int = 5, spike_threshold: float = 0.2, num_joints: int = 33):
+        """
+        Initialize the smoother.
+
+        Args:
+            window_size: Number of raw frames averaged, including the current one
+            spike_threshold: Threshold for spike detection (in standard deviations)
+            num_joints: Landmarks per frame
+        """
+        if window_size < 1:
+            raise ValueError(f"window_size must be >= 1, got {window_size}")
+        self.window_size = window_size
+        self.spike_threshold = spike_threshold
+        self.num_joints = num_joints
+        self.reset()
+
+    def reset(self):
+        """Clear the history so the next video starts fresh."""
+        self._buffer = np.zeros((self.window_size, self.num_joints, 2), dtype=np.float64)
+        self._sum = np.zeros((self.num_joints, 2), dtype=np.float64)
+        self._sum_sq = np.zeros((self.num_joints, 2), dtype=np.float64)
+        self._count = 0
+        self._head = 0  # slot the next frame is written to
+        self._last = None
+
+    def update(self, positions: np.ndarray) -> np.ndarray:
+        """
+        Add one frame of raw positions and return the smoothed frame.
+
+        Each joint gets the mean of its last window_size raw positions, unless the new
+        position deviates from the earlier ones by more than spike_threshold standard
+        deviations on either axis; then the previous raw position is returned instead.
+        Spikes still enter the history, as they always have.
+
+        Args:
+            positions: (joints, 2) raw x, y positions
+
+        Returns:
+            (joints, 2) float64 smoothed positions
+        """
+        positions = np.asarray(positions, dtype=np.float64)
+        if self._count == 0:
+            self._push(positions)
+            return positions.copy()
+
+        # Statistics of the history that stays in the window alongside this frame
+        if self._count == self.window_size:
+            oldest = self._buffer[self._head]
+            prev_sum = self._sum - oldest
+            prev_sum_sq = self._sum_sq - oldest * oldest
+            prev_count = self.window_size - 1
+        else:
+            prev_sum, prev_sum_sq, prev_count = self._sum, self._sum_sq, self._count
+
+        spikes = None
+        if prev_count >= 2:
+            mean = prev_sum / prev_count
+            std = np.sqrt(np.maximum(prev_sum_sq / prev_count - mean * mean, 0.0))
+            z_score = np.abs((positions - mean) / (std + 1e-6))
+            spikes = np.any(z_score > self.spike_threshold, axis=1)
+
+        previous = self._last
+        self._sum = prev_sum + positions
+        self._sum_sq = prev_sum_sq + positions * positions
+        self._push(positions)
+
+        smoothed = self._sum / self._count
+        if spikes is not None and spikes.any():
+            smoothed[spikes] = previous[spikes]
+        return smoothed
+
+    def _push(self, positions: np.ndarray):
+        if self._count == 0:
+            self._sum = positions.copy()
+            self._sum_sq = positions * positions
+        self._buffer[self._head] = positions
+        self._last = self._buffer[self._head]
+        self._head = (self._head + 1) % self.window_size
+        self._count = min(self._count + 1, self.window_size)
+        if self._head == 0 and self._count == self.window_size:
+            # Resum once per lap so floating-point drift in the running sums stays bounded
+            self._sum = self._buffer.sum(axis=0)
+            self._sum_sq = np.square(self._buffer).sum(axis=0)
+
+def one_euro_filter(trajectory: np.ndarray, time_deltas: np.ndarray, min_cutoff: float = 1.0,
+                    beta: float = 0.0, d_cutoff: float = 1.0) -> np.ndarray:
+    """
+    One-Euro filter (Casiez et al. 2012) over a whole landmark trajectory.
+
+    Smooths heavily while joints are slow and lags less once they move fast.
+
+    Args:
+        trajectory: (frames, joints, C) landmark array; only x and y are filtered
+        time_deltas: (frames,) seconds since the previous frame
+        min_cutoff: Cutoff frequency (Hz) at zero speed
+        beta: How quickly the cutoff rises with speed
+        d_cutoff: Cutoff frequency (Hz) for the speed estimate
+
+    Returns:
+        Filtered copy of trajectory
+    """
+    filtered = np.array(trajectory, dtype=np.float32, copy=True)
+    if len(filtered) < 2:
+        return filtered
+
+    def alpha(cutoff, dt):
+        tau = 1.0 / (2 * np.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    raw = np.asarray(trajectory[:, :, :2], dtype=np.float64)
+    x_prev = raw[0]
+    dx_prev = np.zeros_like(x_prev)
+    for t in range(1, len(raw)):
+        dt = max(float(time_deltas[t]), 1e-6)
+        dx = (raw[t] - x_prev) / dt
+        a_d = alpha(d_cutoff, dt)
+        dx_prev = a_d * dx + (1 - a_d) * dx_prev
+        a = alpha(min_cutoff + beta * np.abs(dx_prev), dt)
+        x_prev = a * raw[t] + (1 - a) * x_prev
+        filtered[t, :, :2] = x_prev
+    return filtered
+
+def savgol_coefficients(window_length: int, polyorder: int, deriv_at: int = None) -> np.ndarray:
+    """
+    Least-squares weights that evaluate a polynomial fit of a window at one sample.
+
+    Args:
+        window_length: Samples in the window
+        polyorder: Polynomial order, below window_length
+        deriv_at: Window position to evaluate at; None means the center
+
+    Returns:
+        (window_length,) weights
+    """
+    if deriv_at is None:
+        deriv_at = window_length // 2
+    offsets = np.arange(window_length) - deriv_at
+    vandermonde = np.vander(offsets, polyorder + 1, increasing=True)
+    # Row 0 of the pseudo-inverse gives the fitted value at offset 0
+    return np.linalg.pinv(vandermonde)[0]
+
+def savgol_filter(trajectory: np.ndarray, window_length: int = 9, polyorder: int = 2) -> np.ndarray:
+    """
+    Savitzky-Golay filter along the frame axis of a landmark trajectory.
+
+    Keeps peaks and turning points sharper than a moving average of the same width.
+    The first and last window_length // 2 frames are evaluated from a fit of the
+    nearest full window.
+
+    Args:
+        trajectory: (frames, joints, C) landmark array; only x and y are filtered
+        window_length: Odd number of frames per fit
+        polyorder: Polynomial order, below window_length
+
+    Returns:
+        Filtered copy of trajectory
+    """
+    if window_length % 2 == 0 or polyorder >= window_length:
+        raise ValueError("window_length must be odd and greater than polyorder")
+    filtered = np.array(trajectory, dtype=np.float32, copy=True)
+    num_frames = len(filtered)
+    if num_frames < window_length:
+        return filtered
+
+    raw = np.asarray(trajectory[:, :, :2], dtype=np.float64)
+    half = window_length // 2
+    # Interior frames: every window is centered, so one set of weights applies
+    windows = np.lib.stride_tricks.sliding_window_view(raw, window_length, axis=0)
+    filtered[half:num_frames - half, :, :2] = windows @ savgol_coefficients(window_length, polyorder)
+    # Edge frames: evaluate the first and last full windows off-center
+    for position in range(half):
+        weights = savgol_coefficients(window_length, polyorder, position)
+        filtered[position, :, :2] = np.tensordot(weights, raw[:window_length], axes=1)
+        filtered[num_frames - 1 - position, :, :2] = np.tensordot(
+            weights[::-1], raw[num_frames - window_length:], axes=1)
+    return filtered
+
+# Offline trajectory filters selectable by name
+TRAJECTORY_FILTERS = {
+    'one_euro': lambda landmarks, time_deltas: one_euro_filter(landmarks, time_deltas),
+    'savgol': lambda landmarks, time_deltas: savgol_filter(landmarks),
+}
+
+def filter_trajectory(frames: Dict, method: str, time_deltas: np.ndarray) -> Dict:
+    """
+    Apply a named offline filter to collected landmarks.
+
+    Args:
+        frames: Output of collect_video_landmarks (or a landmark cache entry)
+        method: Key of TRAJECTORY_FILTERS
+        time_deltas: (frames,) seconds since the previous analyzed frame
+
+    Returns:
+        Copy of frames with filtered 'landmarks'
+    """
+    if method not in TRAJECTORY_FILTERS:
+        raise ValueError(f"Unknown trajectory filter '{method}', expected one of {sorted(TRAJECTORY_FILTERS)}")
+    return dict(frames, landmarks=TRAJECTORY_FILTERS[method](frames['landmarks'], time_deltas))
@@ -30,9 +30,18 @@ class TorsoRules:
         self.MOTION_THRESHOLD = 0.05
         self.ROTATION_THRESHOLD = 0.08
 
-    def extract_torso_rules(self, landmarks: Dict[str, Tuple[float, float]]) -> Dict[str, Dict[str, List[str]]]:
-        """Extract comprehensive torso position and motion rules."""
+    def extract_torso_rules(self, landmarks: Dict[str, Tuple[float, float]],
+                            time_delta: float = None) -> Dict[str, Dict[str, List[str]]]:
+        """
+        Extract comprehensive torso position and motion rules.
+        
+        Args:
+            landmarks: Dictionary of landmark coordinates
+            time_delta: Seconds since the previous analyzed frame; motion thresholds
+                scale with it (None means one frame at REFERENCE_FPS)
+        """
         torso_positions = get_empty_torso_position()
+        motion_scale = motion_threshold_scale(time_delta)
         
         # Get key landmarks
         left_shoulder = landmarks.get('left_shoulder')
@@ -70,7 +79,7 @@ class TorsoRules:
             if all(self.previous_landmarks[k] is not None for k in self.previous_landmarks):
                 # Torso motion
                 torso_positions['torso']['motion'] = self._detect_torso_motion(
-                    self.previous_landmarks['torso'], torso_center)
+                    self.previous_landmarks['torso'], torso_center, motion_scale)
                 
                 # Hip motions
                 torso_positions['left_hip']['motion'] = self._detect_hip_motion(
@@ -78,14 +87,16 @@ class TorsoRules:
                     left_hip,
                     self.previous_landmarks['left_shoulder'],
                     left_shoulder,
-                    'left'
+                    'left',
+                    motion_scale
                 )
                 torso_positions['right_hip']['motion'] = self._detect_hip_motion(
                     self.previous_landmarks['right_hip'],
                     right_hip,
                     self.previous_landmarks['right_shoulder'],
                     right_shoulder,
-                    'right'
+                    'right',
+                    motion_scale
                 )
                 
                 # Shoulder motions
@@ -94,14 +105,16 @@ class TorsoRules:
                     left_shoulder,
                     self.previous_landmarks['right_shoulder'],
                     right_shoulder,
-                    'left'
+                    'left',
+                    motion_scale
                 )
                 torso_positions['right_shoulder']['motion'] = self._detect_shoulder_motion(
                     self.previous_landmarks['right_shoulder'],
                     right_shoulder,
                     self.previous_landmarks['left_shoulder'],
                     left_shoulder,
-                    'right'
+                    'right',
+                    motion_scale
                 )
             
             # Update previous landmarks
@@ -196,26 +209,27 @@ class TorsoRules:
 
     def _detect_hip_motion(self, prev_hip: np.ndarray, curr_hip: np.ndarray,
                          prev_shoulder: np.ndarray, curr_shoulder: np.ndarray,
-                         side: str) -> List[str]:
+                         side: str, motion_scale: float = 1.0) -> List[str]:
         """Detect hip motion patterns."""
         motions = []
+        motion_threshold = self.MOTION_THRESHOLD * motion_scale
         
         # Calculate movement vectors
         hip_movement = curr_hip - prev_hip
         shoulder_movement = curr_shoulder - prev_shoulder
         
         # Vertical movements (extension/flexion)
-        if abs(hip_movement[1]) > self.MOTION_THRESHOLD:
+        if abs(hip_movement[1]) > motion_threshold:
             if hip_movement[1] < 0:  # Moving upward
                 motions.append('extension')
             else:  # Moving downward
                 motions.append('flexion')
                 
         # Horizontal movements
-        if abs(hip_movement[0]) > self.MOTION_THRESHOLD:
+        if abs(hip_movement[0]) > motion_threshold:
             # Calculate relative to shoulder movement to determine if it's real hip movement
             relative_movement = hip_movement[0] - shoulder_movement[0]
-            if abs(relative_movement) > self.MOTION_THRESHOLD:
+            if abs(relative_movement) > motion_threshold:
                 if relative_movement > 0:
                     motions.append('abduction')
                 else:
@@ -243,26 +257,27 @@ class TorsoRules:
 
     def _detect_shoulder_motion(self, prev_shoulder: np.ndarray, curr_shoulder: np.ndarray,
                               prev_other_shoulder: np.ndarray, curr_other_shoulder: np.ndarray,
-                              side: str) -> List[str]:
+                              side: str, motion_scale: float = 1.0) -> List[str]:
         """Detect shoulder motion patterns."""
         motions = []
+        motion_threshold = self.MOTION_THRESHOLD * motion_scale
         
         # Calculate movement vectors
         shoulder_movement = curr_shoulder - prev_shoulder
         other_shoulder_movement = curr_other_shoulder - prev_other_shoulder
         
         # Vertical movements
-        if abs(shoulder_movement[1]) > self.MOTION_THRESHOLD:
+        if abs(shoulder_movement[1]) > motion_threshold:
             if shoulder_movement[1] < 0:  # Moving upward
                 motions.append('elevation')
             else:  # Moving downward
                 motions.append('depression')
         
         # Horizontal movements
-        if abs(shoulder_movement[0]) > self.MOTION_THRESHOLD:
+        if abs(shoulder_movement[0]) > motion_threshold:
             # Calculate relative movement to detect true protraction/retraction
             relative_movement = shoulder_movement[0] - other_shoulder_movement[0]
-            if abs(relative_movement) > self.MOTION_THRESHOLD:
+            if abs(relative_movement) > motion_threshold:
                 if ((side == 'left' and relative_movement < 0) or 
                     (side == 'right' and relative_movement > 0)):
                     motions.append('scapular retraction')
@@ -290,22 +305,23 @@ class TorsoRules:
         return motions
 
     def _detect_torso_motion(self, prev_center: np.ndarray, 
-                           curr_center: np.ndarray) -> List[str]:
+                           curr_center: np.ndarray, motion_scale: float = 1.0) -> List[str]:
         """Detect torso motion patterns."""
         motions = []
+        motion_threshold = self.MOTION_THRESHOLD * motion_scale
         
         # Calculate movement vector
         movement = curr_center - prev_center
         
         # Vertical movements
-        if abs(movement[1]) > self.MOTION_THRESHOLD:
+        if abs(movement[1]) > motion_threshold:
             if movement[1] < 0:  # Moving upward
                 motions.append('extension')
             else:  # Moving downward
                 motions.append('flexion')
         
         # Lateral movements
-        if abs(movement[0]) > self.MOTION_THRESHOLD:
+        if abs(movement[0]) > motion_threshold:
             if movement[0] > 0:
                 motions.append('lateral flexion right')
             else:
@@ -315,4 +331,179 @@ class TorsoRules:
         if not motions:
             motions.append('stationary')
             
-        return motions
\ No newline at end of file
+        return motions
+
+    def extract_torso_rules_trajectory(self, trajectory: np.ndarray,
+                                       time_deltas: np.ndarray = None) -> Dict[str, Dict[str, Dict[str, np.ndarray]]]:
+        """
+        Extract torso rules for a whole landmark trajectory in one vectorized pass.
+        
+        Produces the same labels as calling extract_torso_rules on each frame in order.
+        
+        Args:
+            trajectory: (frames x 33 x 4) landmark array (x, y, z, visibility); only x, y are used
+            time_deltas: Optional (frames,) seconds since the previous frame
+            
+        Returns:
+            Dictionary mapping each torso landmark to {'position': {label: mask},
+            'motion': {label: mask}}, where each mask is a boolean array over frames
+        """
+        left_shoulder = trajectory_joint(trajectory, 'left_shoulder')
+        right_shoulder = trajectory_joint(trajectory, 'right_shoulder')
+        left_hip = trajectory_joint(trajectory, 'left_hip')
+        right_hip = trajectory_joint(trajectory, 'right_hip')
+        motion_scale = trajectory_motion_scale(time_deltas, len(trajectory))
+        
+        # Calculate centers
+        shoulder_center = (left_shoulder + right_shoulder) / 2
+        hip_center = (left_hip + right_hip) / 2
+        torso_center = (shoulder_center + hip_center) / 2
+        
+        return {
+            'torso': {
+                'position': self._get_torso_position_masks(
+                    shoulder_center, hip_center, left_hip, right_hip),
+                'motion': self._detect_torso_motion_masks(torso_center, motion_scale)
+            },
+            'left_hip': {
+                'position': self._get_hip_position_masks(left_hip, right_hip, left_shoulder),
+                'motion': self._detect_hip_motion_masks(left_hip, left_shoulder, 'left', motion_scale)
+            },
+            'right_hip': {
+                'position': self._get_hip_position_masks(right_hip, left_hip, right_shoulder),
+                'motion': self._detect_hip_motion_masks(right_hip, right_shoulder, 'right', motion_scale)
+            },
+            'left_shoulder': {
+                'position': self._get_shoulder_position_masks(left_shoulder, right_shoulder, left_hip, 'left'),
+                'motion': self._detect_shoulder_motion_masks(left_shoulder, right_shoulder, 'left',
+                                                             motion_scale)
+            },
+            'right_shoulder': {
+                'position': self._get_shoulder_position_masks(right_shoulder, left_shoulder, right_hip, 'right'),
+                'motion': self._detect_shoulder_motion_masks(right_shoulder, left_shoulder, 'right',
+                                                             motion_scale)
+            }
+        }
+
+    def _get_torso_position_masks(self, shoulder_center: np.ndarray, hip_center: np.ndarray,
+                                  left_hip: np.ndarray, right_hip: np.ndarray) -> Dict[str, np.ndarray]:
+        """Vectorized _get_torso_position."""
+        spine_vector = shoulder_center - hip_center
+        spine_angle = np.degrees(np.arctan2(spine_vector[:, 1], spine_vector[:, 0])) + 90
+        
+        shoulder_hip_tilt = np.abs(spine_vector[:, 0] / (spine_vector[:, 1] + 1e-6))
+        hip_tilt = np.abs(left_hip[:, 1] - right_hip[:, 1]) / (np.abs(left_hip[:, 0] - right_hip[:, 0]) + 1e-6)
+        
+        return {
+            'upright': (spine_angle >= self.UPRIGHT_RANGE[0]) & (spine_angle <= self.UPRIGHT_RANGE[1]),
+            'neutral spine': (shoulder_hip_tilt < self.HORIZONTAL_THRESHOLD) & (hip_tilt < self.HORIZONTAL_THRESHOLD),
+            'leaning forward': spine_angle < self.LEAN_FORWARD_THRESHOLD,
+            'leaning backward': spine_angle > self.LEAN_BACK_THRESHOLD,
+            'on bench': hip_center[:, 1] > shoulder_center[:, 1] + self.VERTICAL_THRESHOLD
+        }
+
+    def _get_hip_position_masks(self, hip: np.ndarray, other_hip: np.ndarray,
+                                shoulder: np.ndarray) -> Dict[str, np.ndarray]:
+        """Vectorized _get_hip_position."""
+        hip_shoulder_vector = shoulder - hip
+        hip_angle = np.degrees(np.arctan2(hip_shoulder_vector[:, 1], hip_shoulder_vector[:, 0])) + 90
+        hip_tilt = np.abs(hip[:, 1] - other_hip[:, 1]) / (np.abs(hip[:, 0] - other_hip[:, 0]) + 1e-6)
+        
+        return {
+            'seated': hip[:, 1] > shoulder[:, 1] + self.VERTICAL_THRESHOLD,
+            'hip hinge': hip_tilt > self.SHOULDER_HIP_RATIO,
+            'upright': (hip_angle >= self.UPRIGHT_RANGE[0]) & (hip_angle <= self.UPRIGHT_RANGE[1])
+        }
+
+    def _get_shoulder_position_masks(self, shoulder: np.ndarray, other_shoulder: np.ndarray,
+                                     hip: np.ndarray, side: str) -> Dict[str, np.ndarray]:
+        """Vectorized _get_shoulder_position."""
+        shoulder_diff = shoulder - other_shoulder
+        shoulder_distance = np.sqrt(shoulder_diff[:, 0] * shoulder_diff[:, 0] +
+                                    shoulder_diff[:, 1] * shoulder_diff[:, 1])
+        apart = shoulder_distance > self.RETRACTION_THRESHOLD
+        if side == 'left':
+            retracted_side = shoulder[:, 0] < other_shoulder[:, 0]
+        else:
+            retracted_side = shoulder[:, 0] > other_shoulder[:, 0]
+        
+        return {
+            'on bench': shoulder[:, 1] < hip[:, 1] - self.VERTICAL_THRESHOLD,
+            'retracted': apart & retracted_side,
+            'protracted': apart & ~retracted_side,
+            'neutral': ~apart
+        }
+
+    def _rotation_masks(self, movement: np.ndarray, side: str) -> Dict[str, np.ndarray]:
+        """Vectorized rotation check shared by the hip and shoulder motion detectors."""
+        rotation = np.arctan2(movement[:, 1], movement[:, 0])
+        rotating = np.abs(rotation) > self.ROTATION_THRESHOLD
+        positive = rotation > 0
+        if side == 'left':
+            return {'medial rotation': rotating & positive, 'lateral rotation': rotating & ~positive}
+        return {'medial rotation': rotating & ~positive, 'lateral rotation': rotating & positive}
+
+    def _detect_hip_motion_masks(self, hip: np.ndarray, shoulder: np.ndarray,
+                                 side: str, motion_scale: np.ndarray) -> Dict[str, np.ndarray]:
+        """Vectorized _detect_hip_motion."""
+        motion_threshold = self.MOTION_THRESHOLD * motion_scale
+        hip_movement, has_prev = trajectory_movement(hip)
+        shoulder_movement, _ = trajectory_movement(shoulder)
+        
+        vertical = np.abs(hip_movement[:, 1]) > motion_threshold
+        relative_movement = hip_movement[:, 0] - shoulder_movement[:, 0]
+        lateral = (np.abs(hip_movement[:, 0]) > motion_threshold) & (
+            np.abs(relative_movement) > motion_threshold)
+        
+        masks = {
+            'extension': vertical & (hip_movement[:, 1] < 0),
+            'flexion': vertical & (hip_movement[:, 1] >= 0),
+            'abduction': lateral & (relative_movement > 0),
+            'adduction': lateral & (relative_movement <= 0)
+        }
+        masks.update(self._rotation_masks(hip_movement, side))
+        masks['stationary'] = ~np.logical_or.reduce(list(masks.values()))
+        return {label: mask & has_prev for label, mask in masks.items()}
+
+    def _detect_shoulder_motion_masks(self, shoulder: np.ndarray, other_shoulder: np.ndarray,
+                                      side: str, motion_scale: np.ndarray) -> Dict[str, np.ndarray]:
+        """Vectorized _detect_shoulder_motion."""
+        motion_threshold = self.MOTION_THRESHOLD * motion_scale
+        shoulder_movement, has_prev = trajectory_movement(shoulder)
+        other_shoulder_movement, _ = trajectory_movement(other_shoulder)
+        
+        vertical = np.abs(shoulder_movement[:, 1]) > motion_threshold
+        relative_movement = shoulder_movement[:, 0] - other_shoulder_movement[:, 0]
+        lateral = (np.abs(shoulder_movement[:, 0]) > motion_threshold) & (
+            np.abs(relative_movement) > motion_threshold)
+        if side == 'left':
+            retracting = relative_movement < 0
+        else:
+            retracting = relative_movement > 0
+        
+        masks = {
+            'elevation': vertical & (shoulder_movement[:, 1] < 0),
+            'depression': vertical & (shoulder_movement[:, 1] >= 0),
+            'scapular retraction': lateral & retracting,
+            'scapular protraction': lateral & ~retracting
+        }
+        masks.update(self._rotation_masks(shoulder_movement, side))
+        masks['stationary'] = ~np.logical_or.reduce(list(masks.values()))
+        return {label: mask & has_prev for label, mask in masks.items()}
+
+    def _detect_torso_motion_masks(self, torso_center: np.ndarray,
+                                   motion_scale: np.ndarray) -> Dict[str, np.ndarray]:
+        """Vectorized _detect_torso_motion."""
+        motion_threshold = self.MOTION_THRESHOLD * motion_scale
+        movement, has_prev = trajectory_movement(torso_center)
+        vertical = np.abs(movement[:, 1]) > motion_threshold
+        lateral = np.abs(movement[:, 0]) > motion_threshold
+        
+        masks = {
+            'extension': vertical & (movement[:, 1] < 0),
+            'flexion': vertical & (movement[:, 1] >= 0),
+            'lateral flexion right': lateral & (movement[:, 0] > 0),
+            'lateral flexion left': lateral & (movement[:, 0] <= 0)
+        }
+        masks['stationary'] = ~np.logical_or.reduce(list(masks.values()))
+        return {label: mask & has_prev for label, mask in masks.items()}
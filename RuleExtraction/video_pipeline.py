@@ -0,0 +1,191 @@
+import queue
+import threading
+import cv2
+import numpy as np
+from landmarks import LandmarkSequence
+from frame_sampling import FrameSampler
+from equipment_scheduler import EquipmentDetectionScheduler
+from typing import Callable, Dict
+
+# End-of-stream marker passed down every queue
+_END = object()
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    """Blocking put that gives up once the pipeline is stopping."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _get(q: queue.Queue, stop: threading.Event):
+    """Blocking get that gives up once the pipeline is stopping."""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _END
+
+def _run_stage(name: str, errors: list, stop: threading.Event, body: Callable):
+    """Run a stage body, recording its exception and stopping the other stages on failure."""
+    try:
+        body()
+    except BaseException as e:
+        errors.append((name, e))
+        stop.set()
+
+def collect_video_landmarks_pipelined(video_path: str, equipment_detector, pose_detector,
+                                      sampler: FrameSampler = None, equipment_batch_size: int = 1,
+                                      equipment_scheduler: EquipmentDetectionScheduler = None,
+                                      queue_size: int = 8) -> Dict:
+    """
+    Threaded equivalent of exercise_analyzer.collect_video_landmarks.
+
+    A decoder thread feeds each analyzed frame to a pose thread, which passes the
+    frames with a detected pose on to an equipment thread. The stages work on
+    different frames at the same time. The equipment detector (and the keyframe
+    scheduler) therefore sees exactly the frames collect_video_landmarks sends
+    it, in the same order and batches, so both functions return the same result.
+    Queues are bounded, so wall time tracks the slowest stage while memory stays
+    at a few frames per stage.
+
+    Args:
+        video_path: Path to the video file
+        equipment_detector: Initialized equipment detector
+        pose_detector: Initialized pose detector
+        sampler: Optional FrameSampler with a fixed stride or target fps
+        equipment_batch_size: Frames per equipment detector forward pass
+        equipment_scheduler: Optional EquipmentDetectionScheduler for keyframe-only detection
+        queue_size: Maximum frames buffered between stages
+
+    Returns:
+        Dictionary in the same format as collect_video_landmarks
+    """
+    if sampler is not None and sampler.adaptive_threshold is not None:
+        # The decoder runs ahead of pose detection, so it cannot react to landmark motion
+        raise ValueError("Adaptive frame sampling is not supported by the threaded pipeline")
+    if equipment_scheduler is not None and equipment_batch_size > 1:
+        raise ValueError("Keyframe equipment scheduling runs one frame at a time and cannot be batched")
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"Could not open video: {video_path}")
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    if sampler is None:
+        sampler = FrameSampler()
+    sampler.start(fps)
+    if equipment_scheduler is not None:
+        equipment_scheduler.start()
+    pose_detector.reset()
+
+    # The equipment stage must be able to fill a whole batch while pose detection keeps up
+    queue_size = max(queue_size, equipment_batch_size)
+    pose_in = queue.Queue(maxsize=queue_size)
+    equipment_in = queue.Queue(maxsize=queue_size)
+    results = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+
+    def decode():
+        frame_idx = 0
+        next_analyzed = 0
+        try:
+            while not stop.is_set():
+                if frame_idx < next_analyzed:
+                    if not cap.grab():
+                        break
+                    frame_idx += 1
+                    continue
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if not _put(pose_in, (frame_idx, frame), stop):
+                    break
+                next_analyzed = frame_idx + sampler.next_stride(frame_idx)
+                frame_idx += 1
+        finally:
+            cap.release()
+            _put(pose_in, _END, stop)
+
+    def detect_pose():
+        while True:
+            item = _get(pose_in, stop)
+            if item is _END:
+                break
+            frame_idx, frame = item
+            landmark_row = pose_detector.get_landmark_array_from_frame(frame)
+            # Equipment is only kept for frames with a pose, so only those are passed on
+            if landmark_row is not None and not _put(equipment_in, (frame_idx, frame, landmark_row), stop):
+                return
+        _put(equipment_in, _END, stop)
+
+    def schedule_equipment():
+        while True:
+            item = _get(equipment_in, stop)
+            if item is _END:
+                break
+            frame_idx, frame, landmark_row = item
+            labels = equipment_scheduler.process(frame, equipment_detector)
+            if not _put(results, (frame_idx, landmark_row, labels), stop):
+                return
+        _put(results, _END, stop)
+
+    def detect_equipment():
+        finished = False
+        while not finished:
+            batch = []
+            while len(batch) < equipment_batch_size:
+                item = _get(equipment_in, stop)
+                if item is _END:
+                    finished = True
+                    break
+                batch.append(item)
+            if not batch:
+                continue
+            detections = equipment_detector.detect_equipment_batch([frame for _, frame, _ in batch])
+            for (frame_idx, _, landmark_row), frame_detections in zip(batch, detections):
+                labels = [det['label'] for det in frame_detections]
+                if not _put(results, (frame_idx, landmark_row, labels), stop):
+                    return
+        _put(results, _END, stop)
+
+    threads = [
+        threading.Thread(target=_run_stage, args=(name, errors, stop, body), daemon=True)
+        for name, body in (('decode', decode), ('pose', detect_pose),
+                           ('equipment', detect_equipment if equipment_scheduler is None else schedule_equipment))
+    ]
+    for thread in threads:
+        thread.start()
+
+    landmark_rows = LandmarkSequence()
+    frame_indices = []
+    equipment_labels = []
+    try:
+        # Results arrive in decode order, one per frame with a pose
+        while True:
+            item = _get(results, stop)
+            if item is _END:
+                break
+            frame_idx, landmark_row, labels = item
+            landmark_rows.append(landmark_row)
+            frame_indices.append(frame_idx)
+            equipment_labels.append(labels)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        name, error = errors[0]
+        raise RuntimeError(f"{name} stage failed for {video_path}: {error!r}") from error
+
+    return {
+        'landmarks': landmark_rows.array.copy(),
+        'frame_indices': np.asarray(frame_indices, dtype=np.int32),
+        'equipment': equipment_labels,
+        'fps': fps
+    }
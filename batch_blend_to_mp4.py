@@ -2,10 +2,17 @@ import bpy
 import os
 import sys
 
-def batch_render_blend_files(source_folder, output_folder):
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from render_manifest import RenderManifest
+from render_profiles import DEFAULT_PROFILE, apply_render_profile, get_render_profile
+
+def batch_render_blend_files(source_folder, output_folder, force=False, profile=DEFAULT_PROFILE):
     # Ensure the output folder exists
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
+    manifest = RenderManifest(output_folder)
+    # Engine, resolution, frame rate and MP4 encoding; a different profile re-renders every file
+    settings = get_render_profile(profile)
 
     # Get all .blend files in the source folder
     blend_files = [f for f in os.listdir(source_folder) if f.endswith('.blend')]
@@ -15,30 +22,22 @@ def batch_render_blend_files(source_folder, output_folder):
         output_file_name = os.path.splitext(file_name)[0] + ".mp4"
         output_file_path = os.path.join(output_folder, output_file_name)
 
+        # Skip outputs whose .blend and settings are unchanged since they were rendered
+        source = manifest.source_info(blend_file_path, output_file_name)
+        if not force and manifest.is_up_to_date(output_file_name, source, settings):
+            print(f"Up to date {output_file_name}")
+            continue
+
         # Open the Blender file
         bpy.ops.wm.open_mainfile(filepath=blend_file_path)
 
-        # Set render settings
+        # Set render settings, MP4 output and the output file path
         scene = bpy.context.scene
-        scene.render.engine = 'BLENDER_EEVEE'  # Change to 'CYCLES' if needed
-
-        # Set the output format to MP4
-        scene.render.image_settings.file_format = 'FFMPEG'
-        scene.render.ffmpeg.format = 'MPEG4'
-        scene.render.ffmpeg.codec = 'H264'
-        scene.render.ffmpeg.constant_rate_factor = 'HIGH'
-        scene.render.ffmpeg.ffmpeg_preset = 'GOOD'
-
-        # Set resolution and frame rate if needed
-        scene.render.resolution_x = 1920
-        scene.render.resolution_y = 1080
-        scene.render.fps = 30
-
-        # Set the output file path
-        scene.render.filepath = output_file_path
+        apply_render_profile(scene, settings, output_file_path)
 
         # Render the animation
         bpy.ops.render.render(animation=True)
+        manifest.record(output_file_name, source, settings)
 
         print(f"Rendered and saved {output_file_name}")
 
@@ -47,11 +46,20 @@ if __name__ == "__main__":
     argv = sys.argv
     argv = argv[argv.index("--") + 1:]  # Get all args after "--"
 
+    force = "--force" in argv
+    argv = [arg for arg in argv if arg != "--force"]
+    profile = DEFAULT_PROFILE
+    if "--profile" in argv:
+        i = argv.index("--profile")
+        profile = argv[i + 1]
+        del argv[i:i + 2]
+
     if len(argv) < 2:
-        print("Usage: blender -b -P batch_blend_to_mp4.py -- <source_folder> <output_folder>")
+        print("Usage: blender -b -P batch_blend_to_mp4.py -- <source_folder> <output_folder> "
+              "[--force] [--profile analysis|presentation]")
         sys.exit(1)
 
     source_folder = argv[0]
     output_folder = argv[1]
 
-    batch_render_blend_files(source_folder, output_folder)
+    batch_render_blend_files(source_folder, output_folder, force, profile)
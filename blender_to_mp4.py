@@ -1,14 +1,24 @@
 import bpy
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from render_manifest import RenderManifest
+from render_profiles import apply_render_profile, get_render_profile
 
 # Source folder with Blender files
 source_folder = "./blender_source"
 # Destination folder for the MP4 files
 output_folder = "./blender_mp4"
 
+# Render profile: "presentation" (1080p) or "analysis" (720p, fast) for rule extraction;
+# a different profile re-renders every file
+RENDER_SETTINGS = get_render_profile("presentation")
+
 # Make sure the output folder exists
 if not os.path.exists(output_folder):
     os.makedirs(output_folder)
+manifest = RenderManifest(output_folder)
 
 # Iterate through all files in the source folder
 for file_name in os.listdir(source_folder):
@@ -19,28 +29,22 @@ for file_name in os.listdir(source_folder):
         # Create the output file path (same name as the .blend but with .mp4)
         output_file_name = os.path.splitext(file_name)[0] + ".mp4"
         output_file_path = os.path.join(output_folder, output_file_name)
+
+        # Skip outputs whose .blend and settings are unchanged since they were rendered
+        source = manifest.source_info(blend_file_path, output_file_name)
+        if manifest.is_up_to_date(output_file_name, source, RENDER_SETTINGS):
+            print(f"Up to date {output_file_name}")
+            continue
         
         # Open the Blender file
         bpy.ops.wm.open_mainfile(filepath=blend_file_path)
         
-        # Set the rendering engine (optional)
-        bpy.context.scene.render.engine = 'BLENDER_EEVEE_NEXT'  # Use 'CYCLES' if using Cycles
-
-        
-        # Set the output file format to MP4
-        bpy.context.scene.render.image_settings.file_format = 'FFMPEG'
-        bpy.context.scene.render.ffmpeg.format = 'MPEG4'
-        bpy.context.scene.render.ffmpeg.codec = 'H264'
-        bpy.context.scene.render.ffmpeg.constant_rate_factor = 'HIGH'
-        
-        # Set the resolution, frame rate, and output path
-        bpy.context.scene.render.resolution_x = 1920  # Set resolution width
-        bpy.context.scene.render.resolution_y = 1080  # Set resolution height
-        bpy.context.scene.render.fps = 30  # Set frame rate
-        bpy.context.scene.render.filepath = output_file_path
+        # Set the rendering engine, MP4 output, resolution, frame rate and output path
+        apply_render_profile(bpy.context.scene, RENDER_SETTINGS, output_file_path)
         
         # Render the animation
         bpy.ops.render.render(animation=True,write_still = True)
+        manifest.record(output_file_name, source, RENDER_SETTINGS)
         
         print(f"Rendered {file_name} to {output_file_name}")
 
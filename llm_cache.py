@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import time
+
+class ResponseCache:
+    """Content-addressed on-disk cache of LLM responses, keyed by model, prompts and image bytes."""
+
+    def __init__(self, cache_dir="./llm_cache", max_entries=None, max_bytes=None, max_age_days=None,
+                 evict_every=50):
+        """
+        :param cache_dir: Directory holding one JSON file per cached response.
+        :param max_entries: Keep at most this many entries (least recently used go first), or None.
+        :param max_bytes: Keep the cache under this many bytes on disk, or None.
+        :param max_age_days: Drop entries older than this, or None to keep them forever.
+        :param evict_every: Run eviction after this many writes.
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.evict_every = evict_every
+        self._puts_since_evict = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self.evict()
+
+    @staticmethod
+    def make_key(model, system_prompt, prompt, image_bytes, prompt_version=""):
+        """Hash everything that determines the response."""
+        digest = hashlib.sha256()
+        for part in (model, system_prompt, prompt, prompt_version):
+            encoded = (part or "").encode('utf-8')
+            # Length-prefix each field so different splits never collide
+            digest.update(len(encoded).to_bytes(8, 'big'))
+            digest.update(encoded)
+        digest.update(image_bytes)
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _is_expired(self, created):
+        return self.max_age_days is not None and time.time() - created > self.max_age_days * 86400
+
+    def get(self, key):
+        """Return the cached response, or None on a miss or an expired entry."""
+        path = self._entry_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self._is_expired(entry.get('created', 0)):
+            self._remove(path)
+            return None
+        # Touch the file so eviction treats it as recently used; another process may have
+        # evicted it since the read, which still leaves a valid response to return
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry['response']
+
+    def put(self, key, response, model="", prompt_version=""):
+        """Store a JSON-serializable response."""
+        path = self._entry_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'model': model,
+                'prompt_version': prompt_version,
+                'created': time.time(),
+                'response': response
+            }, f)
+        os.replace(tmp_path, path)
+
+        self._puts_since_evict += 1
+        if self._puts_since_evict >= self.evict_every:
+            self.evict()
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _entries(self):
+        entries = []
+        for file_name in os.listdir(self.cache_dir):
+            if file_name.endswith(".json"):
+                path = os.path.join(self.cache_dir, file_name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until within the size limits."""
+        self._puts_since_evict = 0
+        entries = []
+        for last_used, size, path in self._entries():
+            if self.max_age_days is not None:
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        created = json.load(f).get('created', 0)
+                except (OSError, ValueError):
+                    created = 0
+                if self._is_expired(created):
+                    self._remove(path)
+                    continue
+            entries.append((last_used, size, path))
+
+        entries.sort()
+        total_bytes = sum(size for _, size, _ in entries)
+        while entries and ((self.max_entries is not None and len(entries) > self.max_entries) or
+                           (self.max_bytes is not None and total_bytes > self.max_bytes)):
+            _, size, path = entries.pop(0)
+            total_bytes -= size
+            self._remove(path)
+
+    def invalidate(self, prompt_version=None, model=None):
+        """
+        Delete cached responses.
+
+        :param prompt_version: Only delete entries for this prompt version (None matches any).
+        :param model: Only delete entries for this model (None matches any).
+        :return: Number of entries deleted.
+        """
+        removed = 0
+        for _, _, path in self._entries():
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                entry = {}
+            if ((prompt_version is None or entry.get('prompt_version') == prompt_version) and
+                    (model is None or entry.get('model') == model)):
+                self._remove(path)
+                removed += 1
+        return removed
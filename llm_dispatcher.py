@@ -0,0 +1,122 @@
+import asyncio
+import random
+import time
+
+# 4xx statuses worth retrying: request timeout, conflict and rate limiting.
+# Every 5xx server-side failure is retried too, see is_retryable()
+RETRYABLE_STATUS = {408, 409, 429}
+
+class RateLimiter:
+    """Token-bucket limiter for requests per minute and (estimated) tokens per minute."""
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._request_budget = float(requests_per_minute or 0)
+        self._token_budget = float(tokens_per_minute or 0)
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed_minutes = (now - self._last_refill) / 60.0
+        self._last_refill = now
+        if self.requests_per_minute:
+            self._request_budget = min(float(self.requests_per_minute),
+                                       self._request_budget + elapsed_minutes * self.requests_per_minute)
+        if self.tokens_per_minute:
+            self._token_budget = min(float(self.tokens_per_minute),
+                                     self._token_budget + elapsed_minutes * self.tokens_per_minute)
+
+    async def acquire(self, tokens=0):
+        # Hold the lock while waiting so requests are admitted in arrival order
+        async with self._lock:
+            if self.tokens_per_minute:
+                tokens = min(tokens, self.tokens_per_minute)
+            while True:
+                self._refill()
+                wait = 0.0
+                if self.requests_per_minute and self._request_budget < 1:
+                    wait = max(wait, (1 - self._request_budget) * 60.0 / self.requests_per_minute)
+                if self.tokens_per_minute and self._token_budget < tokens:
+                    wait = max(wait, (tokens - self._token_budget) * 60.0 / self.tokens_per_minute)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            if self.requests_per_minute:
+                self._request_budget -= 1
+            if self.tokens_per_minute:
+                self._token_budget -= tokens
+
+def _status_code(exc):
+    status = getattr(exc, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(exc, 'response', None), 'status_code', None)
+    return status
+
+def is_retryable(exc):
+    """Retry on timeouts, dropped connections, 429 and 5xx responses."""
+    if isinstance(exc, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    # openai.APIConnectionError / APITimeoutError carry no status code
+    if type(exc).__name__ in ('APIConnectionError', 'APITimeoutError'):
+        return True
+    status = _status_code(exc)
+    return status is not None and (status in RETRYABLE_STATUS or status >= 500)
+
+def _retry_after(exc):
+    headers = getattr(getattr(exc, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+async def _run_job(key, job, send, limiter, semaphore, timeout, max_retries, base_delay, max_delay, estimate_tokens):
+    attempt = 0
+    while True:
+        async with semaphore:
+            await limiter.acquire(estimate_tokens(job) if estimate_tokens else 0)
+            try:
+                return key, await asyncio.wait_for(send(job), timeout=timeout)
+            except Exception as e:
+                if attempt >= max_retries or not is_retryable(e):
+                    print(f"Request for {key} failed: {e!r}")
+                    return key, e
+                error = e
+        # Back off outside the semaphore so other jobs keep the slots busy
+        delay = _retry_after(error)
+        if delay is None:
+            delay = min(max_delay, base_delay * (2 ** attempt)) * random.uniform(0.5, 1.0)
+        attempt += 1
+        print(f"Retrying {key} in {delay:.1f}s (attempt {attempt}/{max_retries}): {error!r}")
+        await asyncio.sleep(delay)
+
+async def dispatch(jobs, send, concurrency=8, requests_per_minute=None, tokens_per_minute=None,
+                   timeout=120.0, max_retries=5, base_delay=1.0, max_delay=60.0, estimate_tokens=None):
+    """
+    Run an async request function over many jobs with bounded concurrency, rate limiting and retries.
+
+    :param jobs: Dict of key -> job argument passed to send.
+    :param send: Coroutine function taking one job and returning its response.
+    :param concurrency: Maximum number of requests in flight.
+    :param requests_per_minute: Request-rate cap, or None for no cap.
+    :param tokens_per_minute: Token-rate cap, or None for no cap.
+    :param timeout: Per-attempt timeout in seconds.
+    :param max_retries: Retries per job on 429/5xx/timeouts before giving up.
+    :param base_delay: First backoff delay in seconds, doubled on each retry.
+    :param max_delay: Upper bound on a single backoff delay.
+    :param estimate_tokens: Optional function job -> estimated tokens, used with tokens_per_minute.
+    :return: Dict of key -> response, or the final exception for jobs that failed.
+    """
+    limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = [
+        _run_job(key, job, send, limiter, semaphore, timeout, max_retries, base_delay, max_delay, estimate_tokens)
+        for key, job in jobs.items()
+    ]
+    results = {}
+    for finished in asyncio.as_completed(tasks):
+        key, result = await finished
+        results[key] = result
+    # Keep the caller's job order
+    return {key: results[key] for key in jobs}
@@ -2,16 +2,23 @@ import cv2
 import mediapipe as mp
 import math
 import json
+import hashlib
+import pickle
 import numpy as np
 import pandas as pd
 import os
 import torch
+import sklearn
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from collections import defaultdict
+from collections import Counter, defaultdict
 from pathlib import Path
 import sys
-import subprocess  # Added to call detect_revise.py
+YOLOV7_ROOT = os.path.abspath('./yolov7')  # Adjust this path to your YOLOv7 directory
+sys.path.append(YOLOV7_ROOT)
+from yolov7.models.experimental import attempt_load
+from yolov7.utils.datasets import letterbox
+from yolov7.utils.general import check_img_size, non_max_suppression, scale_coords
+from yolov7.utils.torch_utils import select_device
 
 # Initialize Mediapipe Pose
 mp_pose = mp.solutions.pose
@@ -27,51 +34,70 @@ def load_yolov7_model(weights_path, img_size=640):
         model.half()  # Convert model to half precision if using GPU
     return model, device, stride, img_size
 
-# Perform equipment detection by calling detect_revise.py
-def detect_equipment_via_script(detect_script_path, weights_path, video_path, conf_threshold=0.25, img_size=640):
-    """
-    Calls the detect_revise.py script as a subprocess and captures the detected equipment string.
-    """
-    cmd = [
-        'python',
-        detect_script_path,
-        '--weights', weights_path,
-        '--source', video_path,
-        '--conf-thres', str(conf_threshold),
-        '--img-size', str(img_size),
-        '--nosave'  # Add any other flags as needed
-    ]
-    
-    try:
-        # Run the detect_revise.py script and capture the output
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
-        stdout = result.stdout
-        stderr = result.stderr
-        
-        if stderr:
-            print(f"Error during equipment detection for {video_path}:\n{stderr}")
-        
-        # Parse the equipment string from stdout
-        # Assuming the script prints "=== Final Detected Equipment ===" followed by the equipment string
-        equipment_str = "none"
-        lines = stdout.split('\n')
-        for i, line in enumerate(lines):
-            if "=== Final Detected Equipment ===" in line:
-                if i + 1 < len(lines):
-                    equipment_dict_str = lines[i + 1].strip()
-                    try:
-                        equipment_dict = eval(equipment_dict_str)  # Convert string dict to actual dict
-                        if equipment_dict:
-                            equipment_str = max(equipment_dict, key=equipment_dict.get)
-                        else:
-                            equipment_str = "none"
-                    except:
-                        equipment_str = "none"
+# In-process equipment detection; the YOLOv7 model stays loaded across videos
+class EquipmentDetectionService:
+    def __init__(self, weights_path, conf_threshold=0.25, iou_threshold=0.45, img_size=640):
+        """
+        Load YOLOv7 once for all videos processed by this service.
+
+        :param weights_path: Path to the YOLOv7 weights file.
+        :param conf_threshold: Confidence threshold for detections.
+        :param iou_threshold: IOU threshold for NMS.
+        :param img_size: Inference size (pixels).
+        """
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+        self.model, self.device, self.stride, self.img_size = load_yolov7_model(weights_path, img_size)
+        self.names = self.model.module.names if hasattr(self.model, 'module') else self.model.names
+
+    def detect_frame(self, frame):
+        """
+        Detect equipment in one BGR frame, preprocessed the same way as YOLOv7's detect.py.
+
+        :return: List of {'label', 'confidence', 'bbox'} dicts in frame coordinates.
+        """
+        img = letterbox(frame, self.img_size, stride=self.stride)[0]
+        img = np.ascontiguousarray(img[:, :, ::-1].transpose(2, 0, 1))  # BGR to RGB, HWC to CHW
+        img = torch.from_numpy(img).to(self.device)
+        img = img.half() if self.device.type != 'cpu' else img.float()
+        img = (img / 255.0).unsqueeze(0)
+
+        with torch.no_grad():
+            pred = self.model(img)[0]
+        det = non_max_suppression(pred, self.conf_threshold, self.iou_threshold)[0]
+
+        detections = []
+        if len(det):
+            det[:, :4] = scale_coords(img.shape[2:], det[:, :4], frame.shape).round()
+            for *xyxy, conf, cls in det.tolist():
+                detections.append({
+                    'label': self.names[int(cls)],
+                    'confidence': conf,
+                    'bbox': tuple(xyxy)
+                })
+        return detections
+
+    def detect_video(self, video_path):
+        """
+        Detect equipment on every frame of a video.
+
+        :return: Dict with 'frames' (per-frame detection lists), 'counts' (detections per
+                 label over the video) and 'equipment' (most detected label, or "none").
+        """
+        cap = cv2.VideoCapture(video_path)
+        frames = []
+        counts = Counter()
+        while cap.isOpened():
+            ret, frame = cap.read()
+            if not ret:
                 break
-        return equipment_str
-    except subprocess.CalledProcessError as e:
-        print(f"Failed to run detect_revise.py for {video_path}. Error: {e}")
-        return "none"
+            detections = self.detect_frame(frame)
+            frames.append(detections)
+            counts.update(det['label'] for det in detections)
+        cap.release()
+
+        equipment = max(counts, key=counts.get) if counts else "none"
+        return {'frames': frames, 'counts': dict(counts), 'equipment': equipment}
 
 # Build exercise rules with equipment and detailed features
 def build_exercise_rules_json():
@@ -315,16 +341,90 @@ def generate_joint_features(joint_positions, equipment):
 
     return features
 
+# Joint order of the stacked (frames, joints, 2) arrays used by the batch feature path
+FEATURE_JOINTS = ['left_shoulder', 'right_shoulder', 'left_elbow', 'right_elbow', 'left_wrist', 'right_wrist',
+                  'left_hip', 'right_hip', 'left_knee', 'right_knee', 'left_ankle', 'right_ankle',
+                  'left_foot', 'right_foot', 'back']
+JOINT_INDEX = {name: i for i, name in enumerate(FEATURE_JOINTS)}
+
+# Category labels per feature, indexed by the codes generate_joint_features_batch returns
+FEATURE_LABELS = {
+    "posture": ["standing", "upright", "seated", "bent"],
+    "arm": ["extended", "bent", "half_bent"],
+    "leg": ["extended", "staggered", "calf_raise"],
+    "elbow_angle": ["extended", "bent", "half_bent"],
+    "knee_angle": ["straight", "bent", "half_bent"]
+}
+
+# Stack per-frame joint dicts into one (frames, joints, 2) array
+def stack_joint_positions(joint_positions_over_time):
+    return np.array([[jp[name] for name in FEATURE_JOINTS] for jp in joint_positions_over_time],
+                    dtype=np.float64).reshape(-1, len(FEATURE_JOINTS), 2)
+
+# Vectorized calculate_angle from generate_joint_features, over (frames, 2) arrays
+def calculate_angle_batch(a, b, c):
+    radians = np.arctan2(c[:, 1]-b[:, 1], c[:, 0]-b[:, 0]) - np.arctan2(a[:, 1]-b[:, 1], a[:, 0]-b[:, 0])
+    angle = np.abs(radians*180.0/np.pi)
+    return np.where(angle > 180.0, 360 - angle, angle)
+
+# Array version of generate_joint_features for all frames at once
+def generate_joint_features_batch(joints):
+    """
+    Compute the posture/arm/leg/elbow/knee categories of every frame.
+
+    :param joints: (frames, joints, 2) array from stack_joint_positions.
+    :return: Dict of feature name -> int code array indexing FEATURE_LABELS[feature].
+    """
+    def joint(name):
+        return joints[:, JOINT_INDEX[name]]
+
+    # Posture
+    avg_shoulder_y = (joint('left_shoulder')[:, 1] + joint('right_shoulder')[:, 1]) / 2
+    avg_hip_y = (joint('left_hip')[:, 1] + joint('right_hip')[:, 1]) / 2
+    back_y = joint('back')[:, 1]
+    min_knee_y = np.minimum(joint('left_knee')[:, 1], joint('right_knee')[:, 1])
+    standing = np.abs(avg_shoulder_y - avg_hip_y) < 0.05
+    upright = np.abs(avg_shoulder_y - back_y) < 0.04
+    seated = (np.abs(avg_shoulder_y - back_y) >= 0.04) & (np.abs(avg_shoulder_y - avg_hip_y) >= 0.05) & (avg_hip_y > min_knee_y)
+    posture = np.select([standing, upright, seated], [0, 1, 2], default=3)
+
+    # Legs: staggered survives the extension check, everything else becomes extended or calf_raise
+    staggered = ~(((joint('left_knee')[:, 1] + joint('right_knee')[:, 1]) / 2) < avg_hip_y) & (
+        np.abs(joint('left_knee')[:, 0] - joint('right_knee')[:, 0]) > 0.1)
+    extended = (joint('left_foot')[:, 1] > joint('left_knee')[:, 1]) | (joint('right_foot')[:, 1] > joint('right_knee')[:, 1])
+    leg = np.select([extended, staggered], [0, 1], default=2)
+
+    # Elbow and knee angles; the elbow category also decides the arm feature
+    avg_elbow_angle = (calculate_angle_batch(joint('left_shoulder'), joint('left_elbow'), joint('left_wrist')) +
+                       calculate_angle_batch(joint('right_shoulder'), joint('right_elbow'), joint('right_wrist'))) / 2
+    avg_knee_angle = (calculate_angle_batch(joint('left_hip'), joint('left_knee'), joint('left_ankle')) +
+                      calculate_angle_batch(joint('right_hip'), joint('right_knee'), joint('right_ankle'))) / 2
+    elbow_angle = np.select([avg_elbow_angle > 160, avg_elbow_angle < 90], [0, 1], default=2)
+    knee_angle = np.select([avg_knee_angle > 160, avg_knee_angle < 90], [0, 1], default=2)
+
+    return {
+        "posture": posture,
+        "arm": elbow_angle,
+        "leg": leg,
+        "elbow_angle": elbow_angle,
+        "knee_angle": knee_angle
+    }
+
+# Most frequent label of a code array; ties go to the label seen first, like Counter.most_common
+def most_frequent_label(codes, labels):
+    if not len(codes):
+        return ""
+    counts = np.bincount(codes, minlength=len(labels))
+    tied = np.flatnonzero(counts == counts.max())
+    if len(tied) > 1:
+        first_seen = [np.argmax(codes == code) for code in tied]
+        return labels[tied[np.argmin(first_seen)]]
+    return labels[tied[0]]
+
 # Process exercise and calculate similarity
-def process_exercise(video_path, exercise_rules, vectorizer, exercise_names, detect_script_path, yolov7_weights_path, conf_threshold=0.25, img_size=640):
-    # Detect equipment by calling detect_revise.py
-    detected_equipment = detect_equipment_via_script(
-        detect_script_path=detect_script_path,
-        weights_path=yolov7_weights_path,
-        video_path=video_path,
-        conf_threshold=conf_threshold,
-        img_size=img_size
-    )
+def process_exercise(video_path, exercise_matcher, equipment_service):
+    # Detect equipment with the resident YOLOv7 model
+    detected_equipment = equipment_service.detect_video(video_path)['equipment']
     
     # Get joint positions
     joint_positions_over_time = get_joint_positions_from_video(video_path, pose)
@@ -333,60 +433,80 @@ def process_exercise(video_path, exercise_rules, vectorizer, exercise_names, det
         print(f"No joint positions detected in {video_path}.")
         return [("none", 0.0)] * 3  # Return dummy values
     
-    # Generate joint features with equipment
-    video_features_over_time = [generate_joint_features(jp, detected_equipment) for jp in joint_positions_over_time]
-    
-    # Generate aggregated features
-    video_features = {
-        "posture": [],
-        "arm": [],
-        "leg": [],
-        "equipment": [],
-        "elbow_angle": [],
-        "knee_angle": []
-    }
-    for features in video_features_over_time:
-        video_features["posture"].append(features["posture"])
-        video_features["arm"].append(features["arm"])
-        video_features["leg"].append(features["leg"])
-        video_features["equipment"].append(features["equipment"])
-        video_features["elbow_angle"].append(features["elbow_angle"])
-        video_features["knee_angle"].append(features["knee_angle"])
-    
-    # Select the most frequent feature
-    aggregated_features = {
-        "posture": max(set(video_features["posture"]), key=video_features["posture"].count) if video_features["posture"] else "",
-        "arm": max(set(video_features["arm"]), key=video_features["arm"].count) if video_features["arm"] else "",
-        "leg": max(set(video_features["leg"]), key=video_features["leg"].count) if video_features["leg"] else "",
-        "equipment": max(set(video_features["equipment"]), key=video_features["equipment"].count) if video_features["equipment"] else "none",
-        "elbow_angle": max(set(video_features["elbow_angle"]), key=video_features["elbow_angle"].count) if video_features["elbow_angle"] else "",
-        "knee_angle": max(set(video_features["knee_angle"]), key=video_features["knee_angle"].count) if video_features["knee_angle"] else ""
-    }
-    
-    # Convert features to string, including equipment and angles
-    video_text = f'posture:{aggregated_features["posture"]} arm:{aggregated_features["arm"]} leg:{aggregated_features["leg"]} equipment:{aggregated_features["equipment"]} elbow_angle:{aggregated_features["elbow_angle"]} knee_angle:{aggregated_features["knee_angle"]}'
-    
-    # Build exercise rules as strings, including equipment and angles
-    exercise_texts = []
-    for exercise, features in exercise_rules.items():
-        text = f'posture:{features["posture"]} arm:{features["arm"]} leg:{features["leg"]} equipment:{features["equipment"]} elbow_angle:{features["elbow_angle"]} knee_angle:{features["knee_angle"]}'
-        exercise_texts.append(text)
+    # Generate joint features for all frames at once and keep the most frequent category of each
+    feature_codes = generate_joint_features_batch(stack_joint_positions(joint_positions_over_time))
+    aggregated_features = {name: most_frequent_label(codes, FEATURE_LABELS[name])
+                           for name, codes in feature_codes.items()}
+    aggregated_features["equipment"] = detected_equipment
     
-    # Vectorize
-    corpus = exercise_texts + [video_text]
-    tfidf_matrix = vectorizer.fit_transform(corpus)
-    exercise_vectors = tfidf_matrix[:-1]
-    video_vector = tfidf_matrix[-1]
-    
-    # Calculate cosine similarity
-    similarities = cosine_similarity(video_vector, exercise_vectors)[0]
-    
-    # Get top 3 exercises
-    top_indices = similarities.argsort()[-3:][::-1]
-    top_three = [(exercise_names[i], similarities[i]*100) for i in top_indices]
+    # Only the video's features are transformed; the reference matrix is prebuilt
+    top_three = exercise_matcher.top_k(aggregated_features, k=3)
     
     return top_three
 
+# Feature dict -> the text that gets TF-IDF vectorized
+def features_to_text(features):
+    return f'posture:{features["posture"]} arm:{features["arm"]} leg:{features["leg"]} equipment:{features["equipment"]} elbow_angle:{features["elbow_angle"]} knee_angle:{features["knee_angle"]}'
+
+# Fitted TF-IDF index, kept next to this script rather than in whatever folder it is run from
+EXERCISE_TFIDF_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "exercise_tfidf.pkl")
+
+# TF-IDF index over the exercise rules, fitted once and persisted between runs
+class ExerciseMatcher:
+    def __init__(self, exercise_rules, cache_path=EXERCISE_TFIDF_CACHE):
+        """
+        Build or load the reference TF-IDF matrix.
+
+        :param exercise_rules: Dict of exercise name -> feature dict.
+        :param cache_path: Pickle holding the fitted vectorizer and reference matrix, or None to skip persisting.
+            It is only reused for the same rules and scikit-learn version, and refitted if it cannot be read.
+        """
+        self.exercise_names = list(exercise_rules.keys())
+        exercise_texts = [features_to_text(features) for features in exercise_rules.values()]
+        rules_hash = hashlib.sha1("\n".join(self.exercise_names + exercise_texts).encode('utf-8')).hexdigest()
+        # A pickled vectorizer is only safe to load with the scikit-learn that wrote it
+        cache_key = {'rules_hash': rules_hash, 'sklearn_version': sklearn.__version__}
+
+        cached = None
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'rb') as f:
+                    cached = pickle.load(f)
+            except Exception as e:
+                print(f"Refitting the exercise TF-IDF index, could not load {cache_path}: {e}")
+        if isinstance(cached, dict) and cached.get('key') == cache_key:
+            self.vectorizer = cached['vectorizer']
+            self.reference_matrix = cached['reference_matrix']
+        else:
+            self.vectorizer = TfidfVectorizer()
+            self.reference_matrix = self.vectorizer.fit_transform(exercise_texts)
+            if cache_path:
+                # Write beside the cache and swap it in so an interrupted save leaves no truncated pickle
+                partial_path = cache_path + ".part"
+                with open(partial_path, 'wb') as f:
+                    pickle.dump({
+                        'key': cache_key,
+                        'vectorizer': self.vectorizer,
+                        'reference_matrix': self.reference_matrix
+                    }, f)
+                os.replace(partial_path, cache_path)
+
+    def top_k(self, features, k=3):
+        """
+        Rank exercises by cosine similarity to a video's aggregated features.
+
+        :return: List of (exercise name, similarity in percent), best first.
+        """
+        video_vector = self.vectorizer.transform([features_to_text(features)])
+        # TF-IDF rows are L2-normalized, so the dot product is the cosine similarity
+        similarities = (self.reference_matrix @ video_vector.T).toarray().ravel()
+
+        k = min(k, len(similarities))
+        top_indices = np.argpartition(-similarities, k - 1)[:k]
+        # Best first; among equal scores the later exercise first, as argsort()[::-1] did
+        top_indices = top_indices[np.lexsort((-top_indices, -similarities[top_indices]))]
+        return [(self.exercise_names[i], similarities[i]*100) for i in top_indices]
+
 # Collect video files, focusing only on specified exercises
 def collect_video_files(root_dir, allowed_exercises):
     video_files = []
@@ -424,20 +544,18 @@ def main():
     
     results = []
     
-    # Initialize vectorizer
-    vectorizer = TfidfVectorizer()
+    # Fit (or load) the exercise TF-IDF index once
+    exercise_matcher = ExerciseMatcher(exercise_rules)
+    
+    # Load YOLOv7 once for every video
+    equipment_service = EquipmentDetectionService(yolov7_weights_path, conf_threshold=0.25, img_size=640)
     
     for video_path, actual_exercise in zip(video_files, actual_exercises):
         print(f"Processing video: {video_path}")
         top_three = process_exercise(
             video_path=video_path,
-            exercise_rules=exercise_rules,
-            vectorizer=vectorizer,
-            exercise_names=exercise_names,
-            detect_script_path=detect_script_path,
-            yolov7_weights_path=yolov7_weights_path,
-            conf_threshold=0.25,
-            img_size=640
+            exercise_matcher=exercise_matcher,
+            equipment_service=equipment_service
         )
         is_correct = actual_exercise in [ex for ex, _ in top_three]
         results.append({
@@ -3,21 +3,22 @@ import os
 import sys
 import shutil
 
-def render_blend_file(blend_file_path, output_file_path):
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from render_manifest import RenderManifest
+from render_profiles import DEFAULT_PROFILE, apply_render_profile, get_render_profile
+
+def render_blend_file(blend_file_path, output_file_path, settings):
     # Open the blend file
     bpy.ops.wm.open_mainfile(filepath=blend_file_path)
     
     # Set the render output settings
     scene = bpy.context.scene
-    scene.render.image_settings.file_format = 'FFMPEG'
-    scene.render.ffmpeg.format = 'MPEG4'
-    scene.render.ffmpeg.codec = 'H264'
-    scene.render.filepath = output_file_path
+    apply_render_profile(scene, settings, output_file_path)
 
     # Render the animation
     bpy.ops.render.render(animation=True)
 
-def main():
+def main(profile=DEFAULT_PROFILE):
     # Directories
     input_dir = "./blender_source"
     output_dir = "./blender_mp4"
@@ -28,6 +29,8 @@ def main():
     # Absolute paths
     input_dir = os.path.abspath(input_dir)
     output_dir = os.path.abspath(output_dir)
+    manifest = RenderManifest(output_dir)
+    settings = get_render_profile(profile)
     count = 0
     # Iterate over all .blend files in input_dir
     for filename in os.listdir(input_dir):
@@ -35,12 +38,15 @@ def main():
             blend_file = os.path.join(input_dir, filename)
             base_name = os.path.splitext(filename)[0]
             output_file = os.path.join(output_dir, base_name + ".mp4")
-            if (base_name+".mp4")in os.listdir(output_dir):
+            # Re-render only when the .blend or the settings changed since the last render
+            source = manifest.source_info(blend_file, base_name + ".mp4")
+            if manifest.is_up_to_date(base_name + ".mp4", source, settings):
                 count+=1
                 print(f"{count} already done {base_name}")
             else:
                 print(f"Rendering {blend_file} to {output_file}")
-                render_blend_file(blend_file, output_file)
+                render_blend_file(blend_file, output_file, settings)
+                manifest.record(base_name + ".mp4", source, settings)
 def cherryPick():
     input_dir = "./blender_mp4"
     final_dir = "./blender_pics_final"
@@ -0,0 +1,311 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Blender does not put the script's folder on sys.path for workers
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from render_manifest import RenderManifest
+from render_profiles import DEFAULT_PROFILE, RENDER_PROFILES, apply_render_profile, get_render_profile
+
+# Run as a plain Python script to drive the farm; each worker re-runs this file inside
+# `blender -b <file>.blend -P render_farm.py -- --worker ...` to render one shard.
+
+# Worker stdout lines starting with this carry progress back to the driver
+PROGRESS_PREFIX = "RENDER_FARM"
+
+def shard_frame_range(frame_start, frame_end, shard, shards):
+    """
+    Contiguous frame range of one shard of an animation.
+
+    :param frame_start: First frame of the scene.
+    :param frame_end: Last frame of the scene (inclusive).
+    :param shard: Index of the shard, 0-based.
+    :param shards: Number of shards the animation is split into.
+    :return: (start, end) inclusive; start > end when the shard has no frames.
+    """
+    total = frame_end - frame_start + 1
+    start = frame_start + total * shard // shards
+    end = frame_start + total * (shard + 1) // shards - 1
+    return start, end
+
+def render_shard(output_path, shard, shards, settings):
+    """
+    Worker side: render one frame range of the open .blend file.
+
+    :param output_path: MP4 segment to write.
+    :param shard: Index of the shard, 0-based.
+    :param shards: Number of shards the animation is split into.
+    :param settings: get_render_profile() output.
+    """
+    import bpy
+
+    scene = bpy.context.scene
+    start, end = shard_frame_range(scene.frame_start, scene.frame_end, shard, shards)
+    print(f"{PROGRESS_PREFIX} range {start} {end}", flush=True)
+    if start > end:
+        return
+
+    apply_render_profile(scene, settings, output_path)
+    scene.frame_start = start
+    scene.frame_end = end
+
+    def report_frame(scene, *args):
+        print(f"{PROGRESS_PREFIX} frame {scene.frame_current}", flush=True)
+
+    bpy.app.handlers.render_write.append(report_frame)
+    bpy.ops.render.render(animation=True)
+
+class RenderJob:
+    """Progress and outcome of rendering one .blend file, possibly as several shards."""
+
+    def __init__(self, blend_path, output_path, shards, work_dir, source=None):
+        self.blend_path = blend_path
+        self.output_path = output_path
+        self.source = source
+        self.name = os.path.splitext(os.path.basename(blend_path))[0]
+        self.work_dir = work_dir
+        self.shards = shards
+        self.segment_paths = [os.path.join(work_dir, f"segment_{shard:03d}.mp4") for shard in range(shards)]
+        self.frame_counts = [None] * shards
+        self.frames_done = [0] * shards
+        self.pending = shards
+        self.errors = []
+        self.started = None
+        self.seconds = None
+        self._last_reported = -1
+
+    def frames_total(self):
+        """Total frames, or None until every shard has reported its range."""
+        return None if None in self.frame_counts else sum(self.frame_counts)
+
+    def progress_line(self):
+        """Progress message when another 10% is done, else None."""
+        total = self.frames_total()
+        done = sum(self.frames_done)
+        if not total:
+            return None
+        step = done * 10 // total
+        if step == self._last_reported:
+            return None
+        self._last_reported = step
+        return f"{self.name}: {done}/{total} frames ({done * 100 // total}%)"
+
+    def status(self):
+        if self.errors:
+            return 'failed'
+        return 'pending' if self.pending else 'done'
+
+def _worker_command(job, shard, blender, threads, profile):
+    # --python-exit-code makes a failing worker script fail the process instead of exiting 0
+    return [blender, '-b', job.blend_path, '-t', str(threads), '--python-exit-code', '1',
+            '-P', os.path.abspath(__file__), '--',
+            '--worker', job.segment_paths[shard], '--shard', str(shard), '--shards', str(job.shards),
+            '--profile', profile]
+
+def _run_shard(job, shard, blender, threads, profile, lock):
+    """Run one Blender worker, streaming its progress into job. Returns an error message or None."""
+    log_path = os.path.splitext(job.segment_paths[shard])[0] + ".log"
+    with lock:
+        if job.started is None:
+            job.started = time.time()
+    try:
+        process = subprocess.Popen(_worker_command(job, shard, blender, threads, profile),
+                                   stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, errors='replace')
+    except OSError as e:
+        return f"could not start {blender}: {e}"
+
+    with open(log_path, 'w', encoding='utf-8') as log:
+        for line in process.stdout:
+            log.write(line)
+            if not line.startswith(PROGRESS_PREFIX):
+                continue
+            fields = line.split()
+            with lock:
+                if fields[1] == 'range':
+                    start, end = int(fields[2]), int(fields[3])
+                    job.frame_counts[shard] = max(0, end - start + 1)
+                elif fields[1] == 'frame':
+                    job.frames_done[shard] += 1
+                message = job.progress_line()
+            if message:
+                print(message, flush=True)
+    process.wait()
+
+    if process.returncode != 0:
+        return f"shard {shard} exited with code {process.returncode}, see {log_path}"
+    if job.frame_counts[shard] is None:
+        return f"shard {shard} never reported its frame range, see {log_path}"
+    if job.frame_counts[shard] and not os.path.exists(job.segment_paths[shard]):
+        return f"shard {shard} wrote no output, see {log_path}"
+    return None
+
+def concat_segments(segment_paths, output_path, ffmpeg="ffmpeg"):
+    """
+    Join MP4 segments rendered with identical settings without re-encoding.
+
+    The result is written next to output_path first and moved into place, so a
+    partial file is never mistaken for a finished render.
+    """
+    partial_path = output_path + ".part"
+    if len(segment_paths) == 1:
+        shutil.copyfile(segment_paths[0], partial_path)
+    else:
+        list_path = output_path + ".concat.txt"
+        with open(list_path, 'w', encoding='utf-8') as f:
+            for path in segment_paths:
+                # The concat demuxer quotes paths like a shell: ' becomes '\''
+                escaped = os.path.abspath(path).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        try:
+            subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0', '-i', list_path,
+                            '-c', 'copy', '-f', 'mp4', partial_path], check=True)
+        finally:
+            os.remove(list_path)
+    os.replace(partial_path, output_path)
+
+def _finish_job(job, ffmpeg):
+    segments = [path for path, count in zip(job.segment_paths, job.frame_counts) if count]
+    if not segments:
+        job.errors.append("scene has no frames to render")
+        return
+    try:
+        concat_segments(segments, job.output_path, ffmpeg)
+    except (OSError, subprocess.CalledProcessError) as e:
+        job.errors.append(f"concatenating segments failed: {e}")
+        return
+    shutil.rmtree(job.work_dir, ignore_errors=True)
+
+def render_library(blend_files, output_dir, workers=None, shards=1, blender="blender", ffmpeg="ffmpeg",
+                   force=False, profile=DEFAULT_PROFILE):
+    """
+    Render .blend files to MP4 with parallel headless Blender workers.
+
+    :param blend_files: Paths of the .blend files to render.
+    :param output_dir: Directory for <name>.mp4 outputs.
+    :param workers: Concurrent Blender processes, default one per CPU core.
+    :param shards: Frame-range segments per file; more than 1 lets a few long
+                   animations use every worker.
+    :param blender: Blender executable.
+    :param ffmpeg: ffmpeg executable used to join segments.
+    :param force: Re-render files the render manifest lists as up to date.
+    :param profile: Render profile name, see render_profiles.RENDER_PROFILES.
+    :return: List of RenderJob, one per file that was rendered.
+    """
+    workers = workers or os.cpu_count() or 1
+    # Split the cores between workers so they don't oversubscribe the machine
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    os.makedirs(output_dir, exist_ok=True)
+    work_root = os.path.join(output_dir, ".render_farm")
+    manifest = RenderManifest(output_dir)
+    settings = get_render_profile(profile)
+
+    jobs = []
+    for blend_path in blend_files:
+        name = os.path.splitext(os.path.basename(blend_path))[0]
+        source = manifest.source_info(blend_path, name + ".mp4")
+        if not force and manifest.is_up_to_date(name + ".mp4", source, settings):
+            print(f"Up to date {name}")
+            continue
+        work_dir = os.path.join(work_root, name)
+        os.makedirs(work_dir, exist_ok=True)
+        jobs.append(RenderJob(os.path.abspath(blend_path), os.path.join(output_dir, name + ".mp4"), shards,
+                              work_dir, source))
+
+    lock = threading.Lock()
+    finished = 0
+    # File-major order so each file's shards finish close together and its segments are joined early
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for job in jobs:
+            for shard in range(shards):
+                futures[pool.submit(_run_shard, job, shard, blender, threads, profile, lock)] = (job, shard)
+
+        for future in as_completed(futures):
+            job, shard = futures[future]
+            error = future.result()
+            if error:
+                job.errors.append(error)
+            job.pending -= 1
+            if job.pending:
+                continue
+            if not job.errors:
+                _finish_job(job, ffmpeg)
+            if not job.errors:
+                manifest.record(os.path.basename(job.output_path), job.source, settings)
+            job.seconds = time.time() - job.started
+            finished += 1
+            if job.errors:
+                print(f"[{finished}/{len(jobs)}] FAILED {job.name}: {'; '.join(job.errors)}", flush=True)
+            else:
+                print(f"[{finished}/{len(jobs)}] Rendered {job.name} ({job.frames_total()} frames, "
+                      f"{job.seconds:.1f}s)", flush=True)
+
+    if os.path.isdir(work_root) and not os.listdir(work_root):
+        os.rmdir(work_root)
+    return jobs
+
+def write_report(jobs, report_path):
+    """Save per-file status, frame counts, timings and errors as JSON."""
+    report = {job.name: {
+        'blend_file': job.blend_path,
+        'output': job.output_path,
+        'status': job.status(),
+        'frames': job.frames_total(),
+        'seconds': job.seconds,
+        'errors': job.errors
+    } for job in jobs}
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Render a folder of .blend files with parallel headless Blender workers")
+    parser.add_argument('source_folder', nargs='?', default="./blender_source")
+    parser.add_argument('output_folder', nargs='?', default="./blender_mp4")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Concurrent Blender processes (default: one per CPU core; "
+                             "use fewer when EEVEE shares one GPU)")
+    parser.add_argument('--shards', type=int, default=1,
+                        help="Split each animation into this many frame ranges rendered in parallel")
+    parser.add_argument('--blender', default=os.environ.get('BLENDER', 'blender'),
+                        help="Blender executable (default: $BLENDER or 'blender')")
+    parser.add_argument('--ffmpeg', default='ffmpeg', help="ffmpeg executable used to join segments")
+    parser.add_argument('--force', action='store_true',
+                        help="Re-render files whose .blend and settings are unchanged since the last render")
+    parser.add_argument('--profile', choices=sorted(RENDER_PROFILES), default=DEFAULT_PROFILE,
+                        help="Render profile: 'analysis' (720p, fast) for the rule-extraction videos, "
+                             "'presentation' (1080p) for viewing")
+    args = parser.parse_args(argv)
+
+    blend_files = sorted(os.path.join(args.source_folder, f) for f in os.listdir(args.source_folder)
+                         if f.endswith('.blend'))
+    jobs = render_library(blend_files, args.output_folder, args.workers, max(1, args.shards),
+                          args.blender, args.ffmpeg, args.force, args.profile)
+    write_report(jobs, os.path.join(args.output_folder, "render_farm_report.json"))
+
+    failed = [job for job in jobs if job.errors]
+    print(f"Rendered {len(jobs) - len(failed)}/{len(jobs)} files, "
+          f"{len(blend_files) - len(jobs)} already up to date")
+    return 1 if failed else 0
+
+def worker_main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--worker', required=True, help="Segment output path")
+    parser.add_argument('--shard', type=int, default=0)
+    parser.add_argument('--shards', type=int, default=1)
+    parser.add_argument('--profile', default=DEFAULT_PROFILE)
+    args = parser.parse_args(argv)
+    render_shard(os.path.abspath(args.worker), args.shard, args.shards, get_render_profile(args.profile))
+
+if __name__ == "__main__":
+    # Inside Blender, script arguments follow "--"
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    if '--worker' in argv:
+        worker_main(argv)
+    else:
+        sys.exit(main(argv))
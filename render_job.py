@@ -0,0 +1,244 @@
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+# Blender does not put the script's folder on sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from render_manifest import RenderManifest
+from render_profiles import DEFAULT_PROFILE, RENDER_PROFILES, apply_render_profile, get_render_profile
+
+# Run inside Blender:
+#   blender -b -P render_job.py -- <source_folder> [--outputs mp4,stills,sheet] [--keyframes 3]
+# Each .blend is opened once. Its frames are rendered to PNG once and reused for the
+# keyframe stills, the contact sheet and the MP4.
+
+OUTPUTS = ('mp4', 'stills', 'sheet')
+
+# Blender's constant_rate_factor / ffmpeg_preset names and the x264 values they stand for
+X264_CRF = {'LOSSLESS': 0, 'PERC_LOSSLESS': 17, 'HIGH': 20, 'MEDIUM': 23, 'LOW': 26, 'VERYLOW': 29, 'LOWEST': 32}
+X264_PRESET = {'BEST': 'slower', 'GOOD': 'medium', 'REALTIME': 'superfast'}
+
+FRAME_PATTERN = "frame_####"
+
+def keyframe_positions(count, first=0.1, last=0.9):
+    """
+    Evenly spaced keyframe positions as fractions of the animation.
+
+    :param count: Number of keyframes; 3 gives the 10/50/90% layout.
+    :param first: Position of the first keyframe.
+    :param last: Position of the last keyframe.
+    :return: List of fractions in [0, 1].
+    """
+    if count < 1:
+        raise ValueError(f"Need at least one keyframe, got {count}")
+    if count == 1:
+        return [(first + last) / 2]
+    return [round(first + (last - first) * i / (count - 1), 6) for i in range(count)]
+
+def check_keyframe_positions(positions):
+    """Raise ValueError unless positions is a non-empty list of fractions in [0, 1]."""
+    if not positions:
+        raise ValueError("Need at least one keyframe position")
+    outside = [p for p in positions if not 0 <= p <= 1]
+    if outside:
+        raise ValueError(f"Keyframe positions must be fractions in [0, 1], got {outside}")
+    return positions
+
+def parse_keyframes(spec):
+    """Parse --keyframes: a count ("3") or explicit fractions ("0.1,0.5,0.9")."""
+    try:
+        if ',' not in spec and '.' not in spec:
+            return keyframe_positions(int(spec))
+        return check_keyframe_positions([float(p) for p in spec.split(',')])
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f"expected a keyframe count >= 1 or fractions in [0, 1] ({e})")
+
+def keyframe_numbers(frame_start, frame_end, positions):
+    """Frame numbers at the given fractions of [frame_start, frame_end], in order, without duplicates."""
+    frames = [frame_start + int((frame_end - frame_start) * p) for p in positions]
+    return sorted(set(min(max(f, frame_start), frame_end) for f in frames))
+
+def frame_path(frame_dir, frame):
+    return os.path.join(frame_dir, f"frame_{frame:04d}.png")
+
+def render_frames(scene, frame_dir, frames=None):
+    """
+    Render PNG frames into frame_dir as frame_NNNN.png.
+
+    :param scene: Scene with apply_render_profile(..., movie=False) applied.
+    :param frame_dir: Output folder.
+    :param frames: Frame numbers to render, or None for the whole animation.
+    """
+    import bpy
+
+    scene.render.filepath = os.path.join(frame_dir, FRAME_PATTERN)
+    if frames is None:
+        bpy.ops.render.render(animation=True)
+        return
+    for frame in frames:
+        scene.frame_set(frame)
+        bpy.ops.render.render(write_still=True)
+
+def encode_mp4(frame_dir, frame_start, output_path, settings, ffmpeg="ffmpeg"):
+    """Encode a rendered PNG sequence to H264 MP4 the way Blender's FFMPEG output would."""
+    if settings['codec'] != 'H264':
+        raise ValueError(f"render_job only encodes H264, got {settings['codec']}")
+    partial_path = output_path + ".part"
+    subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-framerate', str(settings['fps']),
+                    '-start_number', str(frame_start), '-i', os.path.join(frame_dir, "frame_%04d.png"),
+                    '-c:v', 'libx264', '-crf', str(X264_CRF[settings['constant_rate_factor']]),
+                    '-preset', X264_PRESET[settings['ffmpeg_preset']], '-pix_fmt', 'yuv420p',
+                    '-f', 'mp4', partial_path], check=True)
+    os.replace(partial_path, output_path)
+
+def contact_sheet(image_paths, output_path):
+    """Paste images side by side into one PNG."""
+    from PIL import Image
+
+    images = [Image.open(path) for path in image_paths]
+    widths, heights = zip(*(i.size for i in images))
+
+    new_image = Image.new('RGB', (sum(widths), max(heights)))
+    x_offset = 0
+    for img in images:
+        new_image.paste(img, (x_offset, 0))
+        x_offset += img.width
+    new_image.save(output_path)
+
+class SinglePassRenderer:
+    """Render any of MP4, keyframe stills and contact sheet for .blend files, opening each file once."""
+
+    def __init__(self, outputs=OUTPUTS, positions=None, mp4_dir="./blender_mp4", stills_dir="./blender_pics",
+                 sheet_dir="./blender_pics_final", ffmpeg="ffmpeg", force=False, profile=DEFAULT_PROFILE):
+        """
+        :param outputs: Any of 'mp4', 'stills' and 'sheet'.
+        :param positions: Keyframe positions as fractions of the animation, default 10/50/90%.
+        :param mp4_dir: Folder for <name>.mp4.
+        :param stills_dir: Folder for <name>_<frame>.png keyframe stills.
+        :param sheet_dir: Folder for <name>.png contact sheets.
+        :param ffmpeg: ffmpeg executable used to encode the MP4.
+        :param force: Render outputs the render manifests list as up to date.
+        :param profile: Render profile name, see render_profiles.RENDER_PROFILES.
+        """
+        unknown = set(outputs) - set(OUTPUTS)
+        if unknown:
+            raise ValueError(f"Unknown outputs {sorted(unknown)}, expected some of {OUTPUTS}")
+        self.outputs = outputs
+        self.positions = check_keyframe_positions(list(positions if positions is not None else keyframe_positions(3)))
+        self.ffmpeg = ffmpeg
+        self.force = force
+        self.settings = get_render_profile(profile)
+        self.manifests = {}
+        if 'mp4' in outputs:
+            self.manifests['mp4'] = RenderManifest(mp4_dir)
+        if 'stills' in outputs:
+            self.manifests['stills'] = RenderManifest(stills_dir)
+        if 'sheet' in outputs:
+            self.manifests['sheet'] = RenderManifest(sheet_dir)
+        # Stills and sheets also depend on where the keyframes are
+        self.keyframe_settings = {'render': self.settings, 'keyframes': self.positions}
+
+    def _stale_outputs(self, name, source):
+        stale = set()
+        if 'mp4' in self.outputs and not self.manifests['mp4'].is_up_to_date(name + ".mp4", source, self.settings):
+            stale.add('mp4')
+        if 'stills' in self.outputs:
+            manifest = self.manifests['stills']
+            stills = manifest.outputs_of(source['source'])
+            if not stills or not all(manifest.is_up_to_date(still, source, self.keyframe_settings)
+                                     for still in stills):
+                stale.add('stills')
+        if 'sheet' in self.outputs and not self.manifests['sheet'].is_up_to_date(name + ".png", source,
+                                                                                 self.keyframe_settings):
+            stale.add('sheet')
+        return stale if not self.force else set(self.outputs)
+
+    def render(self, blend_path):
+        """
+        Render the requested outputs of one .blend file that are out of date.
+
+        :param blend_path: Path of the .blend file.
+        :return: Set of outputs that were rendered.
+        """
+        import bpy
+
+        name = os.path.splitext(os.path.basename(blend_path))[0]
+        # The hash is the same whichever folder's manifest computes it; ask one whose entry can skip hashing
+        if 'mp4' in self.manifests:
+            source = self.manifests['mp4'].source_info(blend_path, name + ".mp4")
+        elif 'sheet' in self.manifests:
+            source = self.manifests['sheet'].source_info(blend_path, name + ".png")
+        else:
+            stills = self.manifests['stills'].outputs_of(os.path.basename(blend_path))
+            source = self.manifests['stills'].source_info(blend_path, stills[0] if stills else name)
+        stale = self._stale_outputs(name, source)
+        if not stale:
+            print(f"Up to date {name}")
+            return stale
+
+        bpy.ops.wm.open_mainfile(filepath=blend_path)
+        scene = bpy.context.scene
+        apply_render_profile(scene, self.settings, movie=False)
+        frames = keyframe_numbers(scene.frame_start, scene.frame_end, self.positions)
+
+        with tempfile.TemporaryDirectory(prefix="render_job_") as frame_dir:
+            # The MP4 needs every frame; otherwise only the keyframes are rendered
+            render_frames(scene, frame_dir, None if 'mp4' in stale else frames)
+            keyframe_paths = [frame_path(frame_dir, frame) for frame in frames]
+
+            if 'mp4' in stale:
+                manifest = self.manifests['mp4']
+                encode_mp4(frame_dir, scene.frame_start, os.path.join(manifest.output_dir, name + ".mp4"),
+                           self.settings, self.ffmpeg)
+                manifest.record(name + ".mp4", source, self.settings)
+
+            if 'stills' in stale:
+                manifest = self.manifests['stills']
+                # Delete the previous layout's stills so the folder only holds the current keyframes
+                for still in manifest.outputs_of(source['source']):
+                    manifest.forget(still)
+                for frame, path in zip(frames, keyframe_paths):
+                    still = f"{name}_{frame}.png"
+                    shutil.copyfile(path, os.path.join(manifest.output_dir, still))
+                    manifest.record(still, source, self.keyframe_settings)
+
+            if 'sheet' in stale:
+                manifest = self.manifests['sheet']
+                contact_sheet(keyframe_paths, os.path.join(manifest.output_dir, name + ".png"))
+                manifest.record(name + ".png", source, self.keyframe_settings)
+
+        print(f"Rendered {', '.join(sorted(stale))} for {name} ({len(frames)} keyframes: {frames})")
+        return stale
+
+    def render_folder(self, source_folder):
+        """Render every .blend file in source_folder."""
+        blend_files = sorted(f for f in os.listdir(source_folder) if f.endswith('.blend'))
+        for file_name in blend_files:
+            self.render(os.path.abspath(os.path.join(source_folder, file_name)))
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Render MP4s, keyframe stills and contact sheets in one pass per .blend")
+    parser.add_argument('source_folder', nargs='?', default="./blender_source")
+    parser.add_argument('--outputs', default=','.join(OUTPUTS),
+                        help="Comma-separated subset of mp4,stills,sheet; without mp4 only keyframes are rendered")
+    parser.add_argument('--keyframes', type=parse_keyframes, default="3",
+                        help="Number of evenly spaced keyframes (10%%-90%%) or explicit fractions, e.g. 0.1,0.5,0.9")
+    parser.add_argument('--mp4-dir', default="./blender_mp4")
+    parser.add_argument('--stills-dir', default="./blender_pics")
+    parser.add_argument('--sheet-dir', default="./blender_pics_final")
+    parser.add_argument('--ffmpeg', default='ffmpeg', help="ffmpeg executable used to encode the MP4")
+    parser.add_argument('--force', action='store_true', help="Re-render outputs that are up to date")
+    parser.add_argument('--profile', choices=sorted(RENDER_PROFILES), default=DEFAULT_PROFILE,
+                        help="Render profile for the frames of every output")
+    args = parser.parse_args(argv)
+
+    renderer = SinglePassRenderer(tuple(args.outputs.split(',')), args.keyframes, args.mp4_dir,
+                    args.stills_dir, args.sheet_dir, args.ffmpeg, args.force, args.profile)
+    renderer.render_folder(args.source_folder)
+
+if __name__ == "__main__":
+    # Inside Blender, script arguments follow "--"
+    main(sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:])
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+import time
+
+MANIFEST_NAME = "render_manifest.json"
+
+def hash_file(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class RenderManifest:
+    """
+    Record of which .blend contents and render settings produced each file in an output folder.
+
+    An output is up to date when it exists, its source .blend hashes the same as
+    when it was rendered and it was rendered with the same settings.
+    """
+
+    def __init__(self, output_dir):
+        """
+        :param output_dir: Render output folder; the manifest is stored in it as render_manifest.json.
+        """
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        os.makedirs(output_dir, exist_ok=True)
+        # List the folder once; record() keeps the set current as files are rendered
+        self.existing = set(os.listdir(output_dir))
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def source_info(self, blend_path, output_name):
+        """
+        Identify a .blend file's current contents.
+
+        The file is only re-hashed when its size or modification time differs from
+        the recorded render, so unchanged libraries are checked with one stat per file.
+        """
+        stat = os.stat(blend_path)
+        entry = self.entries.get(output_name, {})
+        if entry.get('source_size') == stat.st_size and entry.get('source_mtime_ns') == stat.st_mtime_ns:
+            source_hash = entry['source_hash']
+        else:
+            source_hash = hash_file(blend_path)
+        return {
+            'source': os.path.basename(blend_path),
+            'source_hash': source_hash,
+            'source_size': stat.st_size,
+            'source_mtime_ns': stat.st_mtime_ns
+        }
+
+    def is_up_to_date(self, output_name, source, settings):
+        """
+        Whether output_name can be kept as is.
+
+        :param output_name: File name inside the output folder.
+        :param source: source_info() of the .blend file.
+        :param settings: Render settings the script would apply.
+        """
+        entry = self.entries.get(output_name)
+        return (output_name in self.existing and entry is not None
+                and entry['source_hash'] == source['source_hash'] and entry['settings'] == settings)
+
+    def record(self, output_name, source, settings):
+        """Mark output_name as rendered from source with settings and save the manifest."""
+        self.entries[output_name] = dict(source, settings=settings, rendered=time.time())
+        self.existing.add(output_name)
+        self.save()
+
+    def outputs_of(self, source_name):
+        """Recorded output names rendered from the .blend file called source_name."""
+        return sorted(name for name, entry in self.entries.items() if entry['source'] == source_name)
+
+    def forget(self, output_name):
+        """
+        Delete an output and its entry, e.g. a still that a new keyframe layout no longer produces.
+
+        The file is removed before the manifest is saved, so an interrupted run can only leave an
+        entry whose file is missing, which is_up_to_date() already treats as stale.
+        """
+        try:
+            os.remove(os.path.join(self.output_dir, output_name))
+        except OSError:
+            pass
+        self.existing.discard(output_name)
+        self.entries.pop(output_name, None)
+        self.save()
+
+    def save(self):
+        # Write beside the manifest and swap it in so an interrupted save keeps the old one
+        partial_path = self.path + ".part"
+        with open(partial_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+        os.replace(partial_path, self.path)